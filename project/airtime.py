@@ -0,0 +1,154 @@
+import math
+import time
+from array import array
+from lora_e220_constants import AirDataRate, SubPacketSetting
+
+# --- Tiempo en el Aire ---
+# El E220 (LLCC68) no publica qué factor de dispersión y ancho de banda usa
+# cada velocidad de aire. Se toma, para cada una, la combinación cuya tasa
+# bruta con CR 4/5 más se acerca a la nominal; el tiempo de cada trama se
+# calcula con la fórmula de Semtech para el SX126x (preámbulo de 8 símbolos,
+# cabecera explícita y CRC). Todo en enteros: microsegundos, sin asignar
+# memoria por trama.
+
+# Velocidad de aire -> (SF, log2(BW / 125 kHz))
+AIR_RATE_SF_BW = {
+    AirDataRate.AIR_DATA_RATE_000_24: (9, 0),
+    AirDataRate.AIR_DATA_RATE_001_24: (9, 0),
+    AirDataRate.AIR_DATA_RATE_010_24: (9, 0),
+    AirDataRate.AIR_DATA_RATE_011_48: (7, 0),
+    AirDataRate.AIR_DATA_RATE_100_96: (6, 0),
+    AirDataRate.AIR_DATA_RATE_101_192: (6, 1),
+    AirDataRate.AIR_DATA_RATE_110_384: (6, 2),
+    AirDataRate.AIR_DATA_RATE_111_625: (5, 2),
+}
+PREAMBLE_SYMBOLS = 8
+CODING_RATE = 1  # 4/5
+# Máximo rendimiento de ALOHA puro: una fracción 1/(2e) del canal.
+ALOHA_MAX_LOAD = 0.184
+
+# --- Sensibilidad ---
+# El E220 solo entrega el RSSI de cada paquete. La relación señal a ruido se
+# estima contra el ruido térmico del ancho de banda más la figura de ruido del
+# receptor; el demodulador LoRa recupera paquetes hasta SNR_MIN_DB según el SF.
+NOISE_FIGURE_DB = 6
+SNR_MIN_DB = {5: -2.5, 6: -5.0, 7: -7.5, 8: -10.0, 9: -12.5, 10: -15.0, 11: -17.5, 12: -20.0}
+
+def noise_floor_dbm(air_data_rate: int) -> float:
+    """Piso de ruido del receptor en dBm para la velocidad de aire."""
+    _, bw_shift = AIR_RATE_SF_BW.get(air_data_rate, AIR_RATE_SF_BW[AirDataRate.AIR_DATA_RATE_010_24])
+    return -174 + 10 * math.log10(125_000 << bw_shift) + NOISE_FIGURE_DB
+
+def snr_min_db(air_data_rate: int) -> float:
+    """SNR mínima demodulable para la velocidad de aire."""
+    sf, _ = AIR_RATE_SF_BW.get(air_data_rate, AIR_RATE_SF_BW[AirDataRate.AIR_DATA_RATE_010_24])
+    return SNR_MIN_DB[sf]
+
+def sensitivity_dbm(air_data_rate: int) -> float:
+    return noise_floor_dbm(air_data_rate) + snr_min_db(air_data_rate)
+
+def symbol_us(sf: int, bw_shift: int) -> int:
+    # 2^SF / BW con BW = 125 kHz << bw_shift: 8 us por chip a 125 kHz.
+    return (8 << sf) >> bw_shift
+
+def time_on_air_us(air_data_rate: int, length: int) -> int:
+    """Tiempo en el aire de un paquete de radio de `length` bytes."""
+    sf, bw_shift = AIR_RATE_SF_BW.get(air_data_rate, AIR_RATE_SF_BW[AirDataRate.AIR_DATA_RATE_010_24])
+    # Optimización de tasa baja: obligatoria con símbolos de 16 ms o más.
+    de = 2 if symbol_us(sf, bw_shift) >= 16000 else 0
+    if sf < 7:
+        bits, extra = 8 * length + 16 - 4 * sf + 20, 25  # 6.25 símbolos de sincronismo
+    else:
+        bits, extra = 8 * length + 16 - 4 * sf + 8 + 20, 17  # 4.25
+    step = 4 * (sf - de)
+    payload = 8 + ((bits + step - 1) // step) * (CODING_RATE + 4) if bits > 0 else 8
+    return symbol_us(sf, bw_shift) * (4 * (PREAMBLE_SYMBOLS + payload) + extra) // 4
+
+class AirtimeModel:
+    """
+    Tiempo en el aire y uso del canal para una configuración del E220. Los
+    mensajes más largos que el sub-paquete salen como varios paquetes de radio.
+    Con wor_period_ms (transmisión hacia un receptor en WOR) el preámbulo de
+    cada paquete se alarga hasta cubrir el período de escucha.
+    """
+    def __init__(self, air_data_rate: int = AirDataRate.AIR_DATA_RATE_010_24,
+                 sub_packet_setting: int = SubPacketSetting.SPS_200_00, wor_period_ms: int = 0):
+        self.air_data_rate = air_data_rate
+        self.sub_packet = SubPacketSetting.get_size(sub_packet_setting) or 200
+        self.wor_us = wor_period_ms * 1000
+        self._full_us = time_on_air_us(air_data_rate, self.sub_packet) + self.wor_us
+
+    @classmethod
+    def from_configuration(cls, configuration, wor: bool = False):
+        """Modelo para un lora_e220.Configuration (la leída del módulo o la que se va a escribir)."""
+        wor_period_ms = 500 * (configuration.TRANSMISSION_MODE.WORPeriod + 1) if wor else 0
+        return cls(configuration.SPED.airDataRate, configuration.OPTION.subPacketSetting, wor_period_ms)
+
+    def frame_us(self, length: int) -> int:
+        """Tiempo en el aire de un mensaje de `length` bytes, sub-paquetes incluidos."""
+        full, rest = length // self.sub_packet, length % self.sub_packet
+        us = full * self._full_us
+        if rest or not full: us += time_on_air_us(self.air_data_rate, rest) + self.wor_us
+        return us
+
+    def max_reports_per_hour(self, nodes: int, length: int, duty_permille: int = None) -> int:
+        """
+        Reportes por hora y por nodo que soporta el canal con `nodes` nodos
+        compartiéndolo sin coordinación (ALOHA puro), limitados además por el
+        ciclo de trabajo de cada nodo si se indica.
+        """
+        us = self.frame_us(length)
+        limit = int(ALOHA_MAX_LOAD * 3600_000_000 / (us * max(1, nodes)))
+        if duty_permille:
+            limit = min(limit, 3600 * 1000 * duty_permille // us)
+        return limit
+
+    def collision_probability(self, nodes: int, length: int, interval_s: float) -> float:
+        """
+        Probabilidad de que un reporte se solape con el de otro nodo cuando
+        `nodes` nodos reportan cada interval_s sin coordinarse (ALOHA puro: el
+        período vulnerable es el doble del tiempo en el aire).
+        """
+        if nodes <= 1: return 0.0
+        load = (nodes - 1) * self.frame_us(length) / (interval_s * 1e6)
+        return 1.0 - math.exp(-2.0 * load)
+
+class DutyCycle:
+    """
+    Presupuesto de tiempo en el aire en una ventana deslizante, llevado en
+    `buckets` casilleros de window_s / buckets segundos. Con limit_permille = 10
+    y una ventana de una hora, el nodo transmite como mucho 36 s por hora.
+    """
+    def __init__(self, limit_permille: int = 10, window_s: int = 3600, buckets: int = 60, now: int = None):
+        self.window_s = window_s
+        self.budget_us = window_s * 1000 * limit_permille
+        self.bucket_ms = window_s * 1000 // buckets
+        self._used = array('l', [0] * buckets)
+        self._current = 0
+        self._bucket_start = time.ticks_ms() if now is None else now
+        self.used_us = 0
+
+    def _advance(self, now):
+        steps = time.ticks_diff(now, self._bucket_start) // self.bucket_ms
+        if steps <= 0: return
+        n = len(self._used)
+        for _ in range(min(steps, n)):
+            self._current = (self._current + 1) % n
+            self.used_us -= self._used[self._current]
+            self._used[self._current] = 0
+        self._bucket_start = time.ticks_add(self._bucket_start, steps * self.bucket_ms)
+
+    def allows(self, airtime_us: int, now: int, limit_us: int = None) -> bool:
+        """True si `airtime_us` entra en lo que queda del presupuesto (o de limit_us)."""
+        self._advance(now)
+        return self.used_us + airtime_us <= (self.budget_us if limit_us is None else limit_us)
+
+    def charge(self, airtime_us: int, now: int):
+        self._advance(now)
+        self._used[self._current] += airtime_us
+        self.used_us += airtime_us
+
+    def utilization(self, now: int) -> float:
+        """Fracción del presupuesto usada en la ventana actual."""
+        self._advance(now)
+        return self.used_us / self.budget_us if self.budget_us else 1.0
@@ -0,0 +1,139 @@
+import struct
+
+from datalog import RECORD_SIZE
+from protocol import STRUCT_ERROR
+
+# --- Reportes Pendientes (almacenamiento y reenvío) ---
+# Lo que no llegó a la base (sin ruta, cola de salida saturada o entrega
+# confiable fallida) ya está en el historial local de la flash (datalog.RingLog):
+# acá solo se anotan los tramos de números de registro que faltan enviar. Los
+# tramos se guardan en un archivo chico aparte y sobreviven a un reinicio; los
+# registros que el anillo pisa antes de enviarse se pierden y se cuentan.
+# El vaciado copia los registros de la flash a la trama tal cual (LOG_RECORDS),
+# de a bloques contiguos dentro de una página del anillo.
+
+BACKLOG_OLDEST = "oldest"   # primero lo más viejo: la base recibe la historia en orden
+BACKLOG_NEWEST = "newest"   # primero lo más reciente: el hueco más nuevo se llena antes
+
+_COUNT = '>H'
+_RANGE = '>II'
+
+class Backlog:
+    """
+    Tramos [first, end) de números de registro de `log` pendientes de enviar,
+    ordenados y sin solaparse. Con más de max_ranges tramos se unen los dos
+    más cercanos: se reenvía lo que quedó entre ellos, que la base descarta por
+    timestamp, a cambio de memoria acotada.
+
+    El archivo de estado se reescribe cuando cambia la cantidad de tramos o
+    lo pendiente cambió en una página del anillo desde la última escritura: un
+    reinicio repite o deja sin marcar como mucho una página.
+    """
+    def __init__(self, log, path: str, order: str = BACKLOG_OLDEST, max_ranges: int = 8):
+        self.log = log
+        self.path = path
+        self.order = order
+        self.max_ranges = max(1, max_ranges)
+        self.ranges = []
+        self._saved = (0, 0)
+        self.stats = {"marked": 0, "sent": 0, "frames": 0, "overwritten": 0}
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+            count, = struct.unpack_from(_COUNT, data)
+            size = struct.calcsize(_RANGE)
+            for i in range(count):
+                first, end = struct.unpack_from(_RANGE, data, 2 + i * size)
+                # Un historial reformateado reinicia la numeración: lo que quede fuera se descarta.
+                if first < end <= self.log.head: self.ranges.append([first, end])
+        except (OSError, ValueError, STRUCT_ERROR):
+            self.ranges = []
+        self._trim()
+        self._saved = (len(self.ranges), len(self))
+
+    def _maybe_save(self):
+        ranges, pending = self._saved
+        if ranges != len(self.ranges) or abs(pending - len(self)) >= self.log.per_page: self._save()
+
+    def _save(self):
+        data = bytearray(struct.pack(_COUNT, len(self.ranges)))
+        for first, end in self.ranges: data += struct.pack(_RANGE, first, end)
+        try:
+            with open(self.path, 'wb') as f:
+                f.write(data)
+        except OSError:
+            pass
+        self._saved = (len(self.ranges), len(self))
+
+    def _trim(self):
+        """Descarta lo que el anillo ya pisó."""
+        tail = self.log.tail
+        while self.ranges and self.ranges[0][0] < tail:
+            first, end = self.ranges[0]
+            self.stats["overwritten"] += min(end, tail) - first
+            if end <= tail: self.ranges.pop(0)
+            else: self.ranges[0][0] = tail
+
+    def __len__(self):
+        return sum(end - first for first, end in self.ranges)
+
+    def add(self, first: int, end: int):
+        """Marca como pendientes los registros [first, end)."""
+        first = max(first, self.log.tail)
+        end = min(end, self.log.head)
+        if first >= end: return
+        ranges = self.ranges
+        before = len(self)
+        i = 0
+        while i < len(ranges) and ranges[i][1] < first: i += 1
+        # Se une con todos los tramos que toca o solapa.
+        while i < len(ranges) and ranges[i][0] <= end:
+            first, end = min(first, ranges[i][0]), max(end, ranges[i][1])
+            ranges.pop(i)
+        ranges.insert(i, [first, end])
+        if len(ranges) > self.max_ranges:
+            gaps = [ranges[j + 1][0] - ranges[j][1] for j in range(len(ranges) - 1)]
+            j = gaps.index(min(gaps))
+            ranges[j][1] = ranges[j + 1][1]
+            ranges.pop(j + 1)
+        self.stats["marked"] += len(self) - before
+        self._maybe_save()
+
+    def add_time(self, start_ts: int, end_ts: int):
+        """
+        Marca como pendientes los registros con timestamp en [start_ts, end_ts).
+        Un paso atrás del reloj deja el mismo rango de tiempo en más de un tramo
+        del historial: se marcan todos (RingLog.find).
+        """
+        for first, end in self.log.find(start_ts, end_ts): self.add(first, end)
+
+    def take_into(self, buf, offset: int, max_records: int) -> int:
+        """
+        Copia en buf, desde offset, hasta max_records registros pendientes
+        contiguos según el orden configurado y los da por enviados. Retorna
+        cuántos copió (0 si no queda nada).
+        """
+        self._trim()
+        if not self.ranges or max_records <= 0: return 0
+        per_page = self.log.per_page
+        if self.order == BACKLOG_NEWEST:
+            entry = self.ranges[-1]
+            first, end = entry
+            # El bloque más nuevo sin cruzar el inicio de su página ni el espacio en buf;
+            # solo se da por enviado lo que read_into copió.
+            max_records = min(max_records, (len(buf) - offset) // RECORD_SIZE)
+            n = max(first, end - max_records, (end - 1) // per_page * per_page)
+            count = self.log.read_into(n, memoryview(buf)[offset:], end - n)
+            entry[1] = end - count
+        else:
+            entry = self.ranges[0]
+            count = self.log.read_into(entry[0], memoryview(buf)[offset:], min(max_records, entry[1] - entry[0]))
+            entry[0] += count
+        if entry[0] >= entry[1]: self.ranges.remove(entry)
+        self.stats["sent"] += count
+        self.stats["frames"] += 1
+        self._maybe_save()
+        return count
@@ -0,0 +1,270 @@
+import struct
+from array import array
+from binascii import crc32
+
+# --- Registro Local de Datos ---
+# Archivo circular preasignado en la flash del nodo. La página 0 es la cabecera
+# del archivo (formato, tamaño de página y cantidad de páginas); las demás son
+# un anillo de páginas de datos del tamaño de un bloque de la flash. Cada página
+# empieza con su propia cabecera (secuencia, primer timestamp, registros y CRC)
+# y sigue con registros de tamaño fijo. Los registros se juntan en RAM en la
+# imagen de la página actual y se escriben de a página entera: la flash borra
+# y programa bloques completos, así que escribir menos no ahorra nada. La
+# cabecera del archivo no se reescribe nunca; el índice por tiempo (primer
+# timestamp de cada página) se arma en RAM al abrir leyendo las cabeceras de
+# las páginas, y buscar por tiempo cuesta una bisección en RAM más la lectura
+# de unos pocos registros de una sola página. Un paso atrás del reloj rompe el
+# orden: las páginas donde ocurrió se marcan en RAM y find() las recorre
+# registro a registro en lugar de bisecarlas.
+
+LOG_MAGIC = b'PLOG'
+LOG_VERSION = 1
+# Cabecera del archivo: magia, versión, tamaño de registro, tamaño de página, páginas.
+FILE_HEADER = '>4sBBHH'
+# Cabecera de página: secuencia (1, 2, ...; 0 = vacía), primer timestamp, registros, CRC32.
+PAGE_HEADER = '>IIHI'
+PAGE_HEADER_SIZE = struct.calcsize(PAGE_HEADER)
+# Registro: timestamp (segundos desde epoch), presión (psi), temperatura x100, banderas.
+RECORD = '>IhhB'
+RECORD_SIZE = struct.calcsize(RECORD)
+
+LOG_FLAG_UNSYNCED = 0x01        # la hora del RTC no estaba sincronizada
+LOG_FLAG_NO_PRESSURE = 0x02     # sin lectura de presión
+LOG_FLAG_NO_TEMPERATURE = 0x04  # sin lectura de temperatura
+
+class RingLog:
+    """
+    Registros numerados desde 0 al agregarse; se conservan los de las últimas
+    `pages` páginas (la página en curso incluida), desde `tail` hasta `head`
+    sin incluir. El registro n vive en la página n // per_page, en la posición
+    n % per_page; la página p ocupa la ranura p % pages del archivo.
+
+    append() deja el registro en RAM; flush() escribe la página en curso (lo
+    hace solo al llenarse, o cuando lo pida el dueño). Una escritura cortada
+    por un corte de energía deja mal el CRC de esa página y al abrir se pierde
+    solo esa página.
+    """
+    def __init__(self, path: str, pages: int = 64, page_size: int = 4096):
+        self.path = path
+        self.pages = max(2, pages)
+        self.page_size = page_size
+        self.per_page = (page_size - PAGE_HEADER_SIZE) // RECORD_SIZE
+        self._page = bytearray(page_size)
+        self._record = bytearray(RECORD_SIZE)
+        self._first = array('I', [0] * self.pages)   # primer timestamp de cada ranura
+        self._seq = array('I', [0] * self.pages)     # secuencia (página + 1) de cada ranura
+        self._unordered = bytearray(self.pages)      # 1 si la página tiene un paso atrás del reloj
+        self._last = 0                               # timestamp del último registro
+        self._scan = None
+        self.head = 0
+        self.dirty = 0  # registros en RAM todavía no escritos
+        self.stats = {"records": 0, "flushes": 0, "bytes_written": 0, "recovered": 0, "lost_pages": 0}
+        self._file = self._open()
+
+    def _open(self):
+        try:
+            f = open(self.path, 'r+b')
+        except OSError:
+            return self._format()
+        header = f.read(struct.calcsize(FILE_HEADER))
+        if len(header) < struct.calcsize(FILE_HEADER) or \
+                struct.unpack(FILE_HEADER, header) != (LOG_MAGIC, LOG_VERSION, RECORD_SIZE, self.page_size, self.pages):
+            f.close()
+            return self._format()
+        self._file = f
+        newest = -1
+        for slot in range(self.pages):
+            f.seek((slot + 1) * self.page_size)
+            seq, first, count, _ = struct.unpack(PAGE_HEADER, f.read(PAGE_HEADER_SIZE))
+            if seq and seq % self.pages != (slot + 1) % self.pages: seq = 0
+            self._seq[slot], self._first[slot] = seq, first
+            if seq and (newest < 0 or seq > self._seq[newest]): newest = slot
+        if newest >= 0 and not self._load(newest):
+            # La página más nueva quedó a medio escribir: se descarta y se sigue desde la anterior.
+            self.stats["lost_pages"] += 1
+            self._seq[newest] = 0
+            previous = (newest - 1) % self.pages
+            newest = previous if self._seq[previous] and self._load(previous) else -1
+        if newest < 0: self._page[:] = bytes(self.page_size)
+        self._mark_unordered()
+        return f
+
+    def _mark_unordered(self):
+        """
+        Marca las páginas guardadas con un paso atrás del reloj. De las escritas
+        antes de abrir solo se conoce el primer timestamp: un índice que baja
+        marca las dos páginas del salto. La página en RAM se revisa entera.
+        """
+        per_page, pages = self.per_page, self.pages
+        first_page, last_page = self.tail // per_page, (self.head - 1) // per_page
+        for page in range(first_page + 1, last_page + 1):
+            if self._first[page % pages] < self._first[(page - 1) % pages]:
+                self._unordered[page % pages] = self._unordered[(page - 1) % pages] = 1
+        if self.head <= self.tail: return
+        previous = self._first[last_page % pages]
+        for n in range(max(last_page * per_page, self.tail), self.head):
+            timestamp = struct.unpack_from('>I', self._page, PAGE_HEADER_SIZE + (n % per_page) * RECORD_SIZE)[0]
+            if timestamp < previous: self._unordered[last_page % pages] = 1
+            previous = timestamp
+        self._last = previous
+
+    def _load(self, slot) -> bool:
+        """Carga la página de `slot` en RAM si su CRC es válido y deja head después de su último registro."""
+        f = self._file
+        f.seek((slot + 1) * self.page_size)
+        f.readinto(self._page)
+        seq, first, count, crc = struct.unpack_from(PAGE_HEADER, self._page)
+        if count > self.per_page or crc != self._crc(count): return False
+        self.head = (seq - 1) * self.per_page + count
+        self.stats["recovered"] = self.head - self.tail
+        return True
+
+    def _format(self):
+        f = open(self.path, 'w+b')
+        page = self._page
+        page[:] = bytes(self.page_size)
+        struct.pack_into(FILE_HEADER, page, 0, LOG_MAGIC, LOG_VERSION, RECORD_SIZE, self.page_size, self.pages)
+        f.write(page)
+        page[:] = bytes(self.page_size)
+        for _ in range(self.pages): f.write(page)
+        f.flush()
+        return f
+
+    def _crc(self, count: int) -> int:
+        page = memoryview(self._page)
+        return crc32(page[PAGE_HEADER_SIZE:PAGE_HEADER_SIZE + count * RECORD_SIZE], crc32(page[:PAGE_HEADER_SIZE - 4]))
+
+    @property
+    def tail(self) -> int:
+        """Número del registro más viejo que se conserva (la ranura de la próxima página ya no cuenta)."""
+        return max(0, self.head // self.per_page - self.pages + 1) * self.per_page
+
+    def __len__(self):
+        return self.head - self.tail
+
+    def append(self, timestamp: int, pressure: int, temperature: int, flags: int = 0) -> int:
+        """Agrega un registro y retorna su número; escribe la página si se llenó."""
+        n = self.head
+        index = n % self.per_page
+        slot = (n // self.per_page) % self.pages
+        if index == 0:
+            # Página nueva: reemplaza a la más vieja del anillo.
+            self._seq[slot], self._first[slot] = n // self.per_page + 1, timestamp
+            self._unordered[slot] = 0
+        if n > self.tail and timestamp < self._last: self._unordered[slot] = 1
+        self._last = timestamp
+        struct.pack_into(RECORD, self._page, PAGE_HEADER_SIZE + index * RECORD_SIZE, timestamp, pressure, temperature, flags)
+        self.head = n + 1
+        self.dirty += 1
+        self.stats["records"] += 1
+        if index + 1 == self.per_page: self.flush()
+        return n
+
+    def flush(self):
+        """Escribe la página en curso (con lo que tenga) si hay registros sin escribir."""
+        if not self.dirty: return
+        page_number = (self.head - 1) // self.per_page
+        slot = page_number % self.pages
+        count = self.head - page_number * self.per_page
+        struct.pack_into(PAGE_HEADER, self._page, 0, page_number + 1, self._first[slot], count, 0)
+        struct.pack_into('>I', self._page, PAGE_HEADER_SIZE - 4, self._crc(count))
+        f = self._file
+        f.seek((slot + 1) * self.page_size)
+        f.write(self._page)
+        f.flush()
+        self.dirty = 0
+        self.stats["flushes"] += 1
+        self.stats["bytes_written"] += self.page_size
+
+    def read(self, n: int):
+        """Registro n como (timestamp, presión, temperatura x100, banderas), o None si ya no se conserva."""
+        if not self.tail <= n < self.head: return None
+        index = n % self.per_page
+        offset = PAGE_HEADER_SIZE + index * RECORD_SIZE
+        if n // self.per_page == (self.head - 1) // self.per_page:
+            return struct.unpack_from(RECORD, self._page, offset)
+        self._file.seek(((n // self.per_page) % self.pages + 1) * self.page_size + offset)
+        self._file.readinto(self._record)
+        return struct.unpack_from(RECORD, self._record)
+
+    def read_into(self, n: int, buf, count: int) -> int:
+        """
+        Copia en buf los registros desde n, tal como están en la flash y sin
+        pasar del final de su página; retorna cuántos copió.
+        """
+        if not self.tail <= n < self.head: return 0
+        page_number = n // self.per_page
+        count = min(count, self.head - n, (page_number + 1) * self.per_page - n, len(buf) // RECORD_SIZE)
+        offset = PAGE_HEADER_SIZE + (n % self.per_page) * RECORD_SIZE
+        size = count * RECORD_SIZE
+        if page_number == (self.head - 1) // self.per_page:
+            buf[:size] = memoryview(self._page)[offset:offset + size]
+        else:
+            self._file.seek((page_number % self.pages + 1) * self.page_size + offset)
+            self._file.readinto(memoryview(buf)[:size])
+        return count
+
+    def seek(self, timestamp: int) -> int:
+        """
+        Número del primer registro con timestamp >= `timestamp` (head si no hay).
+        Supone timestamps que nunca bajan a lo largo del log: DataLogger sella los
+        registros sin hora sincronizada con la del último guardado para
+        respetarlo. Si un paso atrás del reloj sincronizado lo rompe, el
+        resultado no está definido: find() sí lo tiene en cuenta.
+        """
+        return self._seek(timestamp, self.tail // self.per_page, (self.head + self.per_page - 1) // self.per_page)
+
+    def _seek(self, timestamp: int, lo: int, hi: int) -> int:
+        """seek() limitado a las páginas [lo, hi), que deben estar en orden; el final del tramo si no hay."""
+        # Última página que empieza antes de `timestamp`, por bisección en el índice en RAM. Con
+        # timestamps repetidos el primero >= `timestamp` puede estar en la página anterior a la
+        # que empieza justo en él; si la página entera es menor, es el primero de la siguiente.
+        while hi - lo > 1:
+            mid = (lo + hi) // 2
+            if self._first[mid % self.pages] < timestamp: lo = mid
+            else: hi = mid
+        lo, hi = max(lo * self.per_page, self.tail), min((lo + 1) * self.per_page, self.head)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.read(mid)[0] < timestamp: lo = mid + 1
+            else: hi = mid
+        return lo
+
+    def find(self, start_ts: int, end_ts: int):
+        """
+        Tramos [first, end) de números de registro con timestamp en
+        [start_ts, end_ts), en orden de número. Entre pasos atrás del reloj las
+        páginas siguen en orden y se bisecan como en seek(); las marcadas se
+        recorren registro a registro.
+        """
+        found = []
+        per_page, pages = self.per_page, self.pages
+        page, last = self.tail // per_page, (self.head + per_page - 1) // per_page
+        while page < last:
+            if self._unordered[page % pages]:
+                self._find_in_page(page, start_ts, end_ts, found)
+                page += 1
+                continue
+            run = page + 1
+            while run < last and not self._unordered[run % pages] and \
+                    self._first[run % pages] >= self._first[(run - 1) % pages]:
+                run += 1
+            first, end = self._seek(start_ts, page, run), self._seek(end_ts, page, run)
+            if first < end: found.append((first, end))
+            page = run
+        return found
+
+    def _find_in_page(self, page: int, start_ts: int, end_ts: int, found):
+        if self._scan is None: self._scan = bytearray(32 * RECORD_SIZE)
+        n, end = max(page * self.per_page, self.tail), min((page + 1) * self.per_page, self.head)
+        while n < end:
+            count = self.read_into(n, self._scan, end - n)
+            for i in range(count):
+                if start_ts <= struct.unpack_from('>I', self._scan, i * RECORD_SIZE)[0] < end_ts:
+                    if found and found[-1][1] == n + i: found[-1] = (found[-1][0], n + i + 1)
+                    else: found.append((n + i, n + i + 1))
+            n += count
+
+    def close(self):
+        self.flush()
+        self._file.close()
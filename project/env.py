@@ -3,7 +3,8 @@ HARDWARE_CONFIGURATION = {
         "1": { "sda": 21, "scl": 22, "freq": 400000 },
     },
     "uart": {
-        "1": { "tx": 17, "rx": 16, "baudrate": 9600 },
+        "1": { "tx": 17, "rx": 16, "baudrate": 9600, "txbuf": 512,
+               "queues": { "in": { "capacity": 8, "policy": "drop_oldest" }, "out": { "capacity": 16, "policy": "coalesce" } } },
     },
     "devices": {
         "rtc": { "driver": "DS3231", "bus_type": "i2c", "bus_id": "1", "address": 0x68 },
@@ -12,20 +13,28 @@ HARDWARE_CONFIGURATION = {
         "primary_adc":  { "driver": "ADC_Pin", "pin": 34, "attenuation": "ATTN_11DB"},
         #"lora_m0":      { "driver": "GPIO_Pin", "pin": 19, "mode": "OUT", "initial_value": 0 },
         "lora_module":  { "driver": "LoRa_E220", "model": "900T30D", "bus_type": "uart", "bus_id": "1", 
-                          "m0_pin": 19, "m1_pin": 18, "aux_pin":5}
+                          "m0_pin": 19, "m1_pin": 18, "aux_pin":5, "rssi": True,
+                          "configure_module": False}
     },
 }
 
 MODULE_CONFIGURATION = {
-    "clock":            { "device_key": "rtc", "drift_check_interval_s": 60, "max_drift_s": 10 },
+    # "sync": True pide la hora a la base (CMD_TIME_SYNC) cada sync_min_s a sync_max_s según el desfase medido; requiere "message".
+    "clock":            { "device_key": "rtc", "drift_check_interval_s": 60, "max_drift_s": 10, "sync": False, "sync_min_s": 64, "sync_max_s": 4096, "sync_target_ms": 50, "rtc_step_ms": 10, "bus_type": "uart", "bus_id": "1" },
     "display":          { "device_key": "display", "refresh_interval_s": 0.1, "boot_duration_s": 5, "backlight_timeout_s": 60, "rows": 2, "cols": 16, "subs": "wake_up_button"},
     "temperature":      { "device_key": "rtc", "read_interval_s": 5 },
     "analog_adc_1":     { "device_key": "primary_adc", "read_interval_s": 0.05, "median_filter_size": 11, "adc_max_value": 4095.0},
     "pressure_1":       { "V_TO_MPA_SLOPE": 12.5, "V_TO_MPA_INTERCEPT": -1.25, "PSI_PER_MPA": 145.038, "subs":"analog_adc_1"},
-    #"routing":          { "hello_interval_s": 30, "route_update_interval_s": 600, "bus_type": "uart", "bus_id": "1"},
+    #"routing":          { "hello_interval_s": 30, "hello_max_s": 240, "route_update_min_s": 30, "route_update_interval_s": 600, "route_redundancy": 4, "dedup_entries": 64, "dedup_ttl_s": 10, "device_key": "lora_module", "bus_type": "uart", "bus_id": "1"},
     #"message":          { "read_interval_s": 0.1 , "bus_type": "uart", "bus_id": "1"},
-    "data_reporter":    { "report_interval_s": 30 , "bus_type": "uart", "bus_id": "1"},
-    "lora_tx":          { "device_key": "lora_module", "check_interval_s": 0.1, "bus_type": "uart", "bus_id": "1"},
+    #"reliable_link":    { "check_interval_s": 0.1, "window": 8, "max_retries": 4, "ack_delay_ms": 250, "bus_type": "uart", "bus_id": "1"},
+    #"fragmentation":    { "check_interval_s": 0.1, "max_message": 4096, "max_sources": 2, "status_delay_ms": 2000, "rto_ms": 6000, "device_key": "lora_module", "bus_type": "uart", "bus_id": "1"},
+    # "schedule": "slots" reporta en la ranura propia de una trama TDMA sobre el RTC (requiere reloj sincronizado, p. ej. clock "sync": True; sin él, acceso aleatorio); "jitter", en un instante al azar de cada intervalo.
+    "data_reporter":    { "report_interval_s": 30 , "network_size": 10, "schedule": "interval", "slot_guard_ms": 100, "batch_size": 1, "batch_encoding": "fixed", "reliable": False, "backlog_order": "oldest", "backlog_interval_s": 10, "sensor_keys": ["pressure"], "device_key": "lora_module", "bus_type": "uart", "bus_id": "1"},
+    #"data_logger":      { "log_interval_s": 60, "flush_interval_s": 600, "path": "data.log", "pages": 64, "page_size": 4096, "sensor_key": "pressure" },
+    # "duty_cycle_permille": None (o 0) no limita el tiempo en el aire; el 900T30D trabaja en 915 MHz, sin límite regional.
+    # En la banda europea de 868 MHz (módulos 400/868) usar 10 (1 % por hora); la reserva de control y bulk_permille solo rigen con límite.
+    "lora_tx":          { "device_key": "lora_module", "check_interval_s": 0.1, "async_tx": True, "duty_cycle_permille": None, "duty_window_s": 3600, "control_reserve_permille": 100, "bulk_permille": 600, "bus_type": "uart", "bus_id": "1"},
 }
 
 MODULE_REGISTRY = {
@@ -36,6 +45,9 @@ MODULE_REGISTRY = {
     "pressure_1":       { "class": "Pressure",      "order": 30, "autostart": True, "critical": False },
     #"routing":          { "class": "Routing",       "order": 35, "autostart": True, "critical": True  },
     #"message":          { "class": "MessageLora",   "order": 45, "autostart": True, "critical": True  },
+    #"reliable_link":    { "class": "ReliableLink",  "order": 42, "autostart": True, "critical": False },
+    #"fragmentation":    { "class": "Fragmentation", "order": 43, "autostart": True, "critical": False },
+    #"data_logger":      { "class": "DataLogger",    "order": 48, "autostart": True, "critical": False },
     "data_reporter":    { "class": "DataReporter",  "order": 50, "autostart": True, "critical": False },
     "lora_tx":          { "class": "LoraTX",        "order": 40, "autostart": True, "critical": False },
 }
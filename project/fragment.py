@@ -0,0 +1,232 @@
+import time
+from protocol import (
+    build_packet, build_command, FRAGMENT, HEADER_SIZE, INITIAL_TTL,
+    OFF_DEST, OFF_CONTROL, OFF_COMMAND,
+    FRAME_TYPE_CMD, FRAME_TYPE_MASK, ATTEMPT_MASK, CMD_FRAGMENT, CMD_FRAGMENT_STATUS,
+)
+
+# --- Capa de Fragmentación ---
+# Los paquetes mayores que una trama de radio se parten en fragmentos
+# CMD_FRAGMENT numerados. El receptor los reúne en un buffer preasignado por
+# origen y, tras un silencio o al completar, responde con CMD_FRAGMENT_STATUS
+# (mapa de bits de lo recibido); el emisor reenvía solo lo que falta.
+# Como transport.py, no depende del hardware: el tiempo se recibe en cada
+# llamada y las tramas salen por `emit`.
+
+MAX_FRAGMENTS = 255
+
+class _Outgoing:
+    __slots__ = ('packet', 'total', 'xfer_id', 'missing', 'cursor', 'deadline', 'rounds', 'started_ms')
+    def __init__(self, packet, total, xfer_id):
+        self.packet = packet
+        self.total = total
+        self.xfer_id = xfer_id
+        self.missing = list(range(total))
+        self.cursor = 0
+        self.deadline = None
+        self.rounds = 0
+        self.started_ms = None
+
+class _Incoming:
+    __slots__ = ('src', 'xfer_id', 'control', 'command', 'total', 'chunk', 'length', 'count',
+                 'received', 'buf', 'last_ms', 'status_due', 'done')
+    def __init__(self, max_message: int):
+        self.src = None
+        self.buf = bytearray(max_message)
+        self.received = bytearray((MAX_FRAGMENTS + 7) // 8)
+        self.done = False
+        self.status_due = None
+
+    def reset(self, src, xfer_id, control, command, total, chunk, now):
+        self.src = src
+        self.xfer_id = xfer_id
+        self.control = control & FRAME_TYPE_MASK
+        self.command = command
+        self.total = total
+        self.chunk = chunk
+        self.length = 0
+        self.count = 0
+        for i in range(len(self.received)): self.received[i] = 0
+        self.last_ms = now
+        self.status_due = None
+        self.done = False
+
+class FragmentChannel:
+    def __init__(self, my_id: int, emit, deliver, frame_size: int = 200, burst: int = 1,
+                 max_pending: int = 2, max_message: int = 4096, max_sources: int = 2,
+                 status_delay_ms: int = 2000, rto_ms: int = 6000, timeout_ms: int = 60000,
+                 max_rounds: int = 8, on_fail=None):
+        self.my_id = my_id
+        self.emit = emit
+        self.deliver = deliver
+        # El tamaño viaja en un byte de la cabecera del fragmento.
+        self.chunk = min(frame_size - HEADER_SIZE - FRAGMENT.size, 0xFF)
+        self.burst = burst
+        self.max_pending = max_pending
+        self.max_message = max_message
+        self.status_delay_ms = status_delay_ms
+        self.rto_ms = rto_ms
+        self.timeout_ms = timeout_ms
+        self.max_rounds = max_rounds
+        self.on_fail = on_fail
+        self._next_xfer = time.ticks_ms() & 0xFF
+        self._pending = []
+        self._active = None
+        self._slots = [_Incoming(max_message) for _ in range(max_sources)]
+        self.stats = {"sent": 0, "fragments": 0, "retransmits": 0, "completed": 0, "failed": 0,
+                      "received": 0, "reassembled": 0, "rejected": 0, "status_sent": 0}
+
+    # --- Lado emisor ---
+
+    def send(self, packet) -> bool:
+        """
+        Encola un paquete completo (cabecera + payload) para enviarlo fragmentado.
+        Retorna False si no cabe en MAX_FRAGMENTS fragmentos o la cola está llena.
+        """
+        total = (len(packet) - HEADER_SIZE + self.chunk - 1) // self.chunk
+        if not 0 < total <= MAX_FRAGMENTS or len(self._pending) >= self.max_pending:
+            return False
+        self._pending.append(_Outgoing(packet, total, self._next_xfer))
+        self._next_xfer = (self._next_xfer + 1) & 0xFF
+        self.stats["sent"] += 1
+        return True
+
+    def busy(self) -> bool:
+        return self._active is not None or bool(self._pending)
+
+    def _emit_fragment(self, out, index):
+        packet = out.packet
+        start = HEADER_SIZE + index * self.chunk
+        data = memoryview(packet)[start:start + self.chunk]
+        control = (packet[OFF_CONTROL] & FRAME_TYPE_MASK) | (out.rounds & ATTEMPT_MASK)
+        self.emit(build_command(packet[OFF_DEST], self.my_id, control, INITIAL_TTL, CMD_FRAGMENT,
+                                out.xfer_id, packet[OFF_COMMAND], index, out.total, self.chunk, data))
+        self.stats["fragments"] += 1
+        if out.rounds: self.stats["retransmits"] += 1
+
+    def _send_round(self, out, now):
+        for _ in range(self.burst):
+            if out.cursor >= len(out.missing): break
+            self._emit_fragment(out, out.missing[out.cursor])
+            out.cursor += 1
+        if out.cursor >= len(out.missing):
+            out.deadline = time.ticks_add(now, self.rto_ms)
+
+    def _finish(self, ok: bool):
+        out, self._active = self._active, None
+        if ok:
+            self.stats["completed"] += 1
+        else:
+            self.stats["failed"] += 1
+            if self.on_fail: self.on_fail(out.packet)
+
+    def on_status(self, parsed, now: int):
+        """Procesa un CMD_FRAGMENT_STATUS (PacketView) de la transferencia activa."""
+        out, values = self._active, parsed.values
+        if out is None or values is None: return
+        xfer_id, total, bitmap = values
+        if xfer_id != out.xfer_id or parsed.src_id != out.packet[OFF_DEST] or total != out.total: return
+        missing = [i for i in range(total) if i // 8 >= len(bitmap) or not (bitmap[i // 8] >> (i % 8)) & 1]
+        if not missing:
+            self._finish(True)
+            return
+        if out.deadline is None and out.cursor < len(out.missing): return  # Ronda en curso
+        out.rounds += 1
+        if out.rounds > self.max_rounds:
+            self._finish(False)
+            return
+        out.missing, out.cursor, out.deadline = missing, 0, None
+
+    # --- Lado receptor ---
+
+    def _slot_for(self, src, now):
+        free = None
+        for slot in self._slots:
+            if slot.src == src:
+                return slot
+            if slot.src is None or slot.done or time.ticks_diff(now, slot.last_ms) > self.timeout_ms:
+                if free is None: free = slot
+        return free
+
+    def on_fragment(self, parsed, now: int):
+        """Guarda un CMD_FRAGMENT (PacketView) y entrega el paquete al completarse."""
+        values = parsed.values
+        if values is None: return
+        xfer_id, command, index, total, chunk, data = values
+        src = parsed.src_id
+        slot = self._slot_for(src, now)
+        # Los fragmentos se ubican con el tamaño del emisor, no con el propio.
+        start = index * chunk
+        if slot is None or index >= total or not 0 < len(data) <= chunk \
+                or (total - 1) * chunk >= self.max_message or start + len(data) > self.max_message:
+            self.stats["rejected"] += 1
+            return
+        if slot.src != src or slot.xfer_id != xfer_id or slot.total != total or slot.chunk != chunk:
+            slot.reset(src, xfer_id, parsed.control, command, total, chunk, now)
+        slot.last_ms = now
+        if slot.done:
+            slot.status_due = now  # El estado final se perdió: se repite.
+            return
+        if index < total - 1 and len(data) != chunk:
+            self.stats["rejected"] += 1
+            return
+        bit = 1 << (index % 8)
+        if not slot.received[index // 8] & bit:
+            slot.buf[start:start + len(data)] = data
+            slot.received[index // 8] |= bit
+            slot.count += 1
+            if index == total - 1: slot.length = start + len(data)
+            self.stats["received"] += 1
+        if slot.count == total:
+            slot.done = True
+            slot.status_due = now
+            self.stats["reassembled"] += 1
+            self.deliver(build_packet(self.my_id, src, slot.control, INITIAL_TTL, slot.command,
+                                      bytes(memoryview(slot.buf)[:slot.length])))
+        else:
+            slot.status_due = time.ticks_add(now, self.status_delay_ms)
+
+    def _send_status(self, slot):
+        nbytes = (slot.total + 7) // 8
+        self.emit(build_command(slot.src, self.my_id, FRAME_TYPE_CMD, INITIAL_TTL, CMD_FRAGMENT_STATUS,
+                                slot.xfer_id, slot.total, memoryview(slot.received)[:nbytes]))
+        self.stats["status_sent"] += 1
+
+    def on_frame(self, parsed, now: int) -> bool:
+        """Consume las tramas de fragmentación. Retorna False si la trama no es de esta capa."""
+        if parsed.command == CMD_FRAGMENT:
+            self.on_fragment(parsed, now)
+        elif parsed.command == CMD_FRAGMENT_STATUS:
+            self.on_status(parsed, now)
+        else:
+            return False
+        return True
+
+    # --- Ciclo ---
+
+    def update(self, now: int, idle: bool = True):
+        """
+        Emite fragmentos pendientes, reintenta rondas vencidas y envía estados.
+        `idle` indica que la cola de salida está vacía: los fragmentos solo se
+        emiten entonces (hasta `burst`), para que el timeout de la ronda cuente
+        desde que salió el último y no desde que se encoló.
+        """
+        if self._active is None and self._pending:
+            self._active = self._pending.pop(0)
+            self._active.started_ms = now
+        out = self._active
+        if out is not None:
+            if out.deadline is None:
+                if idle: self._send_round(out, now)
+            elif time.ticks_diff(now, out.deadline) >= 0:
+                # Sin estado del receptor: se reenvía el último fragmento para provocarlo.
+                out.rounds += 1
+                if out.rounds > self.max_rounds:
+                    self._finish(False)
+                else:
+                    self._emit_fragment(out, out.missing[-1])
+                    out.deadline = time.ticks_add(now, self.rto_ms)
+        for slot in self._slots:
+            if slot.status_due is not None and time.ticks_diff(now, slot.status_due) >= 0:
+                slot.status_due = None
+                self._send_status(slot)
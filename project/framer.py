@@ -0,0 +1,103 @@
+import time
+from protocol import COMMANDS, HEADER_SIZE, INITIAL_TTL, OFF_LEN, OFF_TTL, OFF_COMMAND, CMD_NONE
+
+# --- Recepción por UART ---
+# El módulo LoRa entrega las tramas recibidas por el UART una detrás de otra,
+# cada una seguida del byte de RSSI si está habilitado. UartFramer vacía el UART
+# sin bloquear en un buffer circular preasignado y separa las tramas con el
+# campo de largo de la cabecera; una cabecera con largo, TTL o comando
+# imposibles se descarta byte a byte hasta volver a sincronizar, y lo que quede
+# incompleto tras `gap_ms` de silencio se descarta. Cada trama se copia a uno
+# de `slots` buffers fijos y se encola como memoryview, sin asignar memoria por trama más allá de
+# la vista, junto con el RSSI y los ticks de la lectura (la hora de llegada para
+# la sincronización de reloj). Como los buffers se reutilizan en orden, no se encola una trama
+# nueva mientras la cola de entrada tenga `slots` elementos: así ninguna vista
+# pendiente se sobrescribe. Quien necesite conservar una trama después de
+# procesarla debe copiarla.
+
+class UartFramer:
+    def __init__(self, uart, queue, frame_size: int = 200, rssi: bool = True,
+                 ring_size: int = 1024, slots: int = 8, gap_ms: int = 100):
+        self.uart = uart
+        self.queue = queue
+        self.max_payload = frame_size - HEADER_SIZE
+        self.trailer = 1 if rssi else 0
+        self.gap_ms = gap_ms
+        size = 1
+        while size < ring_size: size <<= 1
+        self.ring = bytearray(size)
+        self._ring_mv = memoryview(self.ring)
+        self.mask = size - 1
+        self.head = 0
+        self.count = 0
+        self.last_rx = time.ticks_ms()
+        self._slots = [bytearray(frame_size) for _ in range(slots)]
+        self._next_slot = 0
+        self.stats = {"bytes": 0, "frames": 0, "resync": 0, "truncated": 0, "backpressure": 0}
+
+    def poll(self, now: int = None) -> int:
+        """Vacía lo disponible en el UART y encola las tramas completas. Retorna cuántas encoló."""
+        if now is None: now = time.ticks_ms()
+        self._drain(now)
+        return self._extract(now)
+
+    def _drain(self, now):
+        size = len(self.ring)
+        available = self.uart.any()
+        while available > 0 and self.count < size:
+            tail = (self.head + self.count) & self.mask
+            n = min(available, size - self.count, size - tail)
+            got = self.uart.readinto(self._ring_mv[tail:tail + n], n)
+            if not got: break
+            self.count += got
+            available -= got
+            self.stats["bytes"] += got
+            self.last_rx = now
+
+    def _skip(self, n):
+        self.head = (self.head + n) & self.mask
+        self.count -= n
+
+    def _copy_out(self, slot, n):
+        start = self.head
+        first = min(n, len(self.ring) - start)
+        slot[:first] = self._ring_mv[start:start + first]
+        if first < n:
+            slot[first:n] = self._ring_mv[:n - first]
+
+    def _extract(self, now):
+        pushed = 0
+        ring, mask = self.ring, self.mask
+        while self.count:
+            if self.count < HEADER_SIZE:
+                if time.ticks_diff(now, self.last_rx) > self.gap_ms:
+                    self._skip(self.count)
+                    self.stats["truncated"] += 1
+                break
+            length = ring[(self.head + OFF_LEN) & mask]
+            command = ring[(self.head + OFF_COMMAND) & mask]
+            if length > self.max_payload or ring[(self.head + OFF_TTL) & mask] > INITIAL_TTL \
+                    or (command != CMD_NONE and command not in COMMANDS):
+                # No es una cabecera válida: se descarta un byte y se busca la siguiente.
+                self._skip(1)
+                self.stats["resync"] += 1
+                continue
+            size = HEADER_SIZE + length
+            if self.count < size + self.trailer:
+                # Trama incompleta: si el UART quedó en silencio, quedó truncada.
+                if time.ticks_diff(now, self.last_rx) > self.gap_ms:
+                    self._skip(self.count)
+                    self.stats["truncated"] += 1
+                break
+            if len(self.queue) >= len(self._slots):
+                self.stats["backpressure"] += 1
+                break
+            slot = self._slots[self._next_slot]
+            self._next_slot = (self._next_slot + 1) % len(self._slots)
+            self._copy_out(slot, size)
+            rssi = ring[(self.head + size) & mask] if self.trailer else 0
+            self._skip(size + self.trailer)
+            self.queue.push({'data': memoryview(slot)[:size], 'rssi': rssi, 'ticks': now})
+            self.stats["frames"] += 1
+            pushed += 1
+        return pushed
@@ -4,11 +4,14 @@ import board
 from lib.urtc import DS3231, tuple2seconds, seconds2timetuple
 from lib.machine_i2c_lcd import I2cLcd
 from lib.lora_e220 import LoRaE220, ResponseStatusCode
+from framer import UartFramer
+from queues import MessageQueue
 from config import config_manager
 from pubsub import event_manager
 
 _buses, _drivers = {}, {}
 _pending_irqs = {}
+_framers = {}
 
 DRIVER_CLASS_MAP = {
     "ADC_Pin": ADC,
@@ -19,6 +22,43 @@ DRIVER_CLASS_MAP = {
     "LoRa_E220": LoRaE220,
 }
 
+def _configure_lora(instance, config):
+    """
+    Lee la configuración del E220 y retorna si el framer debe esperar el byte de
+    RSSI al final de cada trama: lo que el módulo tiene, no lo pedido en
+    `config`, porque si el módulo no agrega el byte el framer cortaría el último
+    byte de cada trama.
+    Por defecto no escribe nada: un módulo ajustado a mano queda como está.
+    Solo con "configure_module" en `config` se ajustan las opciones presentes
+    ("rssi", "fixed_transmission") en los registros volátiles, que el módulo
+    pierde al apagarse; con "configure_module": "permanent" se escriben en los
+    registros guardados, que sobreviven incluso a volver a un firmware anterior.
+    El driver escribe solo los registros que cambiaron (nada si coinciden).
+    """
+    # Una sola lectura al arrancar: después la configuración sale de la copia del driver.
+    code, lora_config = instance.get_configuration()
+    if code != ResponseStatusCode.E220_SUCCESS:
+        print(f"[Hardware] No se pudo leer la configuración del E220: {ResponseStatusCode.get_description(code)}")
+        # Sin lectura no hay estado conocido: se supone lo declarado en la configuración.
+        return config.get("rssi", False)
+    mode = config.get("configure_module")
+    if mode:
+        if "rssi" in config: lora_config.TRANSMISSION_MODE.enableRSSI = 1 if config["rssi"] else 0
+        # Sin la opción el modo y la dirección quedan como están: LoraTX sigue lo que informe el driver.
+        fixed = config.get("fixed_transmission")
+        if fixed is not None: lora_config.TRANSMISSION_MODE.fixedTransmission = 1 if fixed else 0
+        if fixed:
+            # Transmisión fija: la dirección del módulo es el SYSTEM_ID y LoraTX dirige
+            # cada trama a su siguiente salto; el módulo descarta las de otros destinos.
+            lora_config.ADDH, lora_config.ADDL = 0, config_manager.get("SYSTEM_ID") & 0xFF
+        code, _ = instance.set_configuration(lora_config, permanentConfiguration=mode == "permanent")
+        if code != ResponseStatusCode.E220_SUCCESS:
+            print(f"[Hardware] No se pudo escribir la configuración del E220: {ResponseStatusCode.get_description(code)}")
+            # La escritura fallida descarta la copia del driver: se relee lo que el módulo tiene.
+            instance.get_configuration(refresh=True)
+    configuration = instance.configuration
+    return bool(configuration.TRANSMISSION_MODE.enableRSSI) if configuration else config.get("rssi", False)
+
 def init():
     HARDWARE_CONFIGURATION = config_manager.get("HARDWARE_CONFIGURATION", {})
     for bus_type in ['i2c', 'uart']:
@@ -27,10 +67,11 @@ def init():
                 bus_key = f"{bus_type}_{bus_id}"
                 if bus_type == 'i2c': _buses[bus_key] = I2C(int(bus_id), scl=Pin(config['scl']), sda=Pin(config['sda']), freq=config['freq'])
                 elif bus_type == 'uart': 
-                    _buses[bus_key] = UART(int(bus_id), **config)
+                    queues = config.get("queues", {})
+                    _buses[bus_key] = UART(int(bus_id), **{k: v for k, v in config.items() if k != "queues"})
                     board.messages[bus_key] = {
-                        "in": [],
-                        "out": []
+                        "in": MessageQueue(**queues.get("in", {})),
+                        "out": MessageQueue(**queues.get("out", {}))
                     }
             except Exception as e: pass
     
@@ -60,7 +101,11 @@ def init():
                         aux_pin=config['aux_pin']
                     )
                     code = instance.begin()
-                    if code == ResponseStatusCode.E220_SUCCESS:board.states[f"{name}_message_available"] = False
+                    if code == ResponseStatusCode.E220_SUCCESS:
+                        rssi = _configure_lora(instance, config)
+                        board.states[f"{name}_message_available"] = False
+                        _framers[name] = UartFramer(bus, board.messages[f"uart_{config['bus_id']}"]["in"],
+                                                    frame_size=instance.sub_packet_size(), rssi=rssi)
                     else:instance = None
             elif driver_class == ADC:
                 instance = ADC(Pin(config['pin']))
@@ -99,6 +144,7 @@ def reinit():
     _buses.clear()
     _drivers.clear()
     _pending_irqs.clear()
+    _framers.clear()
     
     init()
     print("[Hardware] Hardware reinicializado.\n")
@@ -115,19 +161,24 @@ def update():
                 states[name] = _drivers[name].value()
         elif driver == "ADC_Pin":
             states[name] = _drivers[name].read() 
-        """
         elif driver == "LoRa_E220":
-            lora_driver = _drivers[name]
-            if lora_driver is not None:
-                if lora_driver.available() > 0:
-                    code, data, rssi = lora_driver.receive_dict(rssi=True)
-                    if code == ResponseStatusCode.E220_SUCCESS:
-                        bus_type = config.get("bus_type")
-                        bus_id = config.get("bus_id")
-                        board.messages[f"{bus_type}_{bus_id}"]["in"].append({'data': data, 'rssi': rssi})
-                        states[f"{name}_message_available"] = True
-        """
+            # Recepción no bloqueante: las tramas completas pasan a board.messages[...]["in"].
+            framer = _framers.get(name)
+            if framer is not None and framer.poll():
+                states[f"{name}_message_available"] = True
         
+def set_driver_delay_hook(delay_hook):
+    """
+    Instala la función de espera de los drivers LoRa (ver lib.lora_e220.yielding_delay).
+    None restaura la espera por defecto (time.sleep_ms).
+    """
+    for driver in _drivers.values():
+        if isinstance(driver, LoRaE220): driver.set_delay_hook(delay_hook)
+
+def busy():
+    """True si algún driver LoRa tiene una transmisión o un cambio de modo en curso."""
+    return any(driver.busy() for driver in _drivers.values() if isinstance(driver, LoRaE220))
+
 def process_irq_events():
     """
     Procesa las banderas de IRQ pendientes.
@@ -275,6 +275,44 @@ def print_configuration(configuration):
 
 MAX_SIZE_TX_PACKET = 200
 
+def yielding_delay(step, slice_ms=5):
+    """
+    Builds a delay hook that keeps calling step() (e.g. the module scheduler)
+    and sleeps in slices of at most slice_ms until the delay has elapsed.
+    Nested delays started from inside a step() run by the hook just sleep.
+    A delay started from inside a step() that the caller itself is running
+    (a blocking send from the main loop) does run step() again: the driver
+    reports busy() meanwhile, and callers must not re-enter their own send.
+    """
+    running = [False]
+
+    def delay(ms):
+        deadline = utime.ticks_add(utime.ticks_ms(), ms)
+        while True:
+            left = utime.ticks_diff(deadline, utime.ticks_ms())
+            if left <= 0:
+                return
+            if not running[0]:
+                running[0] = True
+                try:
+                    step()
+                finally:
+                    running[0] = False
+                left = utime.ticks_diff(deadline, utime.ticks_ms())
+                if left <= 0:
+                    return
+            utime.sleep_ms(min(slice_ms, left))
+
+    return delay
+
+
+# States of the non-blocking transmit state machine (send_async / poll_tx);
+# TX_BLOCKING covers a whole blocking send (_send_message).
+TX_IDLE = 0
+TX_WAIT_AUX = 1
+TX_SETTLE = 2
+TX_BLOCKING = 3
+
 
 class ModuleInformation:
     def __init__(self):
@@ -319,7 +357,7 @@ class ModuleInformation:
 class LoRaE220:
     # now the constructor that receive directly the UART object
     def __init__(self, model, uart, aux_pin=None, m0_pin=None, m1_pin=None,
-                 uart_baudrate=SerialUARTBaudRate.BPS_RATE_9600):
+                 uart_baudrate=SerialUARTBaudRate.BPS_RATE_9600, delay_hook=None):
         self.uart = uart
         self.model = model
 
@@ -339,6 +377,30 @@ class LoRaE220:
 
         self.uart_baudrate = uart_baudrate
         self.mode = None
+        self.configuration = None
+
+        # Every driver delay goes through this hook: utime.sleep_ms by default,
+        # yielding_delay(...) to keep the scheduler running, or a virtual clock
+        # advance in simulation. It must not return before `ms` have elapsed.
+        self.delay_hook = delay_hook or utime.sleep_ms
+        self._mode_changing = False
+
+        self._tx_state = TX_IDLE
+        self._tx_result = ResponseStatusCode.E220_SUCCESS
+        self._tx_bytes = 0
+        self._tx_started = 0
+        self._tx_timeout = 0
+        self._tx_no_aux_ms = 0
+        self._tx_settle_at = 0
+        self._aux_seen_low = False
+        self._aux_rose = False
+
+        self._shadow = None
+        self._shadow_saved = False
+        self._staged = None
+        self._module_information = None
+        self.config_stats = {"reads": 0, "writes": 0, "bytes_written": 0, "cache_hits": 0,
+                             "mode_switches": 0, "mode_switches_avoided": 0}
 
     # model is like 400T22D or 433T27D or 433T30D or 868T20S or 868T27S or 868T30S
     # def __init__(self, model, tx_pin, rx_pin, uart_id=0, aux_pin=None, m0_pin=None, m1_pin=None,
@@ -355,6 +417,10 @@ class LoRaE220:
         self.aux = None
         if self.aux_pin is not None:
             self.aux = machine.Pin(self.aux_pin, machine.Pin.IN)
+            try:
+                self.aux.irq(trigger=machine.Pin.IRQ_RISING, handler=self._on_aux_rising)
+            except (AttributeError, ValueError, OSError):
+                logger.debug("AUX IRQ not available, polling AUX instead")
         if self.m0_pin is not None and self.m1_pin is not None:
             self.m0 = machine.Pin(self.m0_pin, machine.Pin.OUT)
             self.m1 = machine.Pin(self.m1_pin, machine.Pin.OUT)
@@ -370,6 +436,13 @@ class LoRaE220:
         return code
 
     def set_mode(self, mode: ModeType) -> ResponseStatusCode:
+        self._mode_changing = True
+        try:
+            return self._set_mode(mode)
+        finally:
+            self._mode_changing = False
+
+    def _set_mode(self, mode: ModeType) -> ResponseStatusCode:
         self.managed_delay(40)
 
         if self.m0 is None and self.m1 is None:
@@ -407,16 +480,17 @@ class LoRaE220:
 
         return res
 
-    @staticmethod
-    def managed_delay(timeout):
-        t = utime.ticks_ms()
+    def managed_delay(self, timeout):
+        self.delay_hook(timeout)
 
-        # make darn sure ticks_ms() is not about to reach max data type limit and start over
-        if utime.ticks_add(t, timeout) == 0:
-            t = 0
+    def set_delay_hook(self, delay_hook):
+        self.delay_hook = delay_hook or utime.sleep_ms
 
-        while utime.ticks_diff(utime.ticks_ms(), t) < timeout:
-            pass
+    def busy(self) -> bool:
+        # True while the module cannot take a frame: a transmission is in
+        # progress, the mode is changing (a delay hook may be running the
+        # scheduler meanwhile) or the module is in program mode.
+        return self._tx_state != TX_IDLE or self._mode_changing or self.mode == ModeType.MODE_3_PROGRAM
 
     def wait_complete_response(self, timeout, wait_no_aux=100) -> ResponseStatusCode:
         result = ResponseStatusCode.E220_SUCCESS
@@ -431,6 +505,7 @@ class LoRaE220:
                     result = ResponseStatusCode.ERR_E220_TIMEOUT
                     logger.debug("Timeout error!")
                     return result
+                self.managed_delay(1)
 
             logger.debug("AUX HIGH!")
         else:
@@ -446,62 +521,156 @@ class LoRaE220:
             return ResponseStatusCode.ERR_E220_WRONG_UART_CONFIG
         return ResponseStatusCode.E220_SUCCESS
 
-    def set_configuration(self, configuration, permanentConfiguration=True) -> (ResponseStatusCode, Configuration):
-        # code = ResponseStatusCode.E220_SUCCESS
+    # Configuration cache: a shadow copy of registers 00H-07H (ADDH, ADDL, REG0-REG3,
+    # CRYPT_H, CRYPT_L) as last read from or acknowledged by the module. Reads are
+    # served from it and writes only send the registers that differ, so most calls
+    # never enter program mode (two mode switches of ~100 ms plus AUX waits).
+    # Several changes can be staged and written in a single program-mode session.
+    # The crypt key is write-only on the module: the shadow keeps the value written.
+
+    def _enter_program_mode(self):
         code = self.check_UART_configuration(ModeType.MODE_3_PROGRAM)
         if code != ResponseStatusCode.E220_SUCCESS:
             return code, None
-
         prev_mode = self.mode
-        code = self.set_mode(ModeType.MODE_3_PROGRAM)
+        if prev_mode != ModeType.MODE_3_PROGRAM:
+            code = self.set_mode(ModeType.MODE_3_PROGRAM)
+            self.config_stats["mode_switches"] += 1
+        return code, prev_mode
+
+    def _leave_program_mode(self, prev_mode) -> ResponseStatusCode:
+        if prev_mode is None or prev_mode == ModeType.MODE_3_PROGRAM:
+            return ResponseStatusCode.E220_SUCCESS
+        self.config_stats["mode_switches"] += 1
+        return self.set_mode(prev_mode)
+
+    def _register_transaction(self, command, address, data=None, length=None):
+        # One program command inside an open session; returns (code, register bytes).
+        length = len(data) if data is not None else length
+        request = bytearray([command, address, length])
+        if data is not None:
+            request += data
+        # Frames received before entering program mode would be read as the response.
+        if self.uart.any():
+            self.clean_UART_buffer()
+        if self.uart.write(request) != len(request):
+            return ResponseStatusCode.ERR_E220_DATA_SIZE_NOT_MATCH, None
+        self.managed_delay(50)
+        response = self.uart.read()
+        if response is None or len(response) != length + 3:
+            logger.debug("response: {}".format(response))
+            return ResponseStatusCode.ERR_E220_DATA_SIZE_NOT_MATCH, None
+        if response[0] == ProgramCommand.WRONG_FORMAT:
+            return ResponseStatusCode.ERR_E220_WRONG_FORMAT, None
+        if response[0] != ProgramCommand.RETURNED_COMMAND or response[1] != address or response[2] != length:
+            return ResponseStatusCode.ERR_E220_HEAD_NOT_RECOGNIZED, None
+        return ResponseStatusCode.E220_SUCCESS, response[3:]
+
+    def _configuration_from_shadow(self) -> Configuration:
+        configuration = Configuration(self.model)
+        configuration.from_bytes(bytes([ProgramCommand.RETURNED_COMMAND, RegisterAddress.REG_ADDRESS_CFG,
+                                        PacketLength.PL_CONFIGURATION]) + self._shadow)
+        return configuration
+
+    def invalidate_configuration(self):
+        # Forget the shadow copy (e.g. after the module was reset or reconfigured elsewhere).
+        self._shadow = None
+        self._staged = None
+        self.configuration = None
+
+    def get_configuration(self, refresh=False) -> (ResponseStatusCode, Configuration):
+        if self._shadow is not None and not refresh:
+            self.config_stats["cache_hits"] += 1
+            self.config_stats["mode_switches_avoided"] += 2
+            return ResponseStatusCode.E220_SUCCESS, self._configuration_from_shadow()
+
+        code, prev_mode = self._enter_program_mode()
+        logger.debug("set_mode: {}".format(code))
         if code != ResponseStatusCode.E220_SUCCESS:
             return code, None
-
-        configuration._STARTING_ADDRESS = RegisterAddress.REG_ADDRESS_CFG
-        configuration._LENGTH = PacketLength.PL_CONFIGURATION
-
-        if permanentConfiguration:
-            configuration._COMMAND = ProgramCommand.WRITE_CFG_PWR_DWN_SAVE
+        code, data = self._register_transaction(ProgramCommand.READ_CONFIGURATION, RegisterAddress.REG_ADDRESS_CFG,
+                                                length=PacketLength.PL_CONFIGURATION)
+        self.config_stats["reads"] += 1
+        if code == ResponseStatusCode.E220_SUCCESS:
+            crypt = self._shadow[6:] if self._shadow is not None else data[6:]
+            self._shadow = bytearray(data)
+            self._shadow[6:] = crypt
+            self._shadow_saved = True
         else:
-            configuration._COMMAND = ProgramCommand.WRITE_CFG_PWR_DWN_LOSE
-
-        data = configuration.to_bytes()
-        logger.debug("Writing configuration: {} size {}".format(configuration.to_hex_string(), len(data)))
-
-        len_writed = self.uart.write(data)
-        if len_writed != len(data):
-            self.set_mode(prev_mode)
+            self._shadow = None
+        leave = self._leave_program_mode(prev_mode)
+        if code == ResponseStatusCode.E220_SUCCESS:
+            code = leave
+        if code != ResponseStatusCode.E220_SUCCESS:
             return code, None
-
-        code = self.set_mode(prev_mode)
+        self.configuration = self._configuration_from_shadow()
+        return code, self._configuration_from_shadow()
+
+    def stage_configuration(self, configuration):
+        # Records the registers of `configuration` that differ from the shadow copy.
+        # Staged changes accumulate until commit_configuration(); without a shadow
+        # copy the last staged configuration is written whole.
+        registers = configuration.to_bytes()[3:3 + PacketLength.PL_CONFIGURATION]
+        if self._staged is not None:
+            self.config_stats["mode_switches_avoided"] += 2  # merged into the pending session
+        if self._shadow is None:
+            self._staged = bytearray(registers)
+            return
+        if self._staged is None:
+            self._staged = bytearray(self._shadow)
+        for i in range(PacketLength.PL_CONFIGURATION):
+            if registers[i] != self._shadow[i]:
+                self._staged[i] = registers[i]
+
+    def commit_configuration(self, permanentConfiguration=True) -> (ResponseStatusCode, Configuration):
+        # Writes the staged registers in one program-mode session, limited to the range
+        # that differs from the shadow copy. Nothing is sent if none differ, unless a
+        # permanent write must also save earlier temporary changes.
+        staged, self._staged = self._staged, None
+        if staged is None:
+            return ResponseStatusCode.E220_SUCCESS, self.configuration
+        first, last = 0, PacketLength.PL_CONFIGURATION - 1
+        if self._shadow is not None and (self._shadow_saved or not permanentConfiguration):
+            while first <= last and staged[first] == self._shadow[first]:
+                first += 1
+            while last >= first and staged[last] == self._shadow[last]:
+                last -= 1
+            if first > last:
+                self.config_stats["mode_switches_avoided"] += 2
+                return ResponseStatusCode.E220_SUCCESS, self._configuration_from_shadow()
+
+        code, prev_mode = self._enter_program_mode()
         if code != ResponseStatusCode.E220_SUCCESS:
             return code, None
-
-        data = self.uart.read()
-
-        if data is None or len(data) != PacketLength.PL_CONFIGURATION+3:
-            if data is not None:
-                logger.debug("data: {}".format(data))
-                logger.debug("data len: {}".format(len(data)))
-            code = ResponseStatusCode.ERR_E220_DATA_SIZE_NOT_MATCH
+        if permanentConfiguration:
+            command = ProgramCommand.WRITE_CFG_PWR_DWN_SAVE
+        else:
+            command = ProgramCommand.WRITE_CFG_PWR_DWN_LOSE
+        data = staged[first:last + 1]
+        logger.debug("Writing registers {}..{}: {}".format(first, last, data))
+        code, echoed = self._register_transaction(command, first, data)
+        self.config_stats["writes"] += 1
+        self.config_stats["bytes_written"] += len(data)
+        if code == ResponseStatusCode.E220_SUCCESS:
+            if self._shadow is None:
+                self._shadow = bytearray(staged)
+            for i in range(len(data)):
+                # The module echoes the crypt key as zeros: keep what was written.
+                self._shadow[first + i] = data[i] if first + i >= 6 else echoed[i]
+            self._shadow_saved = permanentConfiguration
+            self.configuration = self._configuration_from_shadow()
+        else:
+            self._shadow = None
+        leave = self._leave_program_mode(prev_mode)
+        if code == ResponseStatusCode.E220_SUCCESS:
+            code = leave
+        if code != ResponseStatusCode.E220_SUCCESS:
             return code, None
-        logger.debug("data: {}".format(data))
-        logger.debug("data len: {}".format(len(data)))
-
-        logger.debug("model: {}".format(self.model))
-        configuration = Configuration(self.model)
-        configuration.from_bytes(data)
-
-        if ProgramCommand.WRONG_FORMAT == configuration._COMMAND:
-            code = ResponseStatusCode.ERR_E220_WRONG_FORMAT
-        if ProgramCommand.RETURNED_COMMAND != configuration._COMMAND or \
-                RegisterAddress.REG_ADDRESS_CFG != configuration._STARTING_ADDRESS or \
-                PacketLength.PL_CONFIGURATION != configuration._LENGTH:
-            code = ResponseStatusCode.ERR_E220_HEAD_NOT_RECOGNIZED
-
-        self.clean_UART_buffer()
+        return code, self._configuration_from_shadow()
 
-        return code, configuration
+    def set_configuration(self, configuration, permanentConfiguration=True) -> (ResponseStatusCode, Configuration):
+        self.stage_configuration(configuration)
+        return self.commit_configuration(permanentConfiguration)
 
     def write_program_command(self, cmd, addr, pl) -> int:
         cmd = bytearray([cmd, addr, pl])
@@ -511,50 +680,12 @@ class LoRaE220:
 
         return size != 3
 
-    def get_configuration(self) -> (ResponseStatusCode, Configuration):
-        code = self.check_UART_configuration(ModeType.MODE_3_PROGRAM)
-        logger.debug("check_UART_configuration: {}".format(code))
-        if code != ResponseStatusCode.E220_SUCCESS:
-            return code, None
-
-        prev_mode = self.mode
-        code = self.set_mode(ModeType.MODE_3_PROGRAM)
-        if code != ResponseStatusCode.E220_SUCCESS:
-            return code, None
-        logger.debug("set_mode: {}".format(code))
-
-        self.write_program_command(
-            ProgramCommand.READ_CONFIGURATION,
-            RegisterAddress.REG_ADDRESS_CFG,
-            PacketLength.PL_CONFIGURATION)
-
-        data = self.uart.read()
-        if data is None or len(data) != PacketLength.PL_CONFIGURATION+3:
-            if data is not None:
-                logger.debug("data: {}".format(data))
-                logger.debug("data len: {}".format(len(data)))
-            code = ResponseStatusCode.ERR_E220_DATA_SIZE_NOT_MATCH
-            return code, None
-
-        logger.debug("data: {}".format(data))
-        logger.debug("data len: {}".format(len(data)))
-
-        logger.debug("model: {}".format(self.model))
-        configuration = Configuration(self.model)
-        configuration.from_bytes(data)
-        code = self.set_mode(prev_mode)
-
-        if ProgramCommand.WRONG_FORMAT == configuration._COMMAND:
-            code = ResponseStatusCode.ERR_E220_WRONG_FORMAT
-
-        if ProgramCommand.RETURNED_COMMAND != configuration._COMMAND or \
-                RegisterAddress.REG_ADDRESS_CFG != configuration._STARTING_ADDRESS or \
-                PacketLength.PL_CONFIGURATION != configuration._LENGTH:
-            code = ResponseStatusCode.ERR_E220_HEAD_NOT_RECOGNIZED
-
-        return code, configuration
-
     def get_module_information(self):
+        # The PID registers are read-only: read once, then served from the cache.
+        if self._module_information is not None:
+            self.config_stats["cache_hits"] += 1
+            self.config_stats["mode_switches_avoided"] += 2
+            return ResponseStatusCode.E220_SUCCESS, self._module_information
         code = self.check_UART_configuration(ModeType.MODE_3_PROGRAM)
         if code != ResponseStatusCode.E220_SUCCESS:
             return code, None
@@ -568,8 +699,8 @@ class LoRaE220:
             ProgramCommand.READ_CONFIGURATION, RegisterAddress.REG_ADDRESS_PID, PacketLength.PL_PID)
 
         module_information = ModuleInformation()
-        data = self.uart.read(4)
-        if data is None or len(data) != 4:
+        data = self.uart.read(PacketLength.PL_PID + 3)
+        if data is None or len(data) != PacketLength.PL_PID + 3:
             code = ResponseStatusCode.ERR_E220_DATA_SIZE_NOT_MATCH
             return code, None
 
@@ -590,6 +721,8 @@ class LoRaE220:
                 PacketLength.PL_PID != module_information._LENGTH:
             code = ResponseStatusCode.ERR_E220_HEAD_NOT_RECOGNIZED
 
+        if code == ResponseStatusCode.E220_SUCCESS:
+            self._module_information = module_information
         return code, module_information
 
     def reset_module(self) -> ResponseStatusCode:
@@ -654,9 +787,11 @@ class LoRaE220:
         elif size is not None:
             data = self.uart.read(size)
         else:
+            # Everything pending is returned; flushing afterwards would discard the
+            # start of any frame that arrived meanwhile (use a stream framer to
+            # split back-to-back frames).
             data = self.uart.read()
-            self.clean_UART_buffer()
-            if rssi:
+            if rssi and data:
                 rssi_value = data[-1]  # last byte is rssi
                 data = data[:-1]  # remove rssi from data
 
@@ -673,14 +808,22 @@ class LoRaE220:
     def clean_UART_buffer(self):
         self.uart.read()
 
-    def _read_until(self, terminator='\n') -> bytes:
-        line = b''
-        while True:
+    def _read_until(self, terminator='\n', timeout=1000) -> bytes:
+        # Accumulates into a bytearray (amortised O(1) append) and gives up after
+        # `timeout` ms without the terminator instead of blocking forever.
+        if isinstance(terminator, str):
+            terminator = terminator.encode('utf-8')
+        line = bytearray()
+        t = utime.ticks_ms()
+        while utime.ticks_diff(utime.ticks_ms(), t) < timeout:
             c = self.uart.read(1)
+            if not c:
+                self.managed_delay(1)
+                continue
             if c == terminator:
                 break
             line += c
-        return line
+        return bytes(line)
 
     def send_broadcast_message(self, CHAN, message) -> ResponseStatusCode:
         return self._send_message(message, BROADCAST_ADDRESS, BROADCAST_ADDRESS, CHAN)
@@ -689,11 +832,11 @@ class LoRaE220:
         message = ujson.dumps(dict_message)
         return self._send_message(message, BROADCAST_ADDRESS, BROADCAST_ADDRESS, CHAN)
 
-    def send_transparent_message(self, message) -> ResponseStatusCode:
-        return self._send_message(message)
+    def send_transparent_message(self, message, timeout=1000, airtime_ms=None) -> ResponseStatusCode:
+        return self._send_message(message, timeout=timeout, airtime_ms=airtime_ms)
 
-    def send_fixed_message(self, ADDH, ADDL, CHAN, message) -> ResponseStatusCode:
-        return self._send_message(message, ADDH, ADDL, CHAN)
+    def send_fixed_message(self, ADDH, ADDL, CHAN, message, timeout=1000, airtime_ms=None) -> ResponseStatusCode:
+        return self._send_message(message, ADDH, ADDL, CHAN, timeout=timeout, airtime_ms=airtime_ms)
 
     def send_fixed_dict(self, ADDH, ADDL, CHAN, dict_message) -> ResponseStatusCode:
         message = ujson.dumps(dict_message)
@@ -703,7 +846,29 @@ class LoRaE220:
         message = ujson.dumps(dict_message)
         return self._send_message(message)
 
-    def _send_message(self, message, ADDH=None, ADDL=None, CHAN=None) -> ResponseStatusCode:
+    def _send_message(self, message, ADDH=None, ADDL=None, CHAN=None, timeout=1000, airtime_ms=None) -> ResponseStatusCode:
+        if self.busy():
+            return ResponseStatusCode.ERR_E220_BUSY
+
+        # The delay hook may run the scheduler while AUX is low: busy() must hold
+        # for the whole send so nothing else writes to the module meanwhile.
+        # The RX buffer is not flushed afterwards: it may hold frames received
+        # before or during the send that the reader has not consumed yet.
+        self._tx_state = TX_BLOCKING
+        try:
+            result = self._write_message(message, ADDH, ADDL, CHAN)
+            if result != ResponseStatusCode.E220_SUCCESS:
+                return result
+
+            no_aux_ms = self._no_aux_ms(airtime_ms)
+            result = self.wait_complete_response(max(timeout, no_aux_ms), wait_no_aux=no_aux_ms)
+        finally:
+            self._tx_state = TX_IDLE
+
+        logger.debug("ok!")
+        return result
+
+    def _write_message(self, message, ADDH=None, ADDL=None, CHAN=None) -> ResponseStatusCode:
         result = ResponseStatusCode.E220_SUCCESS
 
         if isinstance(message, str): message = message.encode('utf-8')
@@ -729,18 +894,110 @@ class LoRaE220:
                 result = ResponseStatusCode.ERR_E220_NO_RESPONSE_FROM_DEVICE
             else:
                 result = ResponseStatusCode.ERR_E220_DATA_SIZE_NOT_MATCH
-        if result != ResponseStatusCode.E220_SUCCESS:
-            return result
+        self._tx_bytes = size_
+        return result
 
-        result = self.wait_complete_response(1000)
+    # Non-blocking transmission: send_async() writes the frame and returns at
+    # once; poll_tx(), called from the scheduler, follows AUX (rising-edge IRQ
+    # when available, polled level otherwise) until the module is idle again.
+    # As in the blocking path the UART RX buffer is not flushed afterwards,
+    # so frames received during the airtime are kept. Without AUX, both paths
+    # wait for the UART transfer plus the airtime_ms passed by the caller.
+
+    def _no_aux_ms(self, airtime_ms):
+        # Expected end of a send without AUX: UART transfer plus the time on air
+        # given by the caller (the driver does not model the radio). Without an
+        # estimate, the fixed 100 ms wait of the original library.
+        if airtime_ms is None:
+            return 100
+        return self._tx_bytes * 10000 // self.uart_baudrate + 1 + airtime_ms
+
+    def send_async(self, message, ADDH=None, ADDL=None, CHAN=None, timeout=1000, airtime_ms=None) -> ResponseStatusCode:
+        if self.busy():
+            return ResponseStatusCode.ERR_E220_BUSY
+
+        self._aux_seen_low = False
+        self._aux_rose = False
+        result = self._write_message(message, ADDH, ADDL, CHAN)
         if result != ResponseStatusCode.E220_SUCCESS:
+            self._tx_result = result
             return result
-        logger.debug("Clear buffer...")
-        self.clean_UART_buffer()
 
-        logger.debug("ok!")
+        self._tx_started = utime.ticks_ms()
+        self._tx_timeout = timeout
+        if self.aux is None:
+            self._tx_no_aux_ms = self._no_aux_ms(airtime_ms)
+            self._tx_timeout = max(timeout, self._tx_no_aux_ms)
+        self._tx_state = TX_WAIT_AUX
         return result
 
+    def poll_tx(self):
+        """
+        Advances the transmit state machine without blocking. Returns None while
+        a transmission is in progress, otherwise the ResponseStatusCode of the
+        last one.
+        """
+        state = self._tx_state
+        if state == TX_IDLE:
+            return self._tx_result
+        if state == TX_BLOCKING:
+            return None
+
+        now = utime.ticks_ms()
+        if state == TX_WAIT_AUX:
+            elapsed = utime.ticks_diff(now, self._tx_started)
+            if self.aux is None:
+                done = elapsed >= self._tx_no_aux_ms
+            elif self.aux.value() == 0:
+                self._aux_seen_low = True
+                done = False
+            else:
+                # AUX may not have dropped yet right after the write: without an
+                # observed low level or edge, wait at least the UART transfer time.
+                uart_ms = self._tx_bytes * 10000 // self.uart_baudrate + 1
+                done = self._aux_seen_low or self._aux_rose or elapsed >= uart_ms
+            if done:
+                self._tx_settle_at = utime.ticks_add(now, 20)
+                self._tx_state = TX_SETTLE
+            elif elapsed > self._tx_timeout:
+                logger.debug("Timeout error!")
+                self._tx_state = TX_IDLE
+                self._tx_result = ResponseStatusCode.ERR_E220_TIMEOUT
+                return self._tx_result
+            else:
+                return None
+
+        if utime.ticks_diff(now, self._tx_settle_at) < 0:
+            return None
+        self._tx_state = TX_IDLE
+        self._tx_result = ResponseStatusCode.E220_SUCCESS
+        return self._tx_result
+
+    def tx_busy(self) -> bool:
+        return self.poll_tx() is None
+
+    def _on_aux_rising(self, pin):
+        self._aux_rose = True
+
+    def sub_packet_size(self) -> int:
+        # Largest payload the module sends as a single air packet. Uses the last
+        # configuration read from/written to the module, or the default otherwise.
+        if self.configuration is None:
+            return MAX_SIZE_TX_PACKET
+        return SubPacketSetting.get_size(self.configuration.OPTION.subPacketSetting) or MAX_SIZE_TX_PACKET
+
+    def air_data_rate(self) -> int:
+        # Air data rate of the last known configuration (module default otherwise).
+        if self.configuration is None:
+            return AirDataRate.AIR_DATA_RATE_010_24
+        return self.configuration.SPED.airDataRate
+
+    def channel(self) -> int:
+        # Channel used by transparent transmissions, from the last known configuration.
+        if self.configuration is None:
+            return Configuration(self.model).CHAN
+        return self.configuration.CHAN
+
     def available(self) -> int:
         return self.uart.any()
 
@@ -114,6 +114,19 @@ class SubPacketSetting:
         else:
             return "Invalid Sub Packet Setting!"
 
+    @staticmethod
+    def get_size(sub_packet_setting):
+        if sub_packet_setting == SubPacketSetting.SPS_200_00:
+            return 200
+        elif sub_packet_setting == SubPacketSetting.SPS_128_01:
+            return 128
+        elif sub_packet_setting == SubPacketSetting.SPS_064_10:
+            return 64
+        elif sub_packet_setting == SubPacketSetting.SPS_032_11:
+            return 32
+        else:
+            return None
+
 
 class RssiAmbientNoiseEnable:
     RSSI_AMBIENT_NOISE_ENABLED = 0b1
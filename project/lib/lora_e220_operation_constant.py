@@ -59,6 +59,7 @@ class ResponseStatusCode:
     ERR_E220_JSON_PARSE = 15
     ERR_E220_DEINIT_UART_FAILED = 16
     ERR_E220_WRONG_FORMAT = 17
+    ERR_E220_BUSY = 18
 
     @staticmethod
     def get_description(status):
@@ -96,6 +97,8 @@ class ResponseStatusCode:
             return "Deinit UART failed!"
         elif status == ResponseStatusCode.ERR_E220_WRONG_FORMAT:
             return "Wrong format!"
+        elif status == ResponseStatusCode.ERR_E220_BUSY:
+            return "Transmission in progress!"
         else:
             return "Invalid status!"
 
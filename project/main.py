@@ -1,21 +1,39 @@
 import time, gc, json, sys
 import hardware, board, modules
+from lib.lora_e220 import yielding_delay
 from config import config_manager
 from pubsub import event_manager
 
+# Reinicialización pendiente: None, 'modules' o 'hardware' (que incluye a los módulos).
+_pending_reinit = None
+
 def handle_config_change(key, value):
     """
     Callback que se ejecuta cuando ConfigManager publica un cambio.
-    Decide qué sistema necesita ser reinicializado.
+    Decide qué sistema necesita ser reinicializado. No lo hace aquí: el cambio
+    puede llegar desde modules.update() dentro de un envío bloqueante (vía el
+    delay hook del driver), así que solo se marca y lo aplica el ciclo principal.
     """
+    global _pending_reinit
     print(f"\n[Main] Se detectó un cambio de configuración en '{key}'.")
     
     if key.startswith('HARDWARE_CONFIGURATION'):
+        _pending_reinit = 'hardware'
+        
+    elif key.startswith('MODULE_CONFIGURATION') or key.startswith('MODULE_REGISTRY'):
+        if _pending_reinit is None: _pending_reinit = 'modules'
+
+def apply_pending_reinit():
+    """Aplica la reinicialización pendiente cuando ningún driver está ocupado."""
+    global _pending_reinit
+    if _pending_reinit is None or hardware.busy(): return
+    pending, _pending_reinit = _pending_reinit, None
+    if pending == 'hardware':
         hardware.reinit()
         # Dado que el hardware cambió, los módulos que dependen de él también deben reiniciarse.
         modules.reinit()
-        
-    elif key.startswith('MODULE_CONFIGURATION') or key.startswith('MODULE_REGISTRY'):
+        hardware.set_driver_delay_hook(yielding_delay(modules.update))
+    else:
         modules.reinit()
 
 # --- setup ---
@@ -25,6 +43,8 @@ event_manager.subscribe('config:updated', handle_config_change)
 gc.enable()
 hardware.init()
 modules.init()
+# Durante los cambios de modo del módulo LoRa los demás módulos siguen corriendo.
+hardware.set_driver_delay_hook(yielding_delay(modules.update))
 print("SYSTEM_ID:",config_manager.get("SYSTEM_ID"))
 print("SYSTEM_NAME:",config_manager.get("SYSTEM_NAME"))
 #print(modules._modules)
@@ -35,6 +55,7 @@ try:
         hardware.update()
         hardware.process_irq_events()
         modules.update()
+        apply_pending_reinit()
         time.sleep_ms(10)
         #print(board.messages)
         if time.ticks_ms() % 60000 < 10:
@@ -0,0 +1,503 @@
+import time, random
+from array import array
+from protocol import HEADER_SIZE, OFF_SRC, OFF_TTL, OFF_SEQ, OFF_COMMAND, CMD_TIME_SYNC, TIME_SYNC_RESIDENCE, ROUTE_AD
+
+# --- Estructuras de la Red Mesh ---
+# Estado de tamaño fijo para el reenvío de paquetes. Todo se reserva al crear
+# los objetos para no fragmentar el heap del nodo mientras la red está activa.
+
+def frame_digest(frame) -> int:
+    """
+    Resumen de 16 bits de una trama, sin contar el TTL ni la residencia de
+    CMD_TIME_SYNC, que cambian en cada salto: las copias de un mismo paquete
+    que llegan por vecinos distintos dan el mismo valor.
+    """
+    h = 0x811C
+    end = len(frame)
+    if end > TIME_SYNC_RESIDENCE and frame[OFF_COMMAND] == CMD_TIME_SYNC: end = TIME_SYNC_RESIDENCE
+    for i in range(end):
+        if i != OFF_TTL:
+            h = ((h ^ frame[i]) * 0x3B) & 0xFFFF
+    return h
+
+class DuplicateCache:
+    """
+    Caché de paquetes ya reenviados, asociativa de 2 vías sobre arrays
+    preasignados. La clave es (src_id, seq) más el resumen de la trama, que
+    distingue los paquetes sin número de secuencia (seq 0). Búsqueda e
+    inserción en O(1); las entradas caducan tras ttl_ms y, si el conjunto está
+    lleno, se reemplaza la más antigua.
+    """
+    WAYS = 2
+    ENTRY_BYTES = 8  # 2 (src/seq) + 2 (resumen) + 4 (marca de tiempo)
+
+    def __init__(self, entries: int = 64, ttl_ms: int = 10000):
+        sets = 1
+        while sets * self.WAYS < entries: sets <<= 1
+        self.mask = sets - 1
+        size = sets * self.WAYS
+        self.ttl_ms = ttl_ms
+        zeros = [0] * size
+        self._ids = array('H', zeros)
+        self._sums = array('H', zeros)
+        self._stamps = array('l', zeros)
+        self._used = bytearray(size)
+        self.stats = {"inserted": 0, "duplicates": 0, "evicted": 0}
+
+    @property
+    def size(self) -> int:
+        return len(self._used)
+
+    def memory_bytes(self) -> int:
+        """Bytes de datos de las tablas en el ESP32 (sin la cabecera de los objetos)."""
+        return self.size * (self.ENTRY_BYTES + 1)
+
+    def seen(self, frame, now: int = None) -> bool:
+        """
+        Registra la trama y retorna True si ya se había visto dentro de ttl_ms.
+        """
+        if now is None: now = time.ticks_ms()
+        key = (frame[OFF_SRC] << 8) | frame[OFF_SEQ]
+        digest = frame_digest(frame) if len(frame) >= HEADER_SIZE else 0
+        base = ((key ^ digest) & self.mask) * self.WAYS
+        victim, oldest = base, -1
+        for slot in range(base, base + self.WAYS):
+            if not self._used[slot]:
+                if oldest < self.ttl_ms: victim, oldest = slot, self.ttl_ms
+                continue
+            age = time.ticks_diff(now, self._stamps[slot])
+            if age >= self.ttl_ms:
+                self._used[slot] = 0
+                if oldest < self.ttl_ms: victim, oldest = slot, self.ttl_ms
+                continue
+            if self._ids[slot] == key and self._sums[slot] == digest:
+                self.stats["duplicates"] += 1
+                return True
+            if age > oldest: victim, oldest = slot, age
+        if self._used[victim]: self.stats["evicted"] += 1
+        self._ids[victim] = key
+        self._sums[victim] = digest
+        self._stamps[victim] = now
+        self._used[victim] = 1
+        self.stats["inserted"] += 1
+        return False
+
+# Los ids de nodo ocupan un byte: las tablas se indexan directamente por id.
+NODE_IDS = 256
+
+def seq_newer(a: int, b: int) -> bool:
+    """True si el número de secuencia de 8 bits `a` es posterior a `b` (aritmética serial)."""
+    return 0 < ((a - b) & 0xFF) < 0x80
+
+class RouteTable:
+    """
+    Tabla de vector de distancias de capacidad fija indexada por id de destino:
+    costo, siguiente salto, número de secuencia, estado y hora de actualización
+    en arrays paralelos. Un costo INFINITY marca la ausencia de ruta. Admite
+    `dest in tabla` e iteración sobre los destinos con ruta.
+
+    Cada destino origina su número de secuencia (par) y lo incrementa en cada
+    anuncio completo; quien pierde una ruta la anuncia inalcanzable con el
+    número siguiente (impar) y la retiene holddown_ms desde la pérdida (la hora
+    de actualización). Las rutas nuevas, perdidas o con un cambio de costo
+    significativo quedan marcadas para el próximo anuncio parcial.
+    """
+    INFINITY = 0xFFFF
+    ENTRY_BYTES = 9   # 2 (costo) + 1 (siguiente salto) + 1 (secuencia) + 1 (estado) + 4 (marca de tiempo)
+    CHANGED = 0x01    # pendiente de anunciar en un anuncio parcial
+    HOLD = 0x02       # ruta perdida en retención: solo se acepta información más nueva
+    KNOWN = 0x04      # el número de secuencia es válido
+
+    def __init__(self, size: int = NODE_IDS, switch_pct: int = 12, holddown_ms: int = 60000):
+        self._cost = array('H', [self.INFINITY] * size)
+        self._next_hop = bytearray(size)
+        self._seq = bytearray(size)
+        self._flags = bytearray(size)
+        self._updated = array('l', [0] * size)
+        self._count = 0
+        self._high = 0  # uno más que el mayor id conocido: acota los recorridos
+        self.pending = 0  # destinos marcados CHANGED
+        self.stats = {"switched": 0, "lost": 0}
+        # Histéresis: otro siguiente salto debe mejorar el costo al menos switch_pct por ciento.
+        self.switch_pct = switch_pct
+        self.holddown_ms = holddown_ms
+
+    def memory_bytes(self) -> int:
+        """Bytes de datos de la tabla en el ESP32 (sin la cabecera de los objetos)."""
+        return len(self._next_hop) * self.ENTRY_BYTES
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, dest_id):
+        return 0 <= dest_id < len(self._cost) and self._cost[dest_id] != self.INFINITY
+
+    def __iter__(self):
+        cost = self._cost
+        for dest_id in range(self._high):
+            if cost[dest_id] != self.INFINITY: yield dest_id
+
+    def cost(self, dest_id: int) -> int:
+        """Costo de la ruta o INFINITY si no hay."""
+        return self._cost[dest_id]
+
+    def next_hop(self, dest_id: int):
+        """Siguiente salto hacia dest_id o None si no hay ruta."""
+        return self._next_hop[dest_id] if self._cost[dest_id] != self.INFINITY else None
+
+    def seq(self, dest_id: int) -> int:
+        return self._seq[dest_id]
+
+    def updated(self, dest_id: int) -> int:
+        return self._updated[dest_id]
+
+    def better(self, dest_id: int, cost: int) -> bool:
+        """True si `cost` mejora la ruta actual lo suficiente para cambiar de siguiente salto."""
+        return cost * 100 < self._cost[dest_id] * (100 - self.switch_pct)
+
+    def _mark(self, dest_id: int):
+        if not self._flags[dest_id] & self.CHANGED:
+            self._flags[dest_id] |= self.CHANGED
+            self.pending += 1
+
+    def set(self, dest_id: int, next_hop: int, cost: int, seq: int, now: int):
+        """Instala o actualiza la ruta; la marca si es nueva o si su costo varía más de un 25 %."""
+        cost = min(cost, self.INFINITY - 1)
+        old = self._cost[dest_id]
+        if old == self.INFINITY:
+            self._count += 1
+            if dest_id >= self._high: self._high = dest_id + 1
+            self._mark(dest_id)
+        else:
+            if self._next_hop[dest_id] != next_hop: self.stats["switched"] += 1
+            if abs(cost - old) * 4 > old: self._mark(dest_id)
+        self._cost[dest_id] = cost
+        self._next_hop[dest_id] = next_hop
+        self._seq[dest_id] = seq
+        self._flags[dest_id] = (self._flags[dest_id] | self.KNOWN) & ~self.HOLD
+        self._updated[dest_id] = now
+
+    def invalidate(self, dest_id: int, now: int, seq: int = None):
+        """
+        Marca la ruta como perdida y la retiene holddown_ms. Sin `seq`, el número
+        pasa al impar siguiente: la pérdida se anuncia como información más nueva.
+        """
+        if self._cost[dest_id] == self.INFINITY: return
+        self._cost[dest_id] = self.INFINITY
+        self._count -= 1
+        self.stats["lost"] += 1
+        if seq is None:
+            seq = self._seq[dest_id]
+            if not seq & 1: seq = (seq + 1) & 0xFF
+        self._seq[dest_id] = seq
+        self._flags[dest_id] |= self.HOLD
+        self._updated[dest_id] = now
+        self._mark(dest_id)
+
+    def invalidate_via(self, next_hop: int, now: int) -> int:
+        """Invalida las rutas que pasan por next_hop. Retorna cuántas se invalidaron."""
+        cost, hops, lost = self._cost, self._next_hop, 0
+        for dest_id in range(self._high):
+            if hops[dest_id] == next_hop and cost[dest_id] != self.INFINITY:
+                self.invalidate(dest_id, now)
+                lost += 1
+        return lost
+
+    def merge(self, src_id: int, link_cost: int, buf, start: int, end: int, my_id: int, now: int):
+        """
+        Incorpora los registros ROUTE_AD (dest_id, siguiente salto del vecino,
+        seq, costo) de buf[start:end], leídos en el lugar, anunciados por el
+        vecino src_id a link_cost de este nodo.
+
+        - Horizonte dividido con envenenamiento: una ruta del vecino que pasa por
+          este nodo cuenta como inalcanzable.
+        - El siguiente salto actual es la referencia de la ruta: sus anuncios se
+          aceptan siempre, también los que la pierden.
+        - De otros vecinos se acepta una ruta que mejore la actual en más de
+          switch_pct por ciento, con secuencia igual o más nueva; en
+          retención, solo con secuencia más nueva que la pérdida.
+
+        Es el camino caliente de cada anuncio recibido: la actualización de la
+        ruta, la retención, la histéresis y la marca van en línea sobre los
+        arrays ligados a variables locales.
+        """
+        INF = self.INFINITY
+        CHANGED, HOLD, KNOWN = self.CHANGED, self.HOLD, self.KNOWN
+        costs, hops, seqs, flags, updated = self._cost, self._next_hop, self._seq, self._flags, self._updated
+        keep_pct = 100 - self.switch_pct
+        holddown_ms = self.holddown_ms
+        ticks_diff = time.ticks_diff
+        for offset in range(start, end, ROUTE_AD.size):
+            dest_id = buf[offset]
+            if dest_id == my_id: continue
+            seq = buf[offset + 2]
+            cost = (buf[offset + 3] << 8) | buf[offset + 4]
+            if cost == INF or buf[offset + 1] == my_id: total = INF
+            else:
+                total = cost + link_cost
+                if total >= INF: total = INF - 1
+            current = costs[dest_id]
+            via_src = current != INF and hops[dest_id] == src_id
+            if via_src:
+                if total == current:
+                    # Caso común con la tabla convergida: solo se refresca la ruta.
+                    seqs[dest_id] = seq
+                    updated[dest_id] = now
+                    continue
+                if total == INF:
+                    self.invalidate(dest_id, now, seq if seq & 1 else None)
+                    continue
+            flag = flags[dest_id]
+            if via_src: pass
+            elif total == INF:
+                continue
+            elif current == INF:
+                # En retención solo pasa información más nueva que la pérdida.
+                if flag & HOLD and flag & KNOWN:
+                    if ticks_diff(now, updated[dest_id]) < holddown_ms:
+                        if not 0 < ((seq - seqs[dest_id]) & 0xFF) < 0x80: continue
+                    else:
+                        flag &= ~HOLD
+            elif total * 100 >= current * keep_pct or (flag & KNOWN and 0 < ((seqs[dest_id] - seq) & 0xFF) < 0x80):
+                continue
+            if current == INF:
+                self._count += 1
+                if dest_id >= self._high: self._high = dest_id + 1
+                mark = True
+            else:
+                if not via_src: self.stats["switched"] += 1
+                diff = total - current
+                mark = diff * 4 > current or -diff * 4 > current
+            if mark and not flag & CHANGED:
+                flag |= CHANGED
+                self.pending += 1
+            costs[dest_id] = total
+            hops[dest_id] = src_id
+            seqs[dest_id] = seq
+            flags[dest_id] = (flag | KNOWN) & ~HOLD
+            updated[dest_id] = now
+
+    def pack_into(self, buf, offset: int, start: int, limit: int, changed_only: bool, now: int):
+        """
+        Escribe registros ROUTE_AD (dest_id, siguiente salto, seq, costo) en buf
+        desde offset, a partir del destino `start` y hasta `limit` registros:
+        las rutas válidas y las perdidas aún en retención (costo INFINITY), o
+        solo las marcadas si changed_only. Las escritas dejan de estar marcadas.
+        Retorna (registros escritos, siguiente destino); cuando ya no quedan
+        rutas, el siguiente llamado escribe 0 registros, así un anuncio que no
+        cabe en una trama se reparte en varias.
+        """
+        INF, CHANGED, HOLD = self.INFINITY, self.CHANGED, self.HOLD
+        costs, hops, seqs, flags, updated = self._cost, self._next_hop, self._seq, self._flags, self._updated
+        holddown_ms = self.holddown_ms
+        pack, step = ROUTE_AD.st.pack_into, ROUTE_AD.size
+        end, count, cleared = self._high, 0, 0
+        dest_id = start
+        while dest_id < end and count < limit:
+            flag = flags[dest_id]
+            if changed_only: wanted = flag & CHANGED
+            elif costs[dest_id] != INF: wanted = True
+            elif flag & HOLD:
+                wanted = time.ticks_diff(now, updated[dest_id]) < holddown_ms
+                if not wanted: flags[dest_id] = flag = flag & ~HOLD
+            else: wanted = False
+            if wanted:
+                pack(buf, offset, dest_id, hops[dest_id], seqs[dest_id], costs[dest_id])
+                offset += step
+                count += 1
+                if flag & CHANGED:
+                    flags[dest_id] = flag & ~CHANGED
+                    cleared += 1
+            dest_id += 1
+        self.pending -= cleared
+        return count, dest_id
+
+class NeighborTable:
+    """
+    Vecinos oídos directamente, con un estimador de calidad de enlace de
+    memoria fija por vecino en arrays paralelos indexados por id:
+
+    - RSSI y SNR en promedio móvil exponencial (EWMA, peso 1/8 por muestra),
+      en dB x16. El E220 no entrega la SNR: se estima como RSSI menos el piso
+      de ruido del receptor para la velocidad de aire.
+    - Tasa de entrega (PDR, Q12) deducida de los huecos en la secuencia de
+      HELLO: cada HELLO perdido cuenta como un fallo y cada recibido como un
+      acierto, en un EWMA de peso 1/16.
+    - Costo del enlace tipo ETX: COST_UNIT / PDR², suponiendo enlaces
+      simétricos, más un cuarto de COST_UNIT por cada dB que falte para tener
+      margin_db sobre la SNR mínima demodulable.
+    - Plazo de silencio tolerado, tomado del último HELLO del vecino (su
+      intervalo Trickle cambia); sin él rige el timeout de expire().
+    """
+    ENTRY_BYTES = 16  # 2 (RSSI) + 2 (SNR) + 2 (PDR) + 2 (costo) + 4 (marca de tiempo) + 2 (plazo) + 1 (secuencia) + 1 (estado)
+    COST_UNIT = 16    # costo de un enlace perfecto (ETX 1)
+    PDR_ONE = 4096    # PDR 1.0 en Q12
+    PDR_START = 3072  # un vecino nuevo empieza en 3/4 y se ajusta con cada HELLO
+    PDR_MIN = 256     # 1/16: acota el costo de un enlace en 256 COST_UNIT
+    EWMA_SHIFT = 3
+    PDR_SHIFT = 4
+    MAX_GAP = 16      # un hueco mayor en la secuencia de HELLO es un reinicio del vecino
+    SEEN, SEQ_KNOWN = 0x01, 0x02
+
+    def __init__(self, size: int = NODE_IDS, noise_floor_dbm: float = -117, snr_min_db: float = -12.5, margin_db: float = 6):
+        self._rssi = array('h', [0] * size)
+        self._snr = array('h', [0] * size)
+        self._pdr = array('H', [0] * size)
+        self._cost = array('H', [0] * size)
+        self._last_seen = array('l', [0] * size)
+        self._hold = array('H', [0] * size)
+        self._seq = bytearray(size)
+        self._state = bytearray(size)
+        self._count = 0
+        self.noise_floor = int(noise_floor_dbm * 16)
+        self.snr_target = int((snr_min_db + margin_db) * 16)
+
+    def memory_bytes(self) -> int:
+        """Bytes de datos de la tabla en el ESP32 (sin la cabecera de los objetos)."""
+        return len(self._state) * self.ENTRY_BYTES
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, node_id):
+        return 0 <= node_id < len(self._state) and self._state[node_id] & self.SEEN != 0
+
+    def __iter__(self):
+        state = self._state
+        for node_id in range(len(state)):
+            if state[node_id] & self.SEEN: yield node_id
+
+    def known(self, node_id: int) -> bool:
+        """True si el vecino se oyó alguna vez, aunque haya expirado."""
+        return self._state[node_id] != 0
+
+    def rssi(self, node_id: int) -> float:
+        """RSSI promedio en dBm."""
+        return self._rssi[node_id] / 16
+
+    def snr(self, node_id: int) -> float:
+        """SNR promedio estimada en dB."""
+        return self._snr[node_id] / 16
+
+    def pdr(self, node_id: int) -> float:
+        return self._pdr[node_id] / self.PDR_ONE
+
+    def cost(self, node_id: int) -> int:
+        return self._cost[node_id]
+
+    def last_seen(self, node_id: int) -> int:
+        return self._last_seen[node_id]
+
+    def observe(self, node_id: int, rssi_dbm, hello_seq, now: int, hold_s: int = 0) -> int:
+        """
+        Registra un paquete recibido directamente del vecino: rssi_dbm es None
+        si el módulo no entrega RSSI y hello_seq es None si no es un HELLO.
+        hold_s, si no es 0, reemplaza el plazo de silencio del vecino.
+        Retorna el costo actualizado del enlace.
+        """
+        state = self._state[node_id]
+        if not state & self.SEEN: self._count += 1
+        if not state: self._pdr[node_id] = self.PDR_START
+        if rssi_dbm is not None:
+            sample = int(rssi_dbm * 16)
+            if not state:
+                self._rssi[node_id] = sample
+                self._snr[node_id] = sample - self.noise_floor
+            else:
+                self._rssi[node_id] += (sample - self._rssi[node_id]) >> self.EWMA_SHIFT
+                self._snr[node_id] += (sample - self.noise_floor - self._snr[node_id]) >> self.EWMA_SHIFT
+        if hello_seq is not None:
+            pdr = self._pdr[node_id]
+            if state & self.SEQ_KNOWN:
+                gap = (hello_seq - self._seq[node_id]) & 0xFF
+                if gap > self.MAX_GAP: pdr = self.PDR_START
+                elif gap:
+                    for _ in range(gap - 1): pdr -= pdr >> self.PDR_SHIFT
+                    pdr += (self.PDR_ONE - pdr) >> self.PDR_SHIFT
+            self._pdr[node_id] = pdr
+            self._seq[node_id] = hello_seq
+            state |= self.SEQ_KNOWN
+        if hold_s: self._hold[node_id] = min(hold_s, 0xFFFF)
+        self._state[node_id] = state | self.SEEN
+        self._last_seen[node_id] = now
+        pdr = max(self._pdr[node_id], self.PDR_MIN)
+        cost = (self.COST_UNIT * self.PDR_ONE * self.PDR_ONE) // (pdr * pdr)
+        deficit = self.snr_target - self._snr[node_id]
+        if deficit > 0 and rssi_dbm is not None: cost += self.COST_UNIT * deficit // 64
+        self._cost[node_id] = cost
+        return cost
+
+    def expire(self, now: int, timeout_ms: int):
+        """
+        Quita y entrega uno a uno los vecinos no oídos en más de su plazo de
+        silencio (timeout_ms si no anunciaron uno). El estimador conserva su
+        historia: si el vecino vuelve, los HELLO perdidos mientras tanto
+        cuentan en su PDR.
+        """
+        state, seen, hold = self._state, self._last_seen, self._hold
+        for node_id in range(len(state)):
+            if state[node_id] & self.SEEN and time.ticks_diff(now, seen[node_id]) > (hold[node_id] * 1000 or timeout_ms):
+                state[node_id] &= ~self.SEEN
+                self._count -= 1
+                yield node_id
+
+class Trickle:
+    """
+    Temporizador Trickle (RFC 6206) sobre ticks_ms. El intervalo I empieza en
+    imin_ms y se duplica al terminar cada intervalo hasta imax_ms. En cada
+    intervalo se transmite una vez, en un instante al azar de [I/2, I), salvo
+    que ya se hayan oído k mensajes consistentes (k = 0: nunca se suprime).
+    Una inconsistencia vuelve I a imin_ms y empieza un intervalo nuevo.
+    """
+    def __init__(self, imin_ms: int, imax_ms: int, k: int = 0):
+        self.imin = imin_ms
+        self.imax = max(imax_ms, imin_ms)
+        self.k = k
+        self.interval = imin_ms
+        self.counter = 0
+        self._start = 0
+        self._fire_at = 0
+        self._fired = False
+        self.stats = {"sent": 0, "suppressed": 0, "resets": 0}
+
+    def start(self, now: int):
+        self.interval = self.imin
+        self._begin(now)
+
+    def _begin(self, now: int):
+        self._start = now
+        self.counter = 0
+        self._fired = False
+        half = self.interval // 2
+        # getrandbits(8) evita enteros largos: half * 255 < 2**30 hasta intervalos de unas 2 h.
+        self._fire_at = time.ticks_add(now, half + ((half * random.getrandbits(8)) >> 8))
+
+    def heard(self):
+        """Registra un mensaje consistente oído en el intervalo actual."""
+        self.counter += 1
+
+    def reset(self, now: int):
+        """Inconsistencia: vuelve al intervalo mínimo (si ya está en él, no hace nada)."""
+        if self.interval == self.imin: return
+        self.stats["resets"] += 1
+        self.interval = self.imin
+        self._begin(now)
+
+    def check(self, now: int) -> bool:
+        """True una vez por intervalo, en el instante elegido, si la transmisión no se suprimió."""
+        fire = False
+        if not self._fired and time.ticks_diff(now, self._fire_at) >= 0:
+            self._fired = True
+            if self.k and self.counter >= self.k: self.stats["suppressed"] += 1
+            else:
+                self.stats["sent"] += 1
+                fire = True
+        if time.ticks_diff(now, time.ticks_add(self._start, self.interval)) >= 0:
+            self.interval = min(self.interval * 2, self.imax)
+            self._begin(now)
+        return fire
+
+    def horizon_ms(self, now: int) -> int:
+        """Plazo máximo hasta la próxima transmisión: lo que queda del intervalo más el siguiente."""
+        left = self.interval - time.ticks_diff(now, self._start)
+        return max(left, 0) + min(self.interval * 2, self.imax)
@@ -1,6 +1,6 @@
 # --- START OF FILE modules.py ---
 
-import sys, time, struct
+import sys, time, random
 from machine import RTC
 import board
 import hardware
@@ -11,12 +11,22 @@ from pubsub import event_manager
 
 # --- Importaciones del Protocolo y Constantes ---
 from protocol import (
-    build_packet, parse_packet, BROADCAST_ID, INITIAL_TTL,
-    FRAME_TYPE_CMD, FRAME_TYPE_RESP,
-    CMD_HELLO, CMD_ROUTE_AD, CMD_GET_SENSOR_STATUS, CMD_GET_PARAM, 
-    CMD_SET_PARAM, DTYPE_BOOL, DTYPE_UINT, DTYPE_SINT, DTYPE_FLOAT,
-    CMD_UPDATE_RTC, CMD_MODULE_CTRL
+    build_packet, build_command, parse_packet, param_dtype, BROADCAST_ID, INITIAL_TTL,
+    FRAME_TYPE_CMD, FRAME_TYPE_RESP, FRAME_TYPE_ACK, FRAME_TYPE_NACK, FLAG_ACK_REQUIRED, pack_header_into, HEADER_SIZE, SENSOR_BATCH, ROUTE_AD, HELLO_UNIT_S, SeriesEncoder,
+    LOG_RECORDS, CMD_HELLO, CMD_ROUTE_AD, CMD_GET_SENSOR_STATUS, CMD_SENSOR_BATCH, CMD_SENSOR_SERIES, CMD_SENSOR_BACKLOG, CMD_GET_PARAM, 
+    CMD_SET_PARAM, CMD_UPDATE_RTC, CMD_MODULE_CTRL, CMD_SET_SLOT, CMD_TIME_SYNC, CMD_FRAGMENT, CMD_FRAGMENT_STATUS,
+    OFF_DEST, OFF_SRC, OFF_TTL, OFF_CONTROL, OFF_COMMAND, FRAME_TYPE_MASK, TIMESTAMP, TIME_SYNC, TIME_SYNC_T1, TIME_SYNC_T3
 )
+from transport import ReliableChannel
+from queues import PRIO_CONTROL, PRIO_REPORT, PRIO_BULK
+from mesh import DuplicateCache, NeighborTable, RouteTable, Trickle
+from fragment import FragmentChannel
+from schedule import SlotSchedule, SCHEDULE_INTERVAL
+from datalog import RingLog, LOG_FLAG_UNSYNCED, LOG_FLAG_NO_PRESSURE, LOG_FLAG_NO_TEMPERATURE
+from backlog import Backlog, BACKLOG_OLDEST
+from timesync import ClockSync, diff_ms, add_residence
+from airtime import AirtimeModel, DutyCycle, noise_floor_dbm, snr_min_db
+from lib.lora_e220 import BROADCAST_ADDRESS, MAX_SIZE_TX_PACKET, ResponseStatusCode
 from env import BASE_STATION_ID, MODULE_REGISTRY
 
 # --- Diccionario Global de Módulos ---
@@ -68,20 +78,105 @@ class _BaseModule:
     def check(self, timer="timer0"): return self.timer[timer].check()
 
 class Clock(_BaseModule):
-    # ... (Esta clase no necesita cambios) ...
+    # --- AÑADIDA sincronización de ida y vuelta con la base y corrección de deriva entre intercambios ---
     def __init__(self, config, name=None):
         super().__init__()
         self.device_key = config.get("device_key", None)
         self.drift_check_interval_s = config.get("drift_check_interval_s", 60)
         self.max_drift_s = config.get("max_drift_s", 2)
-        self.driver = hardware._drivers[self.device_key]
+        self.driver = hardware._drivers.get(self.device_key)
+        self.my_id = config_manager.get("SYSTEM_ID")
+        self.bus_type = config.get("bus_type")
+        self.bus_id = config.get("bus_id")
+        # Hora en ms (timesync.ClockSync) desde el RTC, que hardware.init cargó del DS3231. Con
+        # "sync" el nodo la pide a la base con CMD_TIME_SYNC; la base es la referencia de la red.
+        self.sync = ClockSync(config.get("sync_min_s", 64), config.get("sync_max_s", 4096),
+                              config.get("sync_target_ms", 50), config.get("rtt_slack_ms", 100))
+        self.network_sync = config.get("sync", False) and self.my_id != BASE_STATION_ID
+        if self.my_id == BASE_STATION_ID: self.sync.synced = True
+        # El RTC del ESP32 cuenta con el mismo cristal que ticks_ms: se reescribe solo cuando la
+        # corrección de deriva lo separa rtc_step_ms de la hora sincronizada.
+        self.rtc_step_ms = config.get("rtc_step_ms", 10)
+        now = time.ticks_ms()
+        # El octavo campo de RTC().datetime() son los microsegundos en el ESP32; si el segundo
+        # cambió entre las dos lecturas se toma el inicio del nuevo.
+        dt = RTC().datetime()
+        seconds = time.time()
+        self._rtc = (seconds, dt[7] // 1000 if seconds % 60 == dt[6] else 0, now)
+        self.sync.set(*self._rtc)
+        self._pending = None
+        # El primer pedido sale en un instante al azar del intervalo mínimo: tras un corte de
+        # energía los nodos no piden todos juntos.
+        self._next_sync = time.ticks_add(now, self.sync.min_interval_s * 1000 * (random.getrandbits(8) + 1) >> 8)
+        self.timer["rtc"] = Timer()
+        self.start(1, timer="rtc")
         self.start(self.drift_check_interval_s)
+    @property
+    def synced(self) -> bool:
+        """Hora confiable para calendarios: la de la base, o la del DS3231 sin sincronización por red."""
+        return self.sync.synced or (not self.network_sync and self.driver is not None)
     def update(self):
-        if self.check():
+        now = time.ticks_ms()
+        if self.network_sync and time.ticks_diff(now, self._next_sync) >= 0: self._request(now)
+        if self.sync.synced and self.check("rtc"): self._discipline(now)
+        if self.check() and self.driver:
             driver_seconds = tuple2seconds(self.driver.datetime())
             rtc_seconds = time.time()
             if abs(driver_seconds - rtc_seconds) > self.max_drift_s:
-                RTC().datetime(seconds2timetuple(driver_seconds))
+                # Con hora de la red el DS3231 se corrige desde el RTC (queda para el próximo arranque);
+                # sin ella, el DS3231 es la referencia.
+                if self.network_sync and self.sync.synced: self.driver.datetime(seconds2timetuple(rtc_seconds))
+                else: self.set_time(driver_seconds)
+    def set_time(self, seconds: int, ms: int = 0):
+        """Fija la hora (RTC y referencia de la sincronización) sin tocar la deriva estimada."""
+        now = time.ticks_ms()
+        self.sync.set(seconds, ms, now)
+        self._write_rtc(now)
+    def _write_rtc(self, now):
+        s, ms = self.sync.now(now)
+        # El octavo campo son los microsegundos en el ESP32.
+        RTC().datetime(seconds2timetuple(s)[:7] + (ms * 1000,))
+        self._rtc = (s, ms, now)
+    def _discipline(self, now):
+        s, ms, ticks = self._rtc
+        if abs(diff_ms(self.sync.now(now), (s, ms)) - time.ticks_diff(now, ticks)) >= self.rtc_step_ms: self._write_rtc(now)
+    def _request(self, now):
+        # Un pedido anterior sellado y sin respuesta se perdió.
+        if self._pending is not None: self.sync.lost()
+        self._pending = None
+        # t1 se sella al escribir en el UART: la espera en la cola no cuenta, así que el pedido va
+        # con los reportes y no gasta la reserva de control del ciclo de trabajo.
+        packet = build_command(BASE_STATION_ID, self.my_id, FRAME_TYPE_CMD, INITIAL_TTL, CMD_TIME_SYNC, 0, 0, 0, 0, 0, 0, 0, 0, 0)
+        board.messages[f"{self.bus_type}_{self.bus_id}"]["out"].push(packet, PRIO_REPORT, CMD_TIME_SYNC)
+        self._next_sync = time.ticks_add(now, self.sync.interval_s * 1000)
+    def stamp(self, frame):
+        """Sella t1 (petición) o t3 (respuesta) en la trama que LoraTX está por escribir en el UART."""
+        s, ms = self.sync.now()
+        if frame[OFF_CONTROL] & FRAME_TYPE_MASK == FRAME_TYPE_CMD:
+            TIMESTAMP.pack_into(frame, TIME_SYNC_T1, s, ms)
+            self._pending = (s, ms)
+        else: TIMESTAMP.pack_into(frame, TIME_SYNC_T3, s, ms)
+    def accept(self, parsed, ticks: int):
+        """CMD_TIME_SYNC recibido en `ticks`: responde un pedido o aplica una respuesta."""
+        values = parsed.values
+        if values is None: return
+        if parsed.frame_type == FRAME_TYPE_CMD:
+            # Solo responde quien tiene hora de referencia; t3 lo sella LoraTX al transmitir.
+            if not self.sync.synced: return
+            s, ms = self.sync.now(ticks)
+            packet = build_command(parsed.src_id, self.my_id, FRAME_TYPE_RESP, INITIAL_TTL, CMD_TIME_SYNC,
+                                   values[0], values[1], s, ms, 0, 0, INITIAL_TTL + 1 - parsed.ttl, values[8], 0)
+            board.messages[f"{self.bus_type}_{self.bus_id}"]["out"].push(packet, PRIO_REPORT)
+        elif parsed.frame_type == FRAME_TYPE_RESP and self._pending == (values[0], values[1]):
+            self._pending = None
+            first = not self.sync.synced
+            offset = self.sync.exchange(values[0:2], values[2:4], values[4:6], self.sync.now(ticks), ticks,
+                                        values[7], values[8], values[6], INITIAL_TTL + 1 - parsed.ttl)
+            # El próximo pedido sale con el intervalo que dejó este intercambio.
+            self._next_sync = time.ticks_add(ticks, self.sync.interval_s * 1000)
+            if offset is None: return
+            self._write_rtc(time.ticks_ms())
+            if first: event_manager.publish('clock:updated')
 
 class Temperature(_BaseModule):
     # ... (Esta clase no necesita cambios) ...
@@ -213,6 +308,12 @@ class Display(_BaseModule):
 
 # --- MÓDULOS DE RED ---
 
+def _sensor_status():
+    """Lectura actual para CMD_GET_SENSOR_STATUS: (temperatura x100, presión en psi)."""
+    pressure = board.states.get("pressure", 0)
+    temperature_scaled = int(board.states.get("temperature", 0) * 100)
+    return temperature_scaled, pressure
+
 class LoraTX(_BaseModule):
     # --- CORREGIDO el método de envío ---
     def __init__(self, config, name=None):
@@ -221,78 +322,330 @@ class LoraTX(_BaseModule):
         self.check_interval_s = config.get("check_interval_s", 0.1)
         self.bus_type = config.get("bus_type")
         self.bus_id = config.get("bus_id")
+        self.my_id = config_manager.get("SYSTEM_ID")
         self.driver = hardware._drivers.get(self.device_key)
+        self.frame_size = self.driver.sub_packet_size() if self.driver else MAX_SIZE_TX_PACKET
+        # Con async_tx el envío no bloquea: el estado de AUX se consulta en cada ciclo
+        # y el resto de los módulos sigue corriendo durante el tiempo en el aire.
+        self.async_tx = config.get("async_tx", True)
+        self.tx_pending = False
+        self.tx_started = 0
+        self.stall_us = 0
+        self._sending = False
+        self._deferred = None
+        self.tx_retries = config.get("tx_retries", 2)
+        self._write_failures = 0
+        # Presupuesto de tiempo en el aire por canal (ciclo de trabajo regional). Los
+        # reportes y volcados dejan libre una reserva para tráfico de control, y los
+        # volcados (PRIO_BULK) usan además, por su cuenta, como mucho bulk_permille del
+        # presupuesto: lo demás queda para los reportes.
+        self.duty_cycle_permille = config.get("duty_cycle_permille", None)
+        self.duty_window_s = config.get("duty_window_s", 3600)
+        self.control_reserve_permille = config.get("control_reserve_permille", 100)
+        self.bulk_permille = config.get("bulk_permille", 600)
+        self.budgets = {}
+        self._airtime_model = None
+        self._airtime_config = None
+        self.tx_stats = {"packets": 0, "errors": 0, "stall_us_total": 0, "stall_us_max": 0, "tx_ms_total": 0,
+                         "airtime_us_total": 0, "deferred": 0}
         self.start(self.check_interval_s)
     def update(self):
-        if self.check() and board.messages[f"{self.bus_type}_{self.bus_id}"]["out"]:
-            message_to_send = board.messages[f"{self.bus_type}_{self.bus_id}"]["out"].pop(0)
-            if isinstance(message_to_send, bytes):
-                self.driver.send_transparent_message(message_to_send)
+        # Durante un envío bloqueante el gancho de demora del driver vuelve a correr los módulos.
+        if self._sending: return
+        if self.tx_pending:
+            self._poll_tx()
+            # Con el módulo libre la siguiente trama sale sin esperar al próximo check:
+            # la cola se vacía tan rápido como lo permitan el aire y el presupuesto.
+            if self.tx_pending: return
+        elif not self.check(): return
+        queue = board.messages[f"{self.bus_type}_{self.bus_id}"]["out"]
+        if queue:
+            # El paquete sale de la cola solo cuando el módulo lo aceptó.
+            message_to_send = queue.peek()
+            if not isinstance(message_to_send, (bytes, bytearray)):
+                queue.pop()
+            elif len(message_to_send) > self.frame_size:
+                queue.pop()
+                fragmentation = _modules.get("fragmentation")
+                if not (fragmentation and fragmentation.send(message_to_send)):
+                    print(f"Paquete de {len(message_to_send)} bytes descartado: excede la trama de radio")
+            else:
+                airtime_us = self._airtime().frame_us(len(message_to_send))
+                now, prio = time.ticks_ms(), queue.peek_priority()
+                budget = self._budget(self.driver.channel())
+                bulk = self._budget(self.driver.channel(), True) if budget and prio >= PRIO_BULK else None
+                if budget and not (budget.allows(airtime_us, now, self._limit_us(budget, prio)) and
+                                   (bulk is None or bulk.allows(airtime_us, now, bulk.budget_us * self.bulk_permille // 1000))):
+                    # Se cuenta una vez por trama retenida, no por cada check que la vuelve a retener.
+                    if self._deferred is not message_to_send:
+                        self._deferred = message_to_send
+                        self.tx_stats["deferred"] += 1
+                    return
+                self._deferred = None
                 print(f"send message ... {parse_packet(message_to_send)}")
+                self.tx_started = time.ticks_ms()
+                t0 = time.ticks_us()
+                address = self._link_address(message_to_send)
+                if message_to_send[OFF_COMMAND] == CMD_TIME_SYNC: message_to_send = self._stamp(message_to_send)
+                # El plazo para que AUX suba cubre el tiempo en el aire (más de 1 s a 2.4 kbps);
+                # sin pin AUX el driver espera el UART más airtime_ms.
+                timeout, airtime_ms = 1000 + 2 * airtime_us // 1000, (airtime_us + 999) // 1000
+                if self.async_tx:
+                    code = self.driver.send_async(message_to_send, *address, timeout=timeout, airtime_ms=airtime_ms)
+                    self.stall_us = time.ticks_diff(time.ticks_us(), t0)
+                    if code == ResponseStatusCode.E220_SUCCESS:
+                        queue.pop()
+                        self._charge(budget, airtime_us, bulk)
+                        self._sent(message_to_send)
+                        self._write_failures = 0
+                        self.tx_pending = True
+                        return
+                    if code == ResponseStatusCode.ERR_E220_BUSY:
+                        # El módulo está cambiando de modo: se reintenta en el próximo ciclo.
+                        return
+                    # Falló la escritura en el UART: la trama no salió al aire y no se cobra al
+                    # presupuesto. Se reintenta en los próximos ciclos hasta tx_retries veces y
+                    # después se descarta como error.
+                    self._write_failures += 1
+                    if self._write_failures <= self.tx_retries: return
+                    self._write_failures = 0
+                    queue.pop()
+                    self._tx_done(code)
+                    return
+                else:
+                    if self.driver.busy(): return
+                    # Sale de la cola antes de enviar: mientras espera AUX el gancho de demora
+                    # corre los demás módulos, que pueden encolar tramas más urgentes.
+                    queue.pop()
+                    self._sending = True
+                    try:
+                        code = (self.driver.send_fixed_message(*address, message_to_send, timeout=timeout, airtime_ms=airtime_ms)
+                                if address else
+                                self.driver.send_transparent_message(message_to_send, timeout=timeout, airtime_ms=airtime_ms))
+                    finally:
+                        self._sending = False
+                    self.stall_us = time.ticks_diff(time.ticks_us(), t0)
+                    # Un timeout de AUX llega después de escribir la trama, que sí salió al aire;
+                    # cualquier otro error es de la escritura en el UART y no se cobra.
+                    if code == ResponseStatusCode.E220_SUCCESS or code == ResponseStatusCode.ERR_E220_TIMEOUT:
+                        self._charge(budget, airtime_us, bulk)
+                        self._sent(message_to_send)
+                    self._tx_done(code)
+    def _sent(self, frame):
+        # El timeout de retransmisión de una trama confiable corre desde la escritura, no desde el push.
+        link = _modules.get("reliable_link")
+        if link: link.on_sent(frame, self.tx_started)
+    def _link_address(self, frame):
+        """
+        (ADDH, ADDL, canal) de destino en el aire si el módulo está en transmisión fija; () en
+        transparente. Una trama con destino sale hacia el siguiente salto de la tabla de Routing
+        y solo ese vecino la recibe y la reenvía; sin ruta conocida sale en difusión.
+        """
+        configuration = self.driver.configuration
+        if not (configuration and configuration.TRANSMISSION_MODE.fixedTransmission): return ()
+        dest_id, hop = frame[OFF_DEST], None
+        routing = _modules.get("routing")
+        if dest_id != BROADCAST_ID and routing: hop = routing.routing_table.next_hop(dest_id)
+        if hop is None: return BROADCAST_ADDRESS, BROADCAST_ADDRESS, configuration.CHAN
+        return 0, hop, configuration.CHAN
+    def _stamp(self, frame):
+        # t1 y t3 de la sincronización de reloj se sellan al escribir en el UART: la espera en la cola no
+        # cuenta. En una trama reenviada se suma la salida a la residencia (Routing restó la llegada).
+        # Se sella una copia: si el módulo está ocupado, la trama de la cola sale en el próximo ciclo.
+        if len(frame) != HEADER_SIZE + TIME_SYNC.size: return frame
+        frame = bytearray(frame)
+        clock = _modules.get("clock")
+        if frame[OFF_SRC] != self.my_id: add_residence(frame, time.ticks_ms())
+        elif clock: clock.stamp(frame)
+        return frame
+    def _airtime(self):
+        # Se rehace si cambió la configuración conocida del módulo.
+        configuration = self.driver.configuration
+        if self._airtime_model is None or configuration is not self._airtime_config:
+            self._airtime_config = configuration
+            self._airtime_model = AirtimeModel.from_configuration(configuration) if configuration else AirtimeModel()
+        return self._airtime_model
+    def _budget(self, channel, bulk: bool = False):
+        if not self.duty_cycle_permille: return None
+        key = (channel, PRIO_BULK) if bulk else channel
+        budget = self.budgets.get(key)
+        if budget is None:
+            budget = DutyCycle(self.duty_cycle_permille, self.duty_window_s)
+            self.budgets[key] = budget
+        return budget
+    def _limit_us(self, budget, prio):
+        if prio < PRIO_REPORT: return budget.budget_us
+        return budget.budget_us - budget.budget_us * self.control_reserve_permille // 1000
+    def _charge(self, budget, airtime_us, bulk=None):
+        self.tx_stats["airtime_us_total"] += airtime_us
+        if budget: budget.charge(airtime_us, time.ticks_ms())
+        if bulk: bulk.charge(airtime_us, time.ticks_ms())
+    def utilization(self) -> float:
+        """Fracción del presupuesto de tiempo en el aire usada en el canal actual (0 sin límite configurado)."""
+        budget = self._budget(self.driver.channel()) if self.driver else None
+        return budget.utilization(time.ticks_ms()) if budget else 0.0
+    def _poll_tx(self):
+        t0 = time.ticks_us()
+        code = self.driver.poll_tx()
+        self.stall_us += time.ticks_diff(time.ticks_us(), t0)
+        if code is not None:
+            self.tx_pending = False
+            self._tx_done(code)
+    def _tx_done(self, code):
+        """Registra el bloqueo del ciclo principal causado por el paquete (suma de llamadas al driver)."""
+        stats = self.tx_stats
+        stats["packets"] += 1
+        if code != ResponseStatusCode.E220_SUCCESS: stats["errors"] += 1
+        stats["stall_us_total"] += self.stall_us
+        if self.stall_us > stats["stall_us_max"]: stats["stall_us_max"] = self.stall_us
+        stats["tx_ms_total"] += time.ticks_diff(time.ticks_ms(), self.tx_started)
 
 class Routing(_BaseModule):
-    # ... (Esta clase no necesita cambios) ...
+    # --- Vector de distancias con costo ETX, anuncios parciales, horizonte dividido envenenado, retención, secuencias y Trickle ---
     def __init__(self, config, name=None):
         super().__init__()
         self.my_id = config_manager.get("SYSTEM_ID")
         self.bus_type = config.get("bus_type")
         self.bus_id = config.get("bus_id")
-        self.neighbor_table = {}
-        self.routing_table = {self.my_id: {"next_hop": self.my_id, "cost": 0, "last_updated": time.ticks_ms()}}
-        self.timer["hello"] = Timer()
-        self.timer["route_update"] = Timer()
+        # Costo de enlace tipo ETX por vecino (PDR de HELLO, RSSI y SNR promedio), con margen
+        # de SNR sobre el mínimo de la velocidad de aire e histéresis al cambiar de siguiente salto.
+        driver = hardware._drivers.get(config.get("device_key"))
+        air_data_rate = driver.air_data_rate() if driver else None
+        self.neighbor_table = NeighborTable(noise_floor_dbm=noise_floor_dbm(air_data_rate), snr_min_db=snr_min_db(air_data_rate),
+                                            margin_db=config.get("snr_margin_db", 6))
+        # Una ruta perdida queda retenida holddown_s sin aceptar caminos con información más vieja.
+        self.holddown_ms = int(config.get("holddown_s", 60) * 1000)
+        self.routing_table = RouteTable(switch_pct=config.get("switch_margin_pct", 12), holddown_ms=self.holddown_ms)
+        self.routing_table.set(self.my_id, self.my_id, 0, 0, time.ticks_ms())
+        self._hello_seq = 0
+        self.timer["prune"] = Timer()
+        self.timer["triggered"] = Timer()
         self.hello_interval_s = config.get("hello_interval_s", 30)
         self.route_update_interval_s = config.get("route_update_interval_s", 60)
+        # Temporizadores Trickle: HELLO y anuncios completos van de hello_interval_s y
+        # route_update_min_s hasta hello_max_s y route_update_interval_s mientras la vecindad
+        # no cambia, y vuelven al mínimo cuando aparece un vecino. Un anuncio completo se
+        # suprime si ya se oyeron route_redundancy anuncios que no cambiaron la tabla; los
+        # HELLO nunca, porque cada uno mide el enlace con su emisor.
+        now = time.ticks_ms()
+        self.hello_trickle = Trickle(int(self.hello_interval_s * 1000), int(config.get("hello_max_s", 240) * 1000))
+        self.ad_trickle = Trickle(int(config.get("route_update_min_s", 30) * 1000), int(self.route_update_interval_s * 1000),
+                                  config.get("route_redundancy", 4))
+        self.hello_trickle.start(now)
+        self.ad_trickle.start(now)
+        # Cada HELLO anuncia el plazo hasta el siguiente; un vecino expira tras neighbor_misses
+        # plazos sin oírlo (o neighbor_timeout_s si todavía no anunció ninguno).
+        self.neighbor_misses = config.get("neighbor_misses", 3)
+        # Los cambios de ruta se anuncian en un anuncio parcial a más tardar cada triggered_update_s.
+        self.triggered_update_s = config.get("triggered_update_s", 5)
         self.neighbor_timeout_s = self.hello_interval_s * 3.5
+        self._bus_key = f"{self.bus_type}_{self.bus_id}"
+        self.duplicates = DuplicateCache(config.get("dedup_entries", 64), int(config.get("dedup_ttl_s", 10) * 1000))
+        self.forward_stats = {"forwarded": 0, "duplicates": 0, "no_route": 0}
+        self.ad_stats = {"full": 0, "partial": 0, "records": 0}
+        # Los anuncios se escriben en una trama preasignada del tamaño de sub-paquete
+        # del módulo; si la tabla no cabe, se reparte en varias tramas.
+        frame_size = driver.sub_packet_size() if driver else MAX_SIZE_TX_PACKET
+        self._ad = bytearray(HEADER_SIZE + ROUTE_AD.size * ROUTE_AD.capacity(frame_size))
         event_manager.subscribe('lora:message:received', self.process_network_packet)
         event_manager.subscribe('route:forward_request', self.forward_packet)
-        self.start(self.hello_interval_s, timer="hello")
-        self.start(self.route_update_interval_s, timer="route_update")
+        self.start(self.hello_interval_s, timer="prune")
+        self.start(self.triggered_update_s, timer="triggered")
     def update(self):
-        if self.timer["hello"].check(): self._send_hello()
-        if self.timer["route_update"].check():
-            self._send_route_advertisement()
-            self._prune_tables()
-    def _send_hello(self):
-        packet = build_packet(BROADCAST_ID, self.my_id, FRAME_TYPE_CMD, 1, CMD_HELLO)
-        board.messages[f"{self.bus_type}_{self.bus_id}"]["out"].insert(0, packet)
-    def _send_route_advertisement(self):
-        payload = b''
-        for dest, route_info in self.routing_table.items():
-            if dest != self.my_id: payload += struct.pack('>BH', dest, int(route_info['cost']))
-        if payload:
-            packet = build_packet(BROADCAST_ID, self.my_id, FRAME_TYPE_CMD, 1, CMD_ROUTE_AD, payload)
-            board.messages[f"{self.bus_type}_{self.bus_id}"]["out"].insert(0, packet)
+        now = time.ticks_ms()
+        if self.hello_trickle.check(now): self._send_hello(now)
+        if self.timer["prune"].check(): self._prune_tables()
+        if self.ad_trickle.check(now):
+            # Cada anuncio completo lleva un número de secuencia propio nuevo (par).
+            table = self.routing_table
+            table.set(self.my_id, self.my_id, 0, (table.seq(self.my_id) + 2) & 0xFE, now)
+            self._send_route_advertisement(False)
+        if self.timer["triggered"].check() and self.routing_table.pending:
+            self._send_route_advertisement(True)
+    def _send_hello(self, now):
+        # La secuencia de HELLO permite a los vecinos contar los perdidos; el plazo hasta
+        # el próximo HELLO (redondeado hacia arriba) les dice cuándo darlo por perdido.
+        self._hello_seq = (self._hello_seq + 1) & 0xFF
+        unit_ms = HELLO_UNIT_S * 1000
+        horizon = min(255, (self.hello_trickle.horizon_ms(now) + unit_ms - 1) // unit_ms)
+        packet = build_packet(BROADCAST_ID, self.my_id, FRAME_TYPE_CMD, 1, CMD_HELLO, bytes((horizon,)), self._hello_seq)
+        board.messages[f"{self.bus_type}_{self.bus_id}"]["out"].push(packet, PRIO_CONTROL, CMD_HELLO)
+    def _send_route_advertisement(self, changed_only):
+        frame, limit = self._ad, (len(self._ad) - HEADER_SIZE) // ROUTE_AD.size
+        out = board.messages[f"{self.bus_type}_{self.bus_id}"]["out"]
+        now, start, chunk = time.ticks_ms(), 0, 0
+        while True:
+            count, start = self.routing_table.pack_into(frame, HEADER_SIZE, start, limit, changed_only, now)
+            if not count: break
+            size = HEADER_SIZE + count * ROUTE_AD.size
+            pack_header_into(frame, 0, BROADCAST_ID, self.my_id, FRAME_TYPE_CMD, 1, CMD_ROUTE_AD, 0, size - HEADER_SIZE)
+            # Clave propia por trama: con COALESCE una trama de un anuncio completo reemplaza solo a
+            # la misma de un anuncio completo anterior. Los parciales no se reemplazan entre sí.
+            out.push(bytes(memoryview(frame)[:size]), PRIO_CONTROL, None if changed_only else CMD_ROUTE_AD | (chunk << 8))
+            self.ad_stats["records"] += count
+            chunk += 1
+        if chunk: self.ad_stats["partial" if changed_only else "full"] += 1
     def process_network_packet(self, parsed_packet, rssi):
-        src_id, command = parsed_packet["src_id"], parsed_packet["command"]
-        link_cost = max(1, 255 - rssi)
-        self.neighbor_table[src_id] = {"rssi": rssi, "last_seen": time.ticks_ms(), "cost": link_cost}
-        if command == CMD_ROUTE_AD:
-            payload, cost_to_neighbor = parsed_packet["payload"], link_cost
-            for i in range(0, len(payload), 3):
-                dest_id, cost_from_neighbor = struct.unpack('>BH', payload[i:i+3])
-                if dest_id == self.my_id: continue
-                new_total_cost = cost_to_neighbor + cost_from_neighbor
-                current_route = self.routing_table.get(dest_id)
-                if not current_route or new_total_cost < current_route['cost']:
-                    self.routing_table[dest_id] = {"next_hop": src_id, "cost": new_total_cost, "last_updated": time.ticks_ms()}
-    def forward_packet(self, packet: bytes):
-        parsed = parse_packet(packet)
-        if not parsed or parsed["ttl"] <= 1: return
-        route_info = self.routing_table.get(parsed["dest_id"])
-        if route_info:
-            new_packet = build_packet(parsed["dest_id"], parsed["src_id"], parsed["control"], parsed["ttl"] - 1, parsed["command"], parsed["payload"])
-            board.messages[f"{self.bus_type}_{self.bus_id}"]["out"].append(new_packet)
+        src_id, command = parsed_packet.src_id, parsed_packet.command
+        # Solo HELLO y anuncios (TTL 1, nunca reenviados) llegan de quien los originó; en el
+        # resto el RSSI es del último salto y src_id no es necesariamente un vecino.
+        if command != CMD_HELLO and command != CMD_ROUTE_AD: return
+        now = time.ticks_ms()
+        buf, end = parsed_packet.buf, len(parsed_packet.buf)
+        hello_seq, hold_s = None, 0
+        if command == CMD_HELLO:
+            hello_seq = parsed_packet.seq
+            if end == HEADER_SIZE + 1: hold_s = self.neighbor_misses * buf[HEADER_SIZE] * HELLO_UNIT_S
+        # Un vecino nunca oído es una inconsistencia: HELLO y anuncios completos vuelven al intervalo
+        # mínimo para que el que llega conozca pronto a sus vecinos y la tabla completa. Un enlace
+        # marginal que expira y vuelve no reinicia nada.
+        if not self.neighbor_table.known(src_id):
+            self.hello_trickle.reset(now)
+            self.ad_trickle.reset(now)
+        # El byte de RSSI del E220 es 256 + dBm; 0 si el módulo no lo entrega.
+        link_cost = self.neighbor_table.observe(src_id, rssi - 256 if rssi else None, hello_seq, now, hold_s)
+        # Un vecino oído es una ruta directa; sin esto ningún nodo tendría rutas que anunciar.
+        table = self.routing_table
+        pending = table.pending
+        if table.next_hop(src_id) in (None, src_id) or table.better(src_id, link_cost):
+            table.set(src_id, src_id, link_cost, table.seq(src_id), now)
+        if command == CMD_ROUTE_AD and not (end - HEADER_SIZE) % ROUTE_AD.size:
+            # Los registros se leen directamente del buffer recibido, sin decodificar a tuplas.
+            table.merge(src_id, link_cost, buf, HEADER_SIZE, end, self.my_id, now)
+            # Un anuncio que no cambió la tabla es consistente y cuenta para suprimir el propio; los
+            # cambios ya salen en anuncios parciales y no reinician el temporizador.
+            if table.pending == pending: self.ad_trickle.heard()
+    def forward_packet(self, packet, ticks: int = None):
+        # Camino rápido del relé: la cabecera se lee por desplazamiento (MessageLora ya validó
+        # la trama), sin PacketView ni paquete reconstruido.
+        if packet[OFF_TTL] <= 1 or packet[OFF_SRC] == self.my_id: return
+        # Un vecino que ya reenvió el paquete (o el original oído por otro camino)
+        # no se vuelve a retransmitir.
+        if self.duplicates.seen(packet):
+            self.forward_stats["duplicates"] += 1
+            return
+        if self.routing_table.next_hop(packet[OFF_DEST]) is None:
+            self.forward_stats["no_route"] += 1
+            return
+        self.forward_stats["forwarded"] += 1
+        # La ranura del framer se reutiliza con la próxima trama: una sola copia, que sale
+        # por la cola tal cual con el TTL decrementado en el lugar.
+        frame = packet if isinstance(packet, bytearray) else bytearray(packet)
+        frame[OFF_TTL] -= 1
+        # La sincronización de reloj descuenta lo que la trama espera en el relé: desde la llegada
+        # al framer hasta que LoraTX la escribe en el UART, que suma la salida.
+        if ticks is not None and frame[OFF_COMMAND] == CMD_TIME_SYNC and len(frame) == HEADER_SIZE + TIME_SYNC.size:
+            add_residence(frame, -ticks)
+        # El historial que vacía otro nodo sigue en PRIO_BULK: no demora los reportes que pasan por acá.
+        board.messages[self._bus_key]["out"].push(frame, PRIO_BULK if frame[OFF_COMMAND] == CMD_SENSOR_BACKLOG else PRIO_REPORT)
     def _prune_tables(self):
         now = time.ticks_ms()
-        timeout_ms = self.neighbor_timeout_s * 1000
-        expired_neighbors = [nid for nid, data in self.neighbor_table.items() if time.ticks_diff(now, data['last_seen']) > timeout_ms]
-        for nid in expired_neighbors: del self.neighbor_table[nid]
-        expired_routes = [did for did, route in self.routing_table.items() if route['next_hop'] in expired_neighbors]
-        for did in expired_routes: del self.routing_table[did]
+        timeout_ms = int(self.neighbor_timeout_s * 1000)
+        for nid in self.neighbor_table.expire(now, timeout_ms):
+            self.routing_table.invalidate_via(nid, now)
 
 class MessageLora(_BaseModule):
-    # --- SIN CAMBIOS, ya estaba bien diseñada ---
+    # --- Despacho por la tabla de comandos de protocol (PacketView.values), con ReliableLink, CMD_TIME_SYNC, fragmentos y CMD_SET_SLOT ---
     def __init__(self, config, name=None):
         super().__init__()
         self.read_interval_s = config.get("read_interval_s", 0.1)
@@ -303,40 +656,55 @@ class MessageLora(_BaseModule):
             CMD_GET_SENSOR_STATUS: self._handle_get_status,
             CMD_UPDATE_RTC: self._handle_update_rtc,
             CMD_MODULE_CTRL: self._handle_module_ctrl,
+            CMD_SET_SLOT: self._handle_set_slot,
             CMD_GET_PARAM: self._handle_get_param,
             CMD_SET_PARAM: self._handle_set_param,
         }
         self.start(self.read_interval_s)
     def update(self):
         if self.check() and board.messages[f"{self.bus_type}_{self.bus_id}"]["in"]:
-            msg_obj = board.messages[f"{self.bus_type}_{self.bus_id}"]["in"].pop(0)
+            msg_obj = board.messages[f"{self.bus_type}_{self.bus_id}"]["in"].pop()
             raw_data, rssi = msg_obj.get('data'), msg_obj.get('rssi', 0)
             parsed = parse_packet(raw_data)
             if not parsed: return
             event_manager.publish('lora:message:received', parsed_packet=parsed, rssi=rssi)
-            if parsed["dest_id"] == self.device_id:
-                handler = self.command_handlers.get(parsed["command"])
-                if handler: handler(parsed["src_id"], parsed["payload"])
-            elif parsed["dest_id"] != BROADCAST_ID:
-                event_manager.publish('route:forward_request', packet=raw_data)
-    def _handle_get_status(self, originator_id: int, payload: bytes):
-        pressure = board.states.get("pressure", 0)
-        temperature_scaled = int(board.states.get("temperature", 0) * 100)
-        response_payload = struct.pack('>hH', temperature_scaled, pressure)
-        response_packet = build_packet(originator_id, self.device_id, FRAME_TYPE_RESP, INITIAL_TTL, CMD_GET_SENSOR_STATUS, response_payload)
-        board.messages[f"{self.bus_type}_{self.bus_id}"]["out"].append(response_packet)
-    def _handle_update_rtc(self, originator_id: int, payload: bytes):
-        if len(payload) < 4: return
-        seconds_since_epoch, = struct.unpack('>I', payload)
+            if parsed.dest_id == self.device_id:
+                link = _modules.get("reliable_link")
+                if link and not link.accept(parsed): return
+                if parsed.command == CMD_TIME_SYNC:
+                    clock = _modules.get("clock")
+                    if clock: clock.accept(parsed, msg_obj.get('ticks', time.ticks_ms()))
+                    return
+                if parsed.command == CMD_FRAGMENT or parsed.command == CMD_FRAGMENT_STATUS:
+                    fragmentation = _modules.get("fragmentation")
+                    if fragmentation: fragmentation.accept(parsed, rssi)
+                    return
+                if parsed.frame_type != FRAME_TYPE_CMD: return
+                handler = self.command_handlers.get(parsed.command)
+                values = parsed.values
+                if handler and values is not None: handler(parsed.src_id, values)
+            elif parsed.dest_id != BROADCAST_ID:
+                event_manager.publish('route:forward_request', packet=raw_data, ticks=msg_obj.get('ticks'))
+    def _reply(self, originator_id: int, command: int, *values):
+        response_packet = build_command(originator_id, self.device_id, FRAME_TYPE_RESP, INITIAL_TTL, command, *values)
+        board.messages[f"{self.bus_type}_{self.bus_id}"]["out"].push(response_packet, PRIO_CONTROL)
+    def _handle_get_status(self, originator_id: int, values: tuple):
+        self._reply(originator_id, CMD_GET_SENSOR_STATUS, *_sensor_status())
+    def _handle_update_rtc(self, originator_id: int, values: tuple):
+        seconds_since_epoch, = values
         time_tuple = seconds2timetuple(seconds_since_epoch)
         try:
-            RTC().datetime(time_tuple)
+            clock = _modules.get("clock")
+            if clock: clock.set_time(seconds_since_epoch)
+            else: RTC().datetime(time_tuple)
             rtc_driver = hardware._drivers.get('rtc')
             if rtc_driver: rtc_driver.datetime(time_tuple)
-        except Exception as e: print(f"[Message] Error al actualizar RTC: {e}")
-    def _handle_module_ctrl(self, originator_id: int, payload: bytes):
-        if len(payload) < 2: return
-        module_id, action = struct.unpack('>BB', payload)
+        except Exception as e:
+            print(f"[Message] Error al actualizar RTC: {e}")
+            return
+        event_manager.publish('clock:updated')
+    def _handle_module_ctrl(self, originator_id: int, values: tuple):
+        module_id, action = values
         module_name = ID_MODULE_MAP.get(module_id)
         if not module_name: return
         target_module = _modules.get(module_name)
@@ -345,32 +713,23 @@ class MessageLora(_BaseModule):
         elif action == 1:
             target_module.resume()
             target_module.autostart = True
-    def _handle_get_param(self, originator_id: int, payload: bytes):
-        if not payload: return
-        param_id = payload[0]
+    def _handle_set_slot(self, originator_id: int, values: tuple):
+        # La asignación dura hasta el próximo reinicio; la base la repite al rearmar el mapa.
+        reporter = _modules.get("data_reporter")
+        if reporter and reporter.schedule: reporter.schedule.assign(*values)
+    def _handle_get_param(self, originator_id: int, values: tuple):
+        param_id, = values
         path = PARAMETER_MAP.get(param_id)
         if not path or path.startswith("direct."): return
         value = config_manager.get(path)
         if value is None: return
-        if isinstance(value, bool): dtype, packed_value = DTYPE_BOOL, struct.pack('>B', 1 if value else 0)
-        elif isinstance(value, float): dtype, packed_value = DTYPE_FLOAT, struct.pack('>f', value)
-        elif isinstance(value, int): dtype, packed_value = DTYPE_UINT, struct.pack('>I', value)
-        else: return
-        response_payload = bytes([param_id, dtype]) + packed_value
-        response_packet = build_packet(originator_id, self.device_id, FRAME_TYPE_RESP, INITIAL_TTL, CMD_GET_PARAM, response_payload)
-        board.messages[f"{self.bus_type}_{self.bus_id}"]["out"].append(response_packet)
-    def _handle_set_param(self, originator_id: int, payload: bytes):
-        if len(payload) < 3: return
-        param_id, dtype, value_bytes = payload[0], payload[1], payload[2:]
+        dtype = param_dtype(value)
+        if dtype is None: return
+        self._reply(originator_id, CMD_GET_PARAM, param_id, dtype, value)
+    def _handle_set_param(self, originator_id: int, values: tuple):
+        param_id, dtype, value = values
         path = PARAMETER_MAP.get(param_id)
         if not path: return
-        try:
-            if dtype == DTYPE_BOOL: value = value_bytes[0] > 0
-            elif dtype == DTYPE_UINT: value, = struct.unpack('>I', value_bytes)
-            elif dtype == DTYPE_SINT: value, = struct.unpack('>i', value_bytes)
-            elif dtype == DTYPE_FLOAT: value, = struct.unpack('>f', value_bytes)
-            else: return
-        except struct.error: return
         if path.startswith("direct."): self._execute_direct_action(path, value)
         else: config_manager.set(path, value, persistent=True)
     def _execute_direct_action(self, action_path: str, value):
@@ -380,24 +739,348 @@ class MessageLora(_BaseModule):
             try: getattr(target_module, method_name)(value)
             except Exception as e: print(f"Error en acción directa: {e}")
 
+class ReliableLink(_BaseModule):
+    # --- Entrega confiable: seq por destino, ventana, retransmisión y ACKs acumulativos ---
+    def __init__(self, config, name=None):
+        super().__init__()
+        self.my_id = config_manager.get("SYSTEM_ID")
+        self.check_interval_s = config.get("check_interval_s", 0.1)
+        self.bus_type = config.get("bus_type")
+        self.bus_id = config.get("bus_id")
+        self.channel = ReliableChannel(
+            self.my_id, self._emit,
+            window=config.get("window", 8),
+            max_pending=config.get("max_pending", 8),
+            rto_initial_ms=config.get("rto_initial_ms", 3000),
+            rto_min_ms=config.get("rto_min_ms", 500),
+            rto_max_ms=config.get("rto_max_ms", 60000),
+            max_retries=config.get("max_retries", 4),
+            ack_delay_ms=config.get("ack_delay_ms", 250),
+            on_fail=self._on_fail,
+        )
+        self.start(self.check_interval_s)
+    def update(self):
+        if self.check(): self.channel.update(time.ticks_ms())
+    def send(self, packet) -> bool:
+        return self.channel.send(packet)
+    def congested(self, node_id: int = BASE_STATION_ID) -> bool:
+        return self.channel.congested(node_id)
+    def accept(self, parsed) -> bool:
+        """Consume ACK/NACK y registra tramas confiables. False si la trama no debe despacharse."""
+        frame_type = parsed.frame_type
+        if frame_type == FRAME_TYPE_ACK or frame_type == FRAME_TYPE_NACK:
+            self.channel.on_ack(parsed, time.ticks_ms())
+            return False
+        if parsed.control & FLAG_ACK_REQUIRED:
+            return self.channel.on_frame(parsed, time.ticks_ms())
+        return True
+    def on_sent(self, frame, ticks: int):
+        """LoraTX escribió `frame` en el módulo: arranca su timeout de retransmisión."""
+        self.channel.on_sent(frame, ticks)
+    def _emit(self, frame):
+        out = board.messages[f"{self.bus_type}_{self.bus_id}"]["out"]
+        if (frame[OFF_CONTROL] & FRAME_TYPE_MASK) in (FRAME_TYPE_ACK, FRAME_TYPE_NACK):
+            out.push(frame, PRIO_CONTROL)
+            return
+        # Con la clave (destino, seq) una copia reencolada reemplaza a la que sigue en la cola.
+        out.push(frame, PRIO_BULK if frame[OFF_COMMAND] == CMD_SENSOR_BACKLOG else PRIO_REPORT, (frame[OFF_DEST], frame[OFF_SEQ]))
+    def _on_fail(self, frame):
+        event_manager.publish('net:delivery_failed', packet=frame)
+
+class Fragmentation(_BaseModule):
+    # --- Fragmenta paquetes mayores que una trama y reensambla los recibidos ---
+    def __init__(self, config, name=None):
+        super().__init__()
+        self.my_id = config_manager.get("SYSTEM_ID")
+        self.check_interval_s = config.get("check_interval_s", 0.1)
+        self.bus_type = config.get("bus_type")
+        self.bus_id = config.get("bus_id")
+        driver = hardware._drivers.get(config.get("device_key"))
+        self.rssi = 0
+        self.channel = FragmentChannel(
+            self.my_id, self._emit, self._deliver,
+            frame_size=driver.sub_packet_size() if driver else MAX_SIZE_TX_PACKET,
+            max_message=config.get("max_message", 4096),
+            max_sources=config.get("max_sources", 2),
+            status_delay_ms=config.get("status_delay_ms", 2000),
+            rto_ms=config.get("rto_ms", 6000),
+            timeout_ms=config.get("timeout_ms", 60000),
+            max_rounds=config.get("max_rounds", 8),
+            on_fail=self._on_fail,
+        )
+        self.start(self.check_interval_s)
+    def update(self):
+        if self.check():
+            idle = not board.messages[f"{self.bus_type}_{self.bus_id}"]["out"]
+            self.channel.update(time.ticks_ms(), idle)
+    def send(self, packet) -> bool:
+        return self.channel.send(packet)
+    def accept(self, parsed, rssi):
+        self.rssi = rssi
+        self.channel.on_frame(parsed, time.ticks_ms())
+    def _emit(self, frame):
+        board.messages[f"{self.bus_type}_{self.bus_id}"]["out"].push(frame, PRIO_CONTROL if frame[OFF_COMMAND] == CMD_FRAGMENT_STATUS else PRIO_BULK)
+    def _deliver(self, packet):
+        # El paquete reensamblado vuelve a la cola de entrada y se despacha como uno normal.
+        board.messages[f"{self.bus_type}_{self.bus_id}"]["in"].push({'data': packet, 'rssi': self.rssi})
+    def _on_fail(self, packet):
+        event_manager.publish('net:delivery_failed', packet=packet)
+
+class DataLogger(_BaseModule):
+    # --- NUEVO historial local de presión y temperatura en la flash (datalog.RingLog) ---
+    def __init__(self, config, name=None):
+        super().__init__()
+        self.log_interval_s = config.get("log_interval_s", 60)
+        self.sensor_key = config.get("sensor_key", "pressure")
+        # La página en RAM se escribe al llenarse o flush_interval_s después del primer registro
+        # pendiente: es lo que se pierde como mucho en un corte de energía.
+        self.flush_interval_ms = int(config.get("flush_interval_s", 600) * 1000)
+        self.path = config.get("path", "data.log")
+        self.log = RingLog(self.path, config.get("pages", 64), config.get("page_size", 4096))
+        self._pending_since = None
+        print(f"[DataLogger] {len(self.log)} registros en {self.path}, "
+              f"capacidad {self.log.per_page * (self.log.pages - 1)}")
+        self.start(self.log_interval_s)
+    def update(self):
+        if not self.check(): return
+        now = time.ticks_ms()
+        flags = 0
+        clock = _modules.get("clock")
+        if not (clock and clock.synced): flags |= LOG_FLAG_UNSYNCED
+        if self.sensor_key not in board.states: flags |= LOG_FLAG_NO_PRESSURE
+        if "temperature" not in board.states: flags |= LOG_FLAG_NO_TEMPERATURE
+        temperature_scaled, _ = _sensor_status()
+        timestamp = int(time.time())
+        if flags & LOG_FLAG_UNSYNCED:
+            # Tras reiniciar sin DS3231 ni hora de la red el reloj arranca en 2000: el registro lleva la
+            # hora del último guardado para no romper el orden por tiempo que usa RingLog.seek.
+            last = self.log.read(self.log.head - 1)
+            if last and last[0] > timestamp: timestamp = last[0]
+        self.log.append(timestamp, board.states.get(self.sensor_key, 0), temperature_scaled, flags)
+        if not self.log.dirty: self._pending_since = None
+        elif self._pending_since is None: self._pending_since = now
+        elif time.ticks_diff(now, self._pending_since) >= self.flush_interval_ms:
+            self.log.flush()
+            self._pending_since = None
+
 class DataReporter(_BaseModule):
-    # ... (Esta clase no necesita cambios) ...
+    # --- AÑADIDO modo agregado (batch_size > 1), con registros fijos o serie comprimida, y calendario de ranuras ---
     def __init__(self, config, name=None):
         super().__init__()
         self.report_interval_s = config.get("report_interval_s", 300)
+        self.batch_size = config.get("batch_size", 1)
+        self.batch_encoding = config.get("batch_encoding", "fixed")
+        self.sensor_keys = config.get("sensor_keys", ["pressure"])
+        self.reliable = config.get("reliable", False)
         self.my_id = config_manager.get("SYSTEM_ID")
         self.bus_type = config.get("bus_type")
         self.bus_id = config.get("bus_id")
+        # En modo agregado cada muestra se escribe directamente en la trama de salida,
+        # limitada al tamaño de sub-paquete configurado en el módulo LoRa.
+        driver = hardware._drivers.get(config.get("device_key"))
+        frame_size = driver.sub_packet_size() if driver else MAX_SIZE_TX_PACKET
+        self.max_records = max(1, min(self.batch_size * len(self.sensor_keys), SENSOR_BATCH.capacity(frame_size)))
+        if self.batch_encoding == "series":
+            # Canales de la serie: temperatura y luego cada sensor de presión.
+            self._frame = bytearray(frame_size)
+            self._series = SeriesEncoder(self._frame, HEADER_SIZE)
+            self._sample = [0] * (1 + len(self.sensor_keys))
+        else:
+            self._frame = bytearray(HEADER_SIZE + SENSOR_BATCH.payload_size(self.max_records))
+        self._records = 0
+        self._base_ts = 0
+        self.skipped = 0
+        self.unrouted = 0
+        self.driver = driver
         if self.my_id == BASE_STATION_ID: self.stop()
         else: self.start(self.report_interval_s)
+        # Almacenamiento y reenvío: con DataLogger, lo que no sale hacia la base (sin ruta, cola
+        # saturada o entrega confiable fallida) queda marcado en su historial y se envía cuando
+        # vuelve la ruta, en tramas LOG_RECORDS tan grandes como permita la radio (o
+        # backlog_frame_bytes con Fragmentation), en PRIO_BULK, una por backlog_interval_s y solo
+        # con la cola de salida vacía. backlog_order elige lo más viejo o lo más nuevo primero.
+        self.backlog = None
+        self._unsent_since = None  # timestamp de la última muestra enviada antes de dejar de enviar
+        self._sample_ts = int(time.time())
+        logger = _modules.get("data_logger")
+        order = config.get("backlog_order", BACKLOG_OLDEST)
+        if logger and order and self.my_id != BASE_STATION_ID:
+            self.backlog = Backlog(logger.log, logger.path + ".pending", order)
+            backlog_frame = config.get("backlog_frame_bytes", frame_size)
+            if not _modules.get("fragmentation"): backlog_frame = min(backlog_frame, frame_size)
+            self._backlog_frame = bytearray(HEADER_SIZE + LOG_RECORDS.size * LOG_RECORDS.capacity(backlog_frame))
+            self.timer["backlog"] = Timer()
+            self.start(config.get("backlog_interval_s", 10), timer="backlog")
+            lora_tx = _modules.get("lora_tx")
+            if lora_tx and lora_tx.duty_cycle_permille:
+                # Los volcados dejan libre, del presupuesto de tiempo en el aire, lo que usan los reportes.
+                model, length, samples = self._report_frame()
+                window_us = model.frame_us(length) * lora_tx.duty_window_s // (self.report_interval_s * samples)
+                needed = window_us * 1000 // (lora_tx.duty_window_s * 1000 * lora_tx.duty_cycle_permille) + 1
+                lora_tx.bulk_permille = max(0, min(lora_tx.bulk_permille, 1000 - lora_tx.control_reserve_permille - needed))
+            event_manager.subscribe('net:delivery_failed', self._delivery_failed)
+            if len(self.backlog): print(f"[DataReporter] {len(self.backlog)} registros pendientes de enviar a la base")
+        network_size = config.get("network_size")
+        # Calendario de reportes: por omisión el temporizador de intervalo fijo. Con
+        # schedule "slots", ranura propia con el reloj sincronizado (Clock.synced, o
+        # CMD_UPDATE_RTC recibido), acceso aleatorio mientras tanto.
+        self.schedule = None
+        mode = config.get("schedule", SCHEDULE_INTERVAL)
+        if mode != SCHEDULE_INTERVAL and self.my_id != BASE_STATION_ID:
+            model, length, _ = self._report_frame()
+            self.schedule = SlotSchedule(self.my_id, self.report_interval_s, (model.frame_us(length) + 999) // 1000,
+                                         config.get("slot_guard_ms", 100), network_size, mode)
+            clock = _modules.get("clock")
+            self.schedule.synced = bool(clock and clock.synced)
+            event_manager.subscribe('clock:updated', self._clock_updated)
+        if network_size and self.my_id != BASE_STATION_ID:
+            airtime_us, collision, max_per_hour = self.forecast(network_size)
+            print(f"[DataReporter] {airtime_us / 1000:.1f} ms en el aire por trama, colisión {collision:.1%} "
+                  f"con {network_size} nodos, máximo {max_per_hour} tramas/h por nodo")
+            schedule = self.schedule
+            if schedule and schedule.shared:
+                print(f"[DataReporter] {network_size} nodos no caben en {schedule.slots} ranuras de {schedule.width} ms: "
+                      f"la ranura {schedule.slot} se comparte")
+    def forecast(self, nodes: int):
+        """
+        Uso del canal si `nodes` nodos reportan como este: (tiempo en el aire
+        por trama en us, probabilidad de colisión por trama, tramas por hora
+        y por nodo que soporta el canal).
+        """
+        model, length, samples = self._report_frame()
+        lora_tx = _modules.get("lora_tx")
+        duty = lora_tx.duty_cycle_permille if lora_tx else None
+        return (model.frame_us(length), model.collision_probability(nodes, length, self.report_interval_s * samples),
+                model.max_reports_per_hour(nodes, length, duty))
+    def _report_frame(self):
+        """Modelo de tiempo en el aire, largo de la trama de reporte y muestras por trama."""
+        configuration = self.driver.configuration if self.driver else None
+        model = AirtimeModel.from_configuration(configuration) if configuration else AirtimeModel()
+        if self.batch_size <= 1:
+            length = len(build_command(BASE_STATION_ID, self.my_id, FRAME_TYPE_RESP, INITIAL_TTL, CMD_GET_SENSOR_STATUS, *_sensor_status()))
+            return model, length, 1
+        if self.batch_encoding == "series": return model, len(self._frame), self.batch_size
+        return model, len(self._frame), max(1, self.max_records // len(self.sensor_keys))
+    def _clock_updated(self):
+        self.schedule.synced = True
+    def _due(self) -> bool:
+        if self.schedule is None: return self.check()
+        return self.schedule.check(time.ticks_ms())
     def update(self):
-        if self.check(): self._send_status_to_base()
+        if self.backlog is not None and self.check("backlog"): self._drain_backlog()
+        if self._due():
+            now = int(time.time())
+            if self._congested():
+                # Contrapresión: la cola de salida no se vacía; la muestra se omite.
+                self.skipped += 1
+                self._unsent(now)
+                return
+            if self.backlog is not None and not self._base_reachable():
+                # Sin ruta a la base ningún vecino reenviaría la trama: la muestra queda solo en
+                # el historial.
+                self.unrouted += 1
+                self._unsent(now)
+                return
+            if self._unsent_since is not None:
+                self._mark_backlog(self._unsent_since + 1, now)
+                self._unsent_since = None
+            self._sample_ts = now
+            if self.batch_size <= 1: self._send_status_to_base()
+            elif self.batch_encoding == "series": self._add_series_sample()
+            else: self._add_sample()
+    def _add_series_sample(self):
+        now = int(time.time())
+        sample, series = self._sample, self._series
+        sample[0], _ = _sensor_status()
+        for i, key in enumerate(self.sensor_keys): sample[i + 1] = board.states.get(key, 0)
+        if series.count == 0: series.begin(now, len(sample), int(self.report_interval_s))
+        if not series.append(now, *sample):
+            self._flush_series()
+            series.begin(now, len(sample), int(self.report_interval_s))
+            series.append(now, *sample)
+        if series.count >= self.batch_size: self._flush_series()
+    def _flush_series(self):
+        if not self._series.count: return
+        size = HEADER_SIZE + self._series.finish()
+        pack_header_into(self._frame, 0, BASE_STATION_ID, self.my_id, FRAME_TYPE_RESP, INITIAL_TTL, CMD_SENSOR_SERIES, 0, size - HEADER_SIZE)
+        self._enqueue(bytes(memoryview(self._frame)[:size]))
+        self._series.count = 0
+    def _add_sample(self):
+        now = int(time.time())
+        temperature_scaled, _ = _sensor_status()
+        # Un RTC que retrocede (CMD_UPDATE_RTC, sincronización) o un lote de más de 65535 s
+        # deja el desplazamiento fuera del campo '>H': se cierra el lote y se abre otro.
+        if self._records and not 0 <= now - self._base_ts <= 0xFFFF: self._flush_batch()
+        for sensor_index, key in enumerate(self.sensor_keys):
+            if self._records == self.max_records: self._flush_batch()
+            if self._records == 0: self._base_ts = now
+            SENSOR_BATCH.pack_record_into(self._frame, HEADER_SIZE, self._records,
+                                          now - self._base_ts, sensor_index, temperature_scaled, board.states.get(key, 0))
+            self._records += 1
+        if self._records >= self.max_records: self._flush_batch()
+    def _flush_batch(self):
+        if not self._records: return
+        size = HEADER_SIZE + SENSOR_BATCH.payload_size(self._records)
+        pack_header_into(self._frame, 0, BASE_STATION_ID, self.my_id, FRAME_TYPE_RESP, INITIAL_TTL, CMD_SENSOR_BATCH, 0, size - HEADER_SIZE)
+        SENSOR_BATCH.pack_prefix_into(self._frame, HEADER_SIZE, self._base_ts)
+        self._enqueue(bytes(memoryview(self._frame)[:size]))
+        self._records = 0
     def _send_status_to_base(self):
-        pressure = board.states.get("pressure", 0)
-        temperature_scaled = int(board.states.get("temperature", 0) * 100)
-        payload = struct.pack('>hh', temperature_scaled, pressure)
-        packet = build_packet(BASE_STATION_ID, self.my_id, FRAME_TYPE_CMD, INITIAL_TTL, CMD_GET_SENSOR_STATUS, payload)
-        board.messages[f"{self.bus_type}_{self.bus_id}"]["out"].append(packet)
+        # Se envía como respuesta no solicitada a CMD_GET_SENSOR_STATUS: mismo layout que la respuesta a una consulta.
+        packet = build_command(BASE_STATION_ID, self.my_id, FRAME_TYPE_RESP, INITIAL_TTL, CMD_GET_SENSOR_STATUS, *_sensor_status())
+        self._enqueue(packet)
+    def _base_reachable(self) -> bool:
+        routing = _modules.get("routing")
+        return routing is None or routing.routing_table.next_hop(BASE_STATION_ID) is not None
+    def _unsent(self, now: int):
+        # Lo registrado desde la última muestra enviada queda pendiente; se marca a medida que
+        # pasa el tiempo para que un reinicio durante la caída no lo pierda.
+        if self._unsent_since is None: self._unsent_since = self._sample_ts
+        self._mark_backlog(self._unsent_since + 1, now + 1)
+    def _mark_backlog(self, start_ts: int, end_ts: int):
+        if self.backlog is not None: self.backlog.add_time(start_ts, end_ts)
+    def _drain_backlog(self):
+        # Una trama por vez y con la cola de salida vacía: los reportes, el control y lo que
+        # este nodo reenvía esperan como mucho una trama del historial. Se empieza cuando un
+        # reporte en vivo vuelve a salir y cierra el tramo de la caída.
+        out = board.messages[f"{self.bus_type}_{self.bus_id}"]["out"]
+        if out or not self.backlog.ranges or self._unsent_since is not None or not self._base_reachable(): return
+        link = _modules.get("reliable_link") if self.reliable else None
+        if link and link.congested(): return
+        frame = self._backlog_frame
+        count = self.backlog.take_into(frame, HEADER_SIZE, (len(frame) - HEADER_SIZE) // LOG_RECORDS.size)
+        if not count: return
+        size = HEADER_SIZE + count * LOG_RECORDS.size
+        pack_header_into(frame, 0, BASE_STATION_ID, self.my_id, FRAME_TYPE_RESP, INITIAL_TTL, CMD_SENSOR_BACKLOG, 0, size - HEADER_SIZE)
+        packet = bytes(memoryview(frame)[:size])
+        if link: link.send(packet)
+        else: out.push(packet, PRIO_BULK)
+    def _delivery_failed(self, packet):
+        # Entrega confiable o fragmentación agotaron los reintentos: lo que llevaba la trama vuelve
+        # a quedar pendiente, por los timestamps del payload.
+        view = parse_packet(packet)
+        if view is None or view.src_id != self.my_id or view.dest_id != BASE_STATION_ID: return
+        values, command = view.values, view.command
+        if values is None: return
+        if command == CMD_SENSOR_BACKLOG and values: self._mark_backlog(values[0][0], values[-1][0] + 1)
+        elif command == CMD_SENSOR_BATCH and values[1]: self._mark_backlog(values[0], values[0] + max(r[0] for r in values[1]) + 1)
+        elif command == CMD_SENSOR_SERIES and values[2]: self._mark_backlog(values[2][0][0], values[2][-1][0] + 1)
+        elif command == CMD_GET_SENSOR_STATUS:
+            # Sin timestamp: lo registrado durante lo que pudo durar la entrega (todos los reintentos).
+            link = _modules.get("reliable_link")
+            channel = link.channel if link else None
+            span_s = channel.rto_max_ms * (channel.max_retries + 1) // 1000 if channel else self.report_interval_s
+            now = int(time.time())
+            self._mark_backlog(now - span_s, now + 1)
+    def _congested(self) -> bool:
+        link = _modules.get("reliable_link") if self.reliable else None
+        if link and link.congested(): return True
+        return board.messages[f"{self.bus_type}_{self.bus_id}"]["out"].congested()
+    def _enqueue(self, packet):
+        link = _modules.get("reliable_link") if self.reliable else None
+        if link: link.send(packet)
+        # Un estado que no alcanzó a salir se reemplaza por el más reciente.
+        else: board.messages[f"{self.bus_type}_{self.bus_id}"]["out"].push(packet, PRIO_REPORT, CMD_GET_SENSOR_STATUS if self.batch_size <= 1 else None)
 
 # --- Funciones de Gestión de Módulos ---
 
@@ -1,17 +1,27 @@
 import struct
 
+# MicroPython no define struct.error: sus errores de empaquetado son ValueError.
+STRUCT_ERROR = getattr(struct, 'error', ValueError)
+
 # --- Definiciones de Comandos de Red y Aplicación ---
 # Comandos de Red (0x00 - 0x0F)
 CMD_HELLO = 0x01                 # Anuncio de Vecino (Broadcast)
 CMD_ROUTE_AD = 0x02              # Anuncio de Rutas (Broadcast)
+CMD_FRAGMENT = 0x03              # Fragmento de un mensaje mayor que una trama
+CMD_FRAGMENT_STATUS = 0x04       # Fragmentos recibidos de una transferencia
 
 # Comandos de Aplicación (0x10 - 0xFF)
 CMD_PING = 0x10                  # Petición de Ping
 CMD_GET_SENSOR_STATUS = 0x20     # Pedir estado de sensores (temp, presión, etc.)
+CMD_SENSOR_BATCH = 0x21          # Reporte agregado de varias lecturas en una trama
+CMD_SENSOR_SERIES = 0x22         # Serie temporal comprimida (delta + varint)
+CMD_SENSOR_BACKLOG = 0x23        # Registros guardados en la flash mientras la base no era alcanzable
 CMD_SET_CONFIG = 0x30            # Setear un valor de configuración
 CMD_GET_CONFIG = 0x31            # Pedir un valor de configuración
 CMD_UPDATE_RTC = 0x40            # Actualizar el reloj de tiempo real
 CMD_MODULE_CTRL = 0x41           # Habilitar/deshabilitar un módulo
+CMD_SET_SLOT = 0x42              # Asignar la ranura de reporte (TDMA)
+CMD_TIME_SYNC = 0x43             # Sincronización de reloj de ida y vuelta (t1..t4)
 CMD_GET_PARAM = 0x50  # <<< NUEVO: Obtener un parámetro específico
 CMD_SET_PARAM = 0x51  # <<< NUEVO: Establecer un parámetro específico
 
@@ -26,37 +36,570 @@ FRAME_TYPE_CMD = 0b00000000
 FRAME_TYPE_RESP = 0b01000000
 FRAME_TYPE_ACK = 0b10000000
 FRAME_TYPE_NACK = 0b11000000
+FRAME_TYPE_MASK = 0b11000000
 
 FLAG_ACK_REQUIRED = 0b00100000
+FLAG_SEQ_RESET = 0b00010000      # Primera trama de una sesión: su seq inicia la numeración hacia este destino
+ATTEMPT_MASK = 0b00000011        # Número de intento (mód. 4) de una retransmisión
 
 # --- Constantes de Enrutamiento ---
 BROADCAST_ID = 255
 INITIAL_TTL = 16 # Número máximo de saltos permitidos
 
-def build_packet(dest_id: int, src_id: int, control: int, ttl: int, command: int, payload: bytes = b''):
+# --- Structs Precompilados ---
+# MicroPython no implementa struct.Struct; se usa un sustituto mínimo con la
+# misma interfaz para que la tabla de comandos funcione en el nodo y en CPython.
+try:
+    _Struct = struct.Struct
+except AttributeError:
+    class _Struct:
+        __slots__ = ('format', 'size')
+        def __init__(self, fmt):
+            self.format = fmt
+            self.size = struct.calcsize(fmt)
+        def pack(self, *values): return struct.pack(self.format, *values)
+        def pack_into(self, buf, offset, *values): struct.pack_into(self.format, buf, offset, *values)
+        def unpack_from(self, buf, offset=0): return struct.unpack_from(self.format, buf, offset)
+
+# --- Estructura de la Cabecera ---
+# dest_id, src_id, control, ttl, command, seq, length
+# `length` es el largo del payload y permite separar tramas consecutivas en el
+# flujo del UART. Los paquetes locales de más de 255 bytes (antes de fragmentar
+# o ya reensamblados) llevan MAX_PAYLOAD_LEN; nunca salen al aire así.
+HEADER_FORMAT = '>BBBBBBB'
+HEADER = _Struct(HEADER_FORMAT)
+HEADER_SIZE = HEADER.size
+# Desplazamientos de cada campo dentro de la cabecera
+OFF_DEST, OFF_SRC, OFF_CONTROL, OFF_TTL, OFF_COMMAND, OFF_SEQ, OFF_LEN = 0, 1, 2, 3, 4, 5, 6
+MAX_PAYLOAD_LEN = 0xFF
+
+def pack_header_into(buf, offset: int, dest_id: int, src_id: int, control: int, ttl: int, command: int, seq: int, length: int):
+    """Escribe la cabecera en un buffer reutilizable; `length` es el largo del payload."""
+    HEADER.pack_into(buf, offset, dest_id, src_id, control, ttl, command, seq, min(length, MAX_PAYLOAD_LEN))
+
+def build_packet(dest_id: int, src_id: int, control: int, ttl: int, command: int, payload: bytes = b'', seq: int = 0):
     """
     Construye un paquete binario a partir de sus componentes.
-    Cabecera de 5 bytes + Payload.
+    Cabecera de 7 bytes + Payload.
     """
-    header = struct.pack('>BBBBB', dest_id, src_id, control, ttl, command)
+    header = HEADER.pack(dest_id, src_id, control, ttl, command, seq, min(len(payload), MAX_PAYLOAD_LEN))
     return header + payload
 
-def parse_packet(packet: bytes):
+def build_packet_into(buf, dest_id: int, src_id: int, control: int, ttl: int, command: int, payload=b'', offset: int = 0, seq: int = 0):
+    """
+    Variante de build_packet que escribe el paquete dentro de un bytearray
+    reutilizable, sin crear objetos nuevos. Retorna la cantidad de bytes escritos.
+    """
+    end = offset + HEADER_SIZE + len(payload)
+    if end > len(buf):
+        raise ValueError("Buffer demasiado pequeño para el paquete")
+    pack_header_into(buf, offset, dest_id, src_id, control, ttl, command, seq, len(payload))
+    buf[offset + HEADER_SIZE:end] = payload
+    return end - offset
+
+# --- Layouts de Payload ---
+# Cada layout sabe codificar (encode / encode_into) y decodificar (decode) un
+# payload. decode retorna una tupla o None si el payload no respeta el layout.
+
+class FixedLayout:
+    """Payload de tamaño fijo descrito por un formato struct."""
+    __slots__ = ('st', 'size')
+    def __init__(self, fmt: str):
+        self.st = _Struct(fmt)
+        self.size = self.st.size
+    def encode(self, *values):
+        return self.st.pack(*values)
+    def encode_into(self, buf, offset, *values):
+        self.st.pack_into(buf, offset, *values)
+        return self.size
+    def decode(self, payload):
+        if len(payload) != self.size:
+            return None
+        return self.st.unpack_from(payload, 0)
+
+class RecordLayout:
+    """Secuencia de registros de tamaño fijo. encode recibe un iterable de tuplas."""
+    __slots__ = ('st', 'size')
+    def __init__(self, fmt: str):
+        self.st = _Struct(fmt)
+        self.size = self.st.size
+    def encode(self, records):
+        buf = bytearray(self.size * len(records))
+        self.encode_into(buf, 0, records)
+        return bytes(buf)
+    def encode_into(self, buf, offset, records):
+        start = offset
+        for record in records:
+            self.st.pack_into(buf, offset, *record)
+            offset += self.size
+        return offset - start
+    def capacity(self, frame_size: int):
+        """Cantidad máxima de registros que caben en una trama de frame_size bytes."""
+        return max(0, (frame_size - HEADER_SIZE) // self.size)
+    def decode(self, payload):
+        if len(payload) % self.size:
+            return None
+        st = self.st
+        return tuple(st.unpack_from(payload, i) for i in range(0, len(payload), self.size))
+
+class BatchLayout:
+    """
+    Prefijo fijo seguido de registros de tamaño fijo. encode recibe los valores
+    del prefijo y luego el iterable de registros; decode retorna el prefijo
+    seguido de la tupla de registros. Los registros pueden escribirse de a uno
+    en un buffer reutilizable con pack_record_into.
+    """
+    __slots__ = ('prefix', 'record', 'size')
+    def __init__(self, prefix_fmt: str, record_fmt: str):
+        self.prefix = _Struct(prefix_fmt)
+        self.record = _Struct(record_fmt)
+        self.size = self.prefix.size
+    def capacity(self, frame_size: int):
+        """Cantidad máxima de registros que caben en una trama de frame_size bytes."""
+        return max(0, (frame_size - HEADER_SIZE - self.prefix.size) // self.record.size)
+    def encode(self, *args):
+        records = args[-1]
+        buf = bytearray(self.prefix.size + self.record.size * len(records))
+        self.encode_into(buf, 0, *args)
+        return bytes(buf)
+    def encode_into(self, buf, offset, *args):
+        records = args[-1]
+        self.prefix.pack_into(buf, offset, *args[:-1])
+        for i, record in enumerate(records):
+            self.pack_record_into(buf, offset, i, *record)
+        return self.prefix.size + self.record.size * len(records)
+    def pack_prefix_into(self, buf, offset, *values):
+        self.prefix.pack_into(buf, offset, *values)
+    def pack_record_into(self, buf, offset, index, *values):
+        """Escribe el registro `index` de un payload que comienza en `offset`."""
+        self.record.pack_into(buf, offset + self.prefix.size + index * self.record.size, *values)
+    def payload_size(self, count: int):
+        return self.prefix.size + self.record.size * count
+    def decode(self, payload):
+        body = len(payload) - self.prefix.size
+        if body < 0 or body % self.record.size:
+            return None
+        record, start, step = self.record, self.prefix.size, self.record.size
+        records = tuple(record.unpack_from(payload, i) for i in range(start, len(payload), step))
+        return self.prefix.unpack_from(payload, 0) + (records,)
+
+class BlobLayout:
+    """
+    Prefijo fijo seguido de bytes arbitrarios. decode retorna el prefijo y el
+    resto del payload como memoryview (sin copia) si el payload lo era.
+    """
+    __slots__ = ('prefix', 'size')
+    def __init__(self, prefix_fmt: str):
+        self.prefix = _Struct(prefix_fmt)
+        self.size = self.prefix.size
+    def encode(self, *args):
+        data = args[-1]
+        buf = bytearray(self.size + len(data))
+        self.encode_into(buf, 0, *args)
+        return bytes(buf)
+    def encode_into(self, buf, offset, *args):
+        data = args[-1]
+        self.prefix.pack_into(buf, offset, *args[:-1])
+        buf[offset + self.size:offset + self.size + len(data)] = data
+        return self.size + len(data)
+    def decode(self, payload):
+        if len(payload) < self.size:
+            return None
+        return self.prefix.unpack_from(payload, 0) + (payload[self.size:],)
+
+_DTYPE_STRUCTS = {
+    DTYPE_BOOL: _Struct('>B'),
+    DTYPE_UINT: _Struct('>I'),
+    DTYPE_SINT: _Struct('>i'),
+    DTYPE_FLOAT: _Struct('>f'),
+}
+
+def param_dtype(value):
+    """Infiere el DTYPE_* correspondiente a un valor de Python (None si no es soportado)."""
+    if isinstance(value, bool): return DTYPE_BOOL
+    if isinstance(value, float): return DTYPE_FLOAT
+    if isinstance(value, int): return DTYPE_UINT if value >= 0 else DTYPE_SINT
+    return None
+
+class ParamLayout:
+    """Parámetro tipado: param_id (1 byte), dtype (1 byte) y valor según dtype."""
+    __slots__ = ()
+    def encode(self, param_id, dtype, value):
+        buf = bytearray(2 + _DTYPE_STRUCTS[dtype].size)
+        self.encode_into(buf, 0, param_id, dtype, value)
+        return bytes(buf)
+    def encode_into(self, buf, offset, param_id, dtype, value):
+        st = _DTYPE_STRUCTS[dtype]
+        buf[offset] = param_id
+        buf[offset + 1] = dtype
+        st.pack_into(buf, offset + 2, (1 if value else 0) if dtype == DTYPE_BOOL else value)
+        return 2 + st.size
+    def decode(self, payload):
+        if len(payload) < 3:
+            return None
+        param_id, dtype = payload[0], payload[1]
+        st = _DTYPE_STRUCTS.get(dtype)
+        if st is None or len(payload) != 2 + st.size:
+            return None
+        value, = st.unpack_from(payload, 2)
+        if dtype == DTYPE_BOOL:
+            value = value > 0
+        return (param_id, dtype, value)
+
+# --- Codificación de Series Temporales (delta + zigzag + varint) ---
+# Payload: flags (1 byte, cantidad de canales en el nibble bajo), timestamp base
+# (u32), paso de tiempo compartido (varint, 0 = sin paso) y un flujo de tokens.
+# Cada muestra aporta 1 + canales valores: la desviación del timestamp respecto
+# del predicho (anterior + paso) y el delta de cada canal respecto de la muestra
+# previa (la primera se codifica respecto de 0, es decir, el valor base).
+# Token varint: (zigzag(delta) << 1) para un delta, o (n << 1) | 1 para una
+# racha de n deltas nulos, que puede abarcar varias muestras.
+
+SERIES_PREFIX = _Struct('>BI')
+SERIES_MAX_CHANNELS = 15
+
+def _zigzag(n):
+    return n << 1 if n >= 0 else ((-n) << 1) - 1
+
+def _unzigzag(n):
+    return n >> 1 if not n & 1 else -((n + 1) >> 1)
+
+def _varint_size(n):
+    size = 1
+    while n >= 0x80:
+        n >>= 7
+        size += 1
+    return size
+
+def _write_varint(buf, pos, n):
+    while n >= 0x80:
+        buf[pos] = (n & 0x7F) | 0x80
+        n >>= 7
+        pos += 1
+    buf[pos] = n
+    return pos + 1
+
+def _read_varint(buf, pos, end):
+    n = shift = 0
+    while True:
+        if pos >= end:
+            raise ValueError("Varint truncado")
+        if shift > 28:
+            raise ValueError("Varint de más de 32 bits")
+        b = buf[pos]
+        pos += 1
+        n |= (b & 0x7F) << shift
+        if not b & 0x80:
+            return n, pos
+        shift += 7
+
+class SeriesEncoder:
+    """
+    Codificador incremental de series sobre un buffer preasignado. append()
+    retorna False, sin escribir nada, si la muestra no cabe hasta `end`.
+    """
+    __slots__ = ('buf', 'start', 'pos', 'end', 'channels', 'step', 'prev_ts', 'prev', 'run', 'count')
+
+    def __init__(self, buf, offset=0, end=None):
+        self.buf = buf
+        self.start = offset
+        self.end = len(buf) if end is None else end
+        self.prev = [0] * SERIES_MAX_CHANNELS
+        self.channels = 0
+        self.count = 0
+
+    def begin(self, base_ts: int, channels: int, step: int = 0):
+        if not 0 < channels <= SERIES_MAX_CHANNELS:
+            raise ValueError("Cantidad de canales inválida")
+        SERIES_PREFIX.pack_into(self.buf, self.start, channels, base_ts)
+        self.pos = _write_varint(self.buf, self.start + SERIES_PREFIX.size, step)
+        self.channels = channels
+        self.step = step
+        self.prev_ts = base_ts - step
+        for i in range(channels):
+            self.prev[i] = 0
+        self.run = 0
+        self.count = 0
+
+    def append(self, ts: int, *values) -> bool:
+        # Primera pasada: calcula el tamaño exacto, incluida la racha pendiente al cerrar.
+        run, need, prev = self.run, 0, self.prev
+        d = ts - self.prev_ts - self.step
+        for i in range(-1, self.channels):
+            if i >= 0:
+                d = values[i] - prev[i]
+            if d == 0:
+                run += 1
+            else:
+                if run:
+                    need += _varint_size((run << 1) | 1)
+                    run = 0
+                need += _varint_size(_zigzag(d) << 1)
+        if run:
+            need += _varint_size((run << 1) | 1)
+        if self.pos + need > self.end:
+            return False
+        # Segunda pasada: escribe los tokens.
+        buf, pos, run = self.buf, self.pos, self.run
+        d = ts - self.prev_ts - self.step
+        for i in range(-1, self.channels):
+            if i >= 0:
+                d = values[i] - prev[i]
+                prev[i] = values[i]
+            if d == 0:
+                run += 1
+            else:
+                if run:
+                    pos = _write_varint(buf, pos, (run << 1) | 1)
+                    run = 0
+                pos = _write_varint(buf, pos, _zigzag(d) << 1)
+        self.pos, self.run, self.prev_ts = pos, run, ts
+        self.count += 1
+        return True
+
+    def finish(self) -> int:
+        """Cierra la racha pendiente y retorna el tamaño del payload."""
+        if self.run:
+            self.pos = _write_varint(self.buf, self.pos, (self.run << 1) | 1)
+            self.run = 0
+        return self.pos - self.start
+
+def iter_series(payload):
+    """
+    Decodificador en streaming: genera (timestamp, valor_1, ..., valor_n) por
+    muestra sin construir listas intermedias. Lanza ValueError si está truncado.
+    """
+    end = len(payload)
+    if end < SERIES_PREFIX.size + 1:
+        raise ValueError("Serie demasiado corta")
+    channels, ts = SERIES_PREFIX.unpack_from(payload, 0)
+    channels &= 0x0F
+    step, pos = _read_varint(payload, SERIES_PREFIX.size, end)
+    ts -= step
+    values = [0] * channels
+    run = 0
+    while pos < end or run:
+        for i in range(-1, channels):
+            if run:
+                run -= 1
+                d = 0
+            else:
+                token, pos = _read_varint(payload, pos, end)
+                if token & 1:
+                    if token == 1:
+                        raise ValueError("Racha vacía")
+                    run = (token >> 1) - 1
+                    d = 0
+                else:
+                    d = _unzigzag(token >> 1)
+            if i < 0:
+                ts += step + d
+            else:
+                values[i] += d
+        yield (ts,) + tuple(values)
+
+class SeriesLayout:
+    """Layout de la tabla de comandos para series comprimidas."""
+    __slots__ = ()
+    def encode(self, base_ts, step, samples):
+        samples = list(samples)
+        channels = len(samples[0]) - 1 if samples else 1
+        buf = bytearray(SERIES_PREFIX.size + 5 + len(samples) * (channels + 1) * 6)
+        n = self.encode_into(buf, 0, base_ts, step, samples)
+        return bytes(buf[:n])
+    def encode_into(self, buf, offset, base_ts, step, samples):
+        encoder = None
+        for sample in samples:
+            if encoder is None:
+                encoder = SeriesEncoder(buf, offset)
+                encoder.begin(base_ts, len(sample) - 1, step)
+            if not encoder.append(*sample):
+                raise ValueError("Buffer demasiado pequeño para la serie")
+        if encoder is None:
+            encoder = SeriesEncoder(buf, offset)
+            encoder.begin(base_ts, 1, step)
+        return encoder.finish()
+    def decode(self, payload):
+        if len(payload) < SERIES_PREFIX.size + 1:
+            raise ValueError("Serie demasiado corta")
+        _, base_ts = SERIES_PREFIX.unpack_from(payload, 0)
+        step, _ = _read_varint(payload, SERIES_PREFIX.size, len(payload))
+        return (base_ts, step, tuple(iter_series(payload)))
+
+EMPTY = FixedLayout('')
+PARAM = ParamLayout()
+# HELLO: plazo máximo hasta el próximo HELLO del emisor (temporizador Trickle), en unidades de HELLO_UNIT_S.
+HELLO = FixedLayout('>B')
+HELLO_UNIT_S = 4
+# Anuncio de rutas: (dest_id, siguiente salto, número de secuencia, costo) por ruta;
+# costo 0xFFFF = inalcanzable.
+ROUTE_AD = RecordLayout('>BBBH')
+# Prefijo: timestamp base (s). Registro: offset (s), índice de sensor, temperatura x100, presión psi.
+SENSOR_BATCH = BatchLayout('>I', '>HBhh')
+# Muestras (timestamp, temperatura x100, presión psi por sensor).
+SERIES = SeriesLayout()
+# Registros del historial local: timestamp (s), presión psi, temperatura x100 y banderas. Es el
+# formato de datalog.RECORD: el nodo copia los registros de la flash a la trama sin decodificarlos.
+LOG_RECORDS = RecordLayout('>IhhB')
+# Sincronización de reloj: t1 (el nodo al transmitir), t2 (la base al recibir) y t3
+# (la base al transmitir) como segundos desde epoch y milisegundos, los saltos y
+# la residencia en los relés de la petición (los copia la base) y la residencia
+# de esta trama, en ms módulo 2**16. La petición lleva el mismo layout (t2 y t3
+# en cero) para que ambos sentidos tarden lo mismo; t1 y t3 se escriben en
+# TIME_SYNC_T1 y TIME_SYNC_T3 justo antes de transmitir, y cada relé suma a
+# TIME_SYNC_RESIDENCE lo que retuvo la trama.
+TIMESTAMP = _Struct('>IH')
+TIME_SYNC = FixedLayout('>IHIHIHBHH')
+TIME_SYNC_T1, TIME_SYNC_T3 = HEADER_SIZE, HEADER_SIZE + 2 * TIMESTAMP.size
+TIME_SYNC_RESIDENCE = HEADER_SIZE + TIME_SYNC.size - 2
+# Fragmento: id de transferencia, comando original, índice, total de fragmentos,
+# tamaño de fragmento del emisor y datos. El receptor ubica cada fragmento con el
+# tamaño del emisor, que puede tener otro sub-paquete configurado.
+FRAGMENT = BlobLayout('>BBBBB')
+# Estado: id de transferencia, total y mapa de bits de fragmentos recibidos.
+FRAGMENT_STATUS = BlobLayout('>BB')
+
+# --- Tabla Declarativa de Comandos ---
+# Una única fuente de verdad para el formato de cada comando: el layout del
+# payload de la petición (FRAME_TYPE_CMD) y el de la respuesta (FRAME_TYPE_RESP).
+# None indica que esa dirección no existe para el comando.
+
+class CommandSpec:
+    __slots__ = ('command', 'name', 'request', 'response')
+    def __init__(self, command, name, request, response):
+        self.command = command
+        self.name = name
+        self.request = request
+        self.response = response
+
+COMMANDS = {}
+
+def register_command(command: int, name: str, request=None, response=None):
+    """Declara (o redefine) el layout de petición y respuesta de un comando."""
+    spec = CommandSpec(command, name, request, response)
+    COMMANDS[command] = spec
+    return spec
+
+register_command(CMD_HELLO,             'hello',             request=HELLO)
+register_command(CMD_ROUTE_AD,          'route_ad',          request=ROUTE_AD)
+register_command(CMD_FRAGMENT,          'fragment',          request=FRAGMENT, response=FRAGMENT)
+register_command(CMD_FRAGMENT_STATUS,   'fragment_status',   request=FRAGMENT_STATUS)
+register_command(CMD_PING,              'ping',              request=EMPTY, response=EMPTY)
+register_command(CMD_GET_SENSOR_STATUS, 'get_sensor_status', request=EMPTY, response=FixedLayout('>hh'))  # temperatura x100, presión psi
+register_command(CMD_SENSOR_BATCH,      'sensor_batch',      response=SENSOR_BATCH)
+register_command(CMD_SENSOR_SERIES,     'sensor_series',     response=SERIES)
+register_command(CMD_SENSOR_BACKLOG,    'sensor_backlog',    response=LOG_RECORDS)
+register_command(CMD_UPDATE_RTC,        'update_rtc',        request=FixedLayout('>I'))    # segundos desde epoch
+register_command(CMD_MODULE_CTRL,       'module_ctrl',       request=FixedLayout('>BB'))   # module_id, acción
+register_command(CMD_SET_SLOT,          'set_slot',          request=FixedLayout('>HH'))   # ranura, ranuras (0: la derivada del id)
+register_command(CMD_TIME_SYNC,         'time_sync',         request=TIME_SYNC, response=TIME_SYNC)
+register_command(CMD_GET_PARAM,         'get_param',         request=FixedLayout('>B'), response=PARAM)
+register_command(CMD_SET_PARAM,         'set_param',         request=PARAM)
+
+# Tramas FRAME_TYPE_ACK / FRAME_TYPE_NACK: command = CMD_NONE y payload con el
+# último seq recibido en orden (acumulativo) y un mapa de bits de los 8 siguientes.
+CMD_NONE = 0x00
+ACK_PAYLOAD = FixedLayout('>BB')
+
+_UNDECODED = object()
+
+def _layout(command: int, frame_type: int):
+    spec = COMMANDS.get(command)
+    if spec is None:
+        return None
+    return spec.response if frame_type == FRAME_TYPE_RESP else spec.request
+
+def encode_payload(command: int, frame_type: int, *values):
+    """Codifica los valores del payload de un comando según la tabla."""
+    layout = _layout(command, frame_type)
+    if layout is None:
+        raise ValueError("Comando sin layout para este tipo de trama")
+    return layout.encode(*values)
+
+def decode_payload(command: int, payload, frame_type: int = FRAME_TYPE_CMD):
+    """
+    Decodifica un payload según la tabla de comandos.
+    Retorna None si el comando no está declarado o si el payload no coincide.
+    """
+    layout = _layout(command, frame_type)
+    if layout is None:
+        return None
+    try:
+        return layout.decode(payload)
+    except (ValueError, IndexError, STRUCT_ERROR):
+        return None
+
+def build_command(dest_id: int, src_id: int, control: int, ttl: int, command: int, *values):
+    """Construye un paquete completo codificando el payload con la tabla de comandos."""
+    return build_packet(dest_id, src_id, control, ttl, command, encode_payload(command, control & FRAME_TYPE_MASK, *values))
+
+def build_command_into(buf, offset: int, dest_id: int, src_id: int, control: int, ttl: int, command: int, *values):
+    """Como build_command, pero escribe en un buffer reutilizable. Retorna los bytes escritos."""
+    layout = _layout(command, control & FRAME_TYPE_MASK)
+    if layout is None:
+        raise ValueError("Comando sin layout para este tipo de trama")
+    length = layout.encode_into(buf, offset + HEADER_SIZE, *values)
+    pack_header_into(buf, offset, dest_id, src_id, control, ttl, command, 0, length)
+    return HEADER_SIZE + length
+
+class PacketView:
+    """
+    Vista de solo lectura sobre un paquete recibido. No copia el buffer:
+    los campos de cabecera se leen una sola vez y el payload se decodifica
+    de forma perezosa la primera vez que se accede a `values`.
+    """
+    __slots__ = ('buf', 'dest_id', 'src_id', 'control', 'ttl', 'command', 'seq', '_values')
+
+    def __init__(self, packet=None):
+        self.buf = None
+        self._values = _UNDECODED
+        if packet is not None:
+            self.attach(packet)
+
+    def attach(self, packet):
+        """Reapunta la vista a otro paquete, permitiendo reutilizar el objeto."""
+        mv = packet if isinstance(packet, memoryview) else memoryview(packet)
+        self.buf = mv
+        self.dest_id = mv[0]
+        self.src_id = mv[1]
+        self.control = mv[2]
+        self.ttl = mv[3]
+        self.command = mv[4]
+        self.seq = mv[5]
+        self._values = _UNDECODED
+        return self
+
+    @property
+    def frame_type(self):
+        return self.control & FRAME_TYPE_MASK
+
+    @property
+    def payload(self):
+        """Payload como memoryview (sin copia)."""
+        return self.buf[HEADER_SIZE:]
+
+    @property
+    def values(self):
+        """Payload decodificado según la tabla de comandos (None si no es válido)."""
+        if self._values is _UNDECODED:
+            self._values = decode_payload(self.command, self.buf[HEADER_SIZE:], self.control & FRAME_TYPE_MASK)
+        return self._values
+
+    def __len__(self):
+        return len(self.buf)
+
+    def __repr__(self):
+        return "PacketView(dest={}, src={}, ctrl=0x{:02X}, ttl={}, cmd=0x{:02X}, seq={}, len={})".format(
+            self.dest_id, self.src_id, self.control, self.ttl, self.command, self.seq, len(self.buf))
+
+def parse_packet(packet):
     """
-    Analiza un paquete binario y lo devuelve como un diccionario.
+    Analiza un paquete binario y lo devuelve como un PacketView.
     Retorna None si el paquete es inválido.
     """
-    if not isinstance(packet, bytes) or len(packet) < 5:
+    if not isinstance(packet, (bytes, bytearray, memoryview)) or len(packet) < HEADER_SIZE:
         return None  # Paquete demasiado corto o tipo incorrecto
-    
-    dest_id, src_id, control, ttl, command = struct.unpack('>BBBBB', packet[:5])
-    payload = packet[5:]
-    
-    return {
-        "dest_id": dest_id,
-        "src_id": src_id,
-        "control": control,
-        "ttl": ttl,
-        "command": command,
-        "payload": struct.unpack('>hh',payload)
-    }
+    length = packet[OFF_LEN]
+    if length < MAX_PAYLOAD_LEN and len(packet) != HEADER_SIZE + length:
+        return None  # El largo declarado no coincide con la trama
+    return PacketView(packet)
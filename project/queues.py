@@ -0,0 +1,140 @@
+import time
+from array import array
+
+# --- Colas de Mensajes ---
+# Colas de capacidad fija para board.messages[bus]["in"/"out"]. Cada clase de
+# prioridad es un anillo preasignado; se atiende siempre la clase más urgente
+# con elementos. Cuando la cola está llena la política decide qué se pierde:
+#   drop_oldest : se descarta el elemento más antiguo, de cualquier clase.
+#   drop_lowest : se descarta el más antiguo de la clase menos urgente, si no
+#                 es más urgente que el nuevo; si lo es, se rechaza el nuevo.
+#   coalesce    : un elemento con la misma clave que otro en cola lo reemplaza
+#                 en su lugar; si no hay coincidencia se aplica drop_lowest.
+# Los productores consultan congested() para frenar antes de llegar a perder datos.
+
+PRIO_CONTROL = 0  # Enrutamiento, ACK/NACK, respuestas a comandos
+PRIO_ALARM = 1
+PRIO_REPORT = 2
+PRIO_BULK = 3     # Fragmentos y volcados largos
+PRIORITIES = 4
+
+DROP_OLDEST = "drop_oldest"
+DROP_LOWEST = "drop_lowest"
+COALESCE = "coalesce"
+
+class MessageQueue:
+    def __init__(self, capacity: int = 16, policy: str = DROP_LOWEST, high_water: int = None):
+        if not 0 < capacity < 256: raise ValueError("capacity fuera de rango")
+        if policy not in (DROP_OLDEST, DROP_LOWEST, COALESCE): raise ValueError("política desconocida")
+        self.capacity = capacity
+        self.policy = policy
+        self.high_water = high_water if high_water is not None else max(1, capacity * 3 // 4)
+        size = PRIORITIES * capacity
+        self._items = [None] * size
+        self._keys = [None] * size
+        self._stamps = array('l', [0] * size)
+        self._head = bytearray(PRIORITIES)
+        self._count = bytearray(PRIORITIES)
+        self.depth = 0
+        self.dropped = [0] * PRIORITIES  # contador de vida por clase: enteros sin tope, como stats
+        self.stats = {"depth": 0, "max_depth": 0, "pushed": 0, "popped": 0, "dropped": 0, "coalesced": 0,
+                      "rejected": 0, "wait_ms_total": 0, "wait_ms_max": 0}
+
+    def __len__(self):
+        return self.depth
+
+    def _index(self, prio, i):
+        return prio * self.capacity + (self._head[prio] + i) % self.capacity
+
+    def push(self, item, prio: int = PRIO_REPORT, key=None, now: int = None) -> bool:
+        """Encola `item` en la clase `prio`. Retorna False si la política lo rechazó."""
+        if self.policy == COALESCE and key is not None:
+            for i in range(self._count[prio]):
+                index = self._index(prio, i)
+                if self._keys[index] == key:
+                    # Conserva el lugar en la cola; la espera se cuenta desde el dato nuevo.
+                    self._items[index] = item
+                    self._stamps[index] = time.ticks_ms() if now is None else now
+                    self.stats["coalesced"] += 1
+                    return True
+        if now is None: now = time.ticks_ms()
+        if self.depth >= self.capacity and not self._evict(prio, now):
+            self.stats["rejected"] += 1
+            return False
+        index = self._index(prio, self._count[prio])
+        self._items[index] = item
+        self._keys[index] = key
+        self._stamps[index] = now
+        self._count[prio] += 1
+        self.depth += 1
+        stats = self.stats
+        stats["pushed"] += 1
+        stats["depth"] = self.depth
+        if self.depth > stats["max_depth"]: stats["max_depth"] = self.depth
+        return True
+
+    def _evict(self, prio, now) -> bool:
+        victim = -1
+        if self.policy == DROP_OLDEST:
+            age = -1
+            for c in range(PRIORITIES):
+                if self._count[c]:
+                    a = time.ticks_diff(now, self._stamps[self._index(c, 0)])
+                    if a > age: victim, age = c, a
+        else:
+            for c in range(PRIORITIES - 1, prio - 1, -1):
+                if self._count[c]:
+                    victim = c
+                    break
+        if victim < 0: return False
+        self._take(victim)
+        self.dropped[victim] += 1
+        self.stats["dropped"] += 1
+        return True
+
+    def _take(self, prio):
+        index = self._index(prio, 0)
+        item = self._items[index]
+        self._items[index] = None
+        self._keys[index] = None
+        self._head[prio] = (self._head[prio] + 1) % self.capacity
+        self._count[prio] -= 1
+        self.depth -= 1
+        self.stats["depth"] = self.depth
+        return item, index
+
+    def peek(self):
+        """Próximo elemento a salir, sin quitarlo de la cola. None si está vacía."""
+        for c in range(PRIORITIES):
+            if self._count[c]: return self._items[self._index(c, 0)]
+        return None
+
+    def pop(self, now: int = None):
+        """Quita y retorna el elemento más urgente (FIFO dentro de su clase). None si está vacía."""
+        for c in range(PRIORITIES):
+            if self._count[c]:
+                item, index = self._take(c)
+                if now is None: now = time.ticks_ms()
+                wait = time.ticks_diff(now, self._stamps[index])
+                stats = self.stats
+                stats["popped"] += 1
+                stats["wait_ms_total"] += wait
+                if wait > stats["wait_ms_max"]: stats["wait_ms_max"] = wait
+                return item
+        return None
+
+    def congested(self) -> bool:
+        """True desde la marca de nivel alto: los productores deben frenar."""
+        return self.depth >= self.high_water
+
+    def free(self) -> int:
+        return self.capacity - self.depth
+
+    def clear(self):
+        while self.depth: self._take(self.peek_priority())
+
+    def peek_priority(self) -> int:
+        """Clase del próximo elemento a salir, o -1 si la cola está vacía."""
+        for c in range(PRIORITIES):
+            if self._count[c]: return c
+        return -1
@@ -0,0 +1,108 @@
+import time, random
+
+# --- Calendario de Reportes ---
+# Un temporizador de intervalo fijo arranca con el nodo: los nodos que se
+# encienden juntos (un corte de energía en todo el sitio) reportan en el mismo
+# instante de cada intervalo y chocan siempre. Con el reloj de pared
+# sincronizado (DS3231 al arrancar o sincronización con la base), cada nodo transmite en
+# su propia ranura de una trama común; sin él, en un instante al azar de cada
+# intervalo.
+
+SCHEDULE_SLOTS = "slots"        # TDMA; acceso aleatorio mientras el reloj no esté sincronizado
+SCHEDULE_JITTER = "jitter"      # siempre acceso aleatorio
+SCHEDULE_INTERVAL = "interval"  # temporizador desde el arranque (comportamiento anterior)
+
+class SlotSchedule:
+    """
+    Ranuras de reporte sobre el RTC. La trama dura period_s y empieza cuando
+    el RTC pasa por un múltiplo de period_s, igual en todos los nodos; se
+    divide en `slots` ranuras iguales (network_size, o las que asigne la base)
+    y el nodo transmite guard_ms después del inicio de la suya. La guarda
+    cubre el error entre relojes; el resto de la ranura, la espera en la cola
+    de LoraTX y los reenvíos de la trama. Si las ranuras no alcanzan para
+    airtime_ms más dos guardas, se usan las que caben y varios nodos comparten
+    ranura. La ranura propia es SYSTEM_ID módulo la cantidad de ranuras.
+
+    El RTC solo da segundos: el milisegundo dentro de la trama se cuenta en
+    ticks desde el último paso de un segundo observado (un salto al fijar el
+    RTC no cuenta; el paso siguiente vuelve a anclar). Hasta observar uno, o
+    sin reloj sincronizado, se transmite una vez por período en un instante
+    al azar.
+    """
+    def __init__(self, node_id: int, period_s: int, airtime_ms: int, guard_ms: int = 100,
+                 network_size: int = 0, mode: str = SCHEDULE_SLOTS):
+        self.node_id = node_id
+        self.period_s = max(1, int(period_s))
+        self.period_ms = self.period_s * 1000
+        self.airtime_ms = airtime_ms
+        self.guard_ms = guard_ms
+        self.network_size = network_size or 0
+        self.mode = mode
+        self.synced = False
+        self.assigned = None  # (ranura, ranuras) asignadas por la base
+        self._second = None
+        self._second_at = None
+        self._last = None
+        self._frame = None
+        self._next = None
+        self.stats = {"slotted": 0, "jittered": 0}
+        self._layout()
+
+    def _layout(self):
+        slot, slots = self.assigned if self.assigned else (self.node_id, self.network_size)
+        need = self.airtime_ms + 2 * self.guard_ms
+        width = self.period_ms // slots if slots else 0
+        if width < need:
+            slots = max(1, self.period_ms // need)
+            width = self.period_ms // slots
+        self.slots, self.slot, self.width = slots, slot % slots, width
+        self.offset_ms = self.slot * width + self.guard_ms
+        # Se transmite como muy tarde una guarda después del instante previsto, o antes
+        # si la trama ya no terminaría dentro de la ranura.
+        self.window_ms = max(width - need, 0) or self.guard_ms
+
+    def assign(self, slot: int, slots: int):
+        """Ranura asignada por la base; slots = 0 vuelve a la derivada de SYSTEM_ID."""
+        self.assigned = (slot, slots) if slots else None
+        self._layout()
+
+    @property
+    def shared(self) -> bool:
+        """True si la ranura se comparte: hay más nodos (o ids) que ranuras."""
+        slots = self.assigned[1] if self.assigned else self.network_size
+        return not slots or slots > self.slots
+
+    def _position(self, now: int):
+        """Milisegundo dentro de la trama según el RTC, o None si todavía no se conoce."""
+        seconds = time.time()
+        if seconds != self._second:
+            if self._second is not None and seconds - self._second == 1: self._second_at = now
+            self._second = seconds
+        if self._second_at is None: return None
+        return (seconds % self.period_s) * 1000 + min(time.ticks_diff(now, self._second_at), 999)
+
+    def check(self, now: int) -> bool:
+        """True una vez por período, en el instante de transmitir."""
+        position = self._position(now) if self.mode == SCHEDULE_SLOTS and self.synced else None
+        if position is None: return self._jitter(now)
+        if self._last is not None and time.ticks_diff(now, self._last) < self.period_ms // 2: return False
+        if (position - self.offset_ms) % self.period_ms >= self.window_ms: return False
+        self._last = now
+        self._next = None
+        self.stats["slotted"] += 1
+        return True
+
+    def _jitter(self, now: int) -> bool:
+        if self._next is None:
+            self._frame = now
+            self._next = time.ticks_add(now, self._random_offset())
+        if time.ticks_diff(now, self._next) < 0: return False
+        self._frame = time.ticks_add(self._frame, self.period_ms)
+        self._next = time.ticks_add(self._frame, self._random_offset())
+        self._last = now
+        self.stats["jittered"] += 1
+        return True
+
+    def _random_offset(self) -> int:
+        # getrandbits(8) evita enteros largos: period_ms * 255 < 2**30 hasta períodos de más de una hora.
+        return (self.period_ms * random.getrandbits(8)) >> 8
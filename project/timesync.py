@@ -0,0 +1,121 @@
+import time
+from protocol import TIME_SYNC_RESIDENCE
+
+# --- Sincronización de Reloj ---
+# Intercambio de ida y vuelta al estilo NTP con la estación base: el nodo manda
+# t1 (su hora al transmitir), la base responde con t1, t2 (su hora al recibir)
+# y t3 (al transmitir) y el nodo anota t4 al recibir. Si el retardo es igual en
+# ambos sentidos, desfase = ((t2 - t1) + (t3 - t4)) / 2 y retardo de ida y
+# vuelta = (t4 - t1) - (t3 - t2). Petición y respuesta tienen el mismo largo,
+# así el UART y el tiempo en el aire de cada salto se cancelan; t1 y t3 se
+# sellan al escribir la trama en el UART y t2 y t4 al sacarla, así la espera en
+# las colas tampoco entra. La espera en los relés, distinta en cada sentido,
+# la mide cada relé con sus ticks (llegada al framer, salida al UART) y la suma
+# en la trama, como un reloj transparente de PTP: se descuenta de cada sentido.
+# Si la ida y la vuelta van por caminos de distinto largo, el retardo se reparte
+# por saltos (todos tardan lo mismo con tramas del mismo largo). Lo que no se
+# mide (acceso al canal, reintentos) se filtra descartando los intercambios que
+# tardaron mucho más por salto que el más rápido visto.
+
+def diff_ms(a, b) -> int:
+    """a - b en milisegundos, con a y b como (segundos, milisegundos)."""
+    return (a[0] - b[0]) * 1000 + a[1] - b[1]
+
+def add_residence(frame, ms: int):
+    """Suma ms (módulo 2**16) a la residencia de una trama CMD_TIME_SYNC: el relé resta los ticks de llegada y suma los de salida."""
+    value = ((frame[TIME_SYNC_RESIDENCE] << 8 | frame[TIME_SYNC_RESIDENCE + 1]) + ms) & 0xFFFF
+    frame[TIME_SYNC_RESIDENCE], frame[TIME_SYNC_RESIDENCE + 1] = value >> 8, value & 0xFF
+
+class ClockSync:
+    """
+    Hora de pared del nodo con resolución de milisegundos, llevada con
+    ticks_ms desde una referencia y corregida por la deriva estimada del
+    cristal (drift_ppm: lo que hay que sumar por millón de ms locales).
+
+    Cada intercambio aceptado corrige la hora por el desfase medido y, desde
+    el segundo, ajusta la deriva por la mitad del desfase dividido por el
+    tiempo desde el anterior, como mucho DRIFT_STEP_PPM por intercambio: un
+    desfase que se coló con demora en un solo sentido no tira la deriva. El
+    intervalo entre intercambios se duplica mientras el desfase no pase de
+    target_ms / 2 y se reduce a la mitad si pasa de target_ms, entre
+    min_interval_s y max_interval_s; al desfase se le descuenta antes la mitad
+    de la demora por encima de la mínima, que puede ser error de medición y no
+    del reloj. Ni los intercambios descartados ni los perdidos acortan el
+    intervalo: en una red congestionada más pedidos solo empeoran las cosas.
+    """
+    MAX_DRIFT_PPM = 100
+    DRIFT_STEP_PPM = 10
+
+    def __init__(self, min_interval_s: int = 64, max_interval_s: int = 4096, target_ms: int = 50,
+                 rtt_slack_ms: int = 100):
+        self.min_interval_s = min_interval_s
+        self.max_interval_s = max(max_interval_s, min_interval_s)
+        self.target_ms = target_ms
+        self.rtt_slack_ms = rtt_slack_ms
+        self.interval_s = min_interval_s
+        self.drift_ppm = 0
+        self.synced = False
+        self.offset_ms = 0
+        self.rtt_ms = 0
+        self.hop_min_ms = None
+        self._s, self._ms, self._ticks = 0, 0, time.ticks_ms()
+        self._last_ticks = None
+        self.stats = {"exchanges": 0, "rejected": 0, "lost": 0}
+
+    def set(self, seconds: int, ms: int = 0, ticks: int = None):
+        """Fija la hora (desde el RTC, el DS3231 o CMD_UPDATE_RTC) sin tocar la deriva."""
+        self._s, self._ms = seconds, ms
+        self._ticks = time.ticks_ms() if ticks is None else ticks
+
+    def now(self, ticks: int = None):
+        """Hora corregida como (segundos, milisegundos)."""
+        if ticks is None: ticks = time.ticks_ms()
+        elapsed = time.ticks_diff(ticks, self._ticks)
+        # (elapsed // 1000) * ppm // 1000 mantiene los productos lejos de 2**30.
+        total = self._ms + elapsed + (elapsed // 1000) * self.drift_ppm // 1000
+        if elapsed > 86_400_000:
+            # ticks_diff deja de valer pasados unos 6 días: se mueve la referencia.
+            self._s, self._ms, self._ticks = self._s + total // 1000, total % 1000, ticks
+            return self._s, self._ms
+        return self._s + total // 1000, total % 1000
+
+    def exchange(self, t1, t2, t3, t4, ticks: int, out_ms: int = 0, back_ms: int = 0,
+                 out_hops: int = 1, back_hops: int = 1):
+        """
+        Aplica un intercambio completo (marcas como (segundos, milisegundos); t4
+        tomada en `ticks`; out_ms y back_ms, la residencia en los relés de ida y
+        de vuelta; out_hops y back_hops, los saltos de cada sentido). Retorna el
+        desfase corregido en ms, o None si se descartó.
+        """
+        self.stats["exchanges"] += 1
+        hops = max(out_hops + back_hops, 2)
+        rtt = diff_ms(t4, t1) - diff_ms(t3, t2) - out_ms - back_ms
+        offset = (diff_ms(t2, t1) - out_ms + diff_ms(t3, t4) + back_ms - rtt * (out_hops - back_hops) // hops) // 2
+        self.rtt_ms = rtt
+        excess = rtt - self.hop_min_ms * hops if self.hop_min_ms is not None else 0
+        if rtt < 0 or excess > self.rtt_slack_ms:
+            # Acceso al canal o reintentos: el mínimo envejece de a poco por si cambió el enlace.
+            if excess > 0: self.hop_min_ms += max(min(excess // 8, self.rtt_slack_ms // 4) // hops, 1)
+            self.stats["rejected"] += 1
+            return None
+        if self.hop_min_ms is None or rtt < self.hop_min_ms * hops: self.hop_min_ms = rtt // hops
+        s, ms = self.now(ticks)
+        total = ms + offset
+        self._s, self._ms, self._ticks = s + total // 1000, total % 1000, ticks
+        if self.synced and self._last_ticks is not None:
+            span_s = time.ticks_diff(ticks, self._last_ticks) // 1000
+            if span_s > 0:
+                step = max(-self.DRIFT_STEP_PPM, min(self.DRIFT_STEP_PPM, offset * 1000 // span_s // 2))
+                drift = self.drift_ppm + step
+                self.drift_ppm = max(-self.MAX_DRIFT_PPM, min(self.MAX_DRIFT_PPM, drift))
+        error = max(abs(offset) - (rtt - self.hop_min_ms * hops) // 2, 0)
+        if error <= self.target_ms // 2: self.interval_s = min(self.interval_s * 2, self.max_interval_s)
+        elif error > self.target_ms: self.interval_s = max(self.interval_s // 2, self.min_interval_s)
+        self._last_ticks = ticks
+        self.offset_ms = offset
+        self.synced = True
+        return offset
+
+    def lost(self):
+        """Un intercambio sin respuesta."""
+        self.stats["lost"] += 1
@@ -0,0 +1,287 @@
+import time, random
+from protocol import (
+    build_packet, ACK_PAYLOAD, CMD_NONE, INITIAL_TTL,
+    OFF_DEST, OFF_SRC, OFF_CONTROL, OFF_SEQ,
+    FRAME_TYPE_ACK, FRAME_TYPE_NACK, FLAG_ACK_REQUIRED, FLAG_SEQ_RESET, ATTEMPT_MASK,
+)
+
+# --- Capa de Entrega Confiable ---
+# Números de secuencia de 8 bits por destino, ventana deslizante de tramas
+# pendientes de confirmación, timeout de retransmisión adaptativo y ACKs
+# acumulativos (último seq en orden + mapa de bits de los 8 siguientes) enviados
+# con retardo para confirmar varias tramas con una sola transmisión.
+# La ventana abarca como máximo ACK_BITMAP_BITS números de secuencia contados
+# desde la trama pendiente más antigua, así el receptor nunca avanza su ACK
+# acumulativo sobre un hueco. Una sesión empieza con una única trama marcada
+# con FLAG_SEQ_RESET (su seq es el primero de la sesión); si una trama agota
+# sus reintentos, el emisor abre una sesión nueva para saltar el hueco.
+# No depende del hardware: el tiempo se recibe en cada llamada (ticks_ms) y las
+# tramas salen por el callback `emit` como copias `bytes`. Quien escribe la
+# trama en el aire lo informa con on_sent(): recién ahí arranca el RTO, y
+# mientras una copia espera en la cola de salida no se encola otra.
+
+ACK_BITMAP_BITS = 8
+
+class RttEstimator:
+    """
+    Estimador de RTT y timeout de retransmisión (Jacobson/Karels, RFC 6298).
+    El RTO nunca baja de rto_min más la demora máxima del ACK en el receptor:
+    las muestras mezclan ACKs inmediatos y demorados, y un RTO ajustado a los
+    primeros vencería antes de que llegue un ACK demorado.
+    """
+    __slots__ = ('srtt', 'rttvar', 'rto', 'rto_min', 'rto_max')
+
+    def __init__(self, rto_initial_ms: int, rto_min_ms: int, rto_max_ms: int, ack_delay_ms: int = 0):
+        self.srtt = 0
+        self.rttvar = 0
+        self.rto_min = rto_min_ms + ack_delay_ms
+        self.rto_max = rto_max_ms
+        self.rto = min(rto_max_ms, max(self.rto_min, rto_initial_ms))
+
+    def sample(self, rtt_ms: int):
+        if self.srtt == 0:
+            self.srtt = rtt_ms
+            self.rttvar = rtt_ms // 2
+        else:
+            self.rttvar = (3 * self.rttvar + abs(self.srtt - rtt_ms)) // 4
+            self.srtt = (7 * self.srtt + rtt_ms) // 8
+        self.rto = min(self.rto_max, max(self.rto_min, self.srtt + 4 * self.rttvar))
+
+    def backoff(self):
+        self.rto = min(self.rto_max, self.rto * 2)
+
+    def restore(self):
+        """Deshace el backoff cuando el par vuelve a confirmar tramas."""
+        if self.srtt:
+            self.rto = min(self.rto_max, max(self.rto_min, self.srtt + 4 * self.rttvar))
+
+class _Outstanding:
+    __slots__ = ('frame', 'queued', 'sent_ms', 'deadline', 'retries')
+    def __init__(self, frame):
+        self.frame = frame
+        self.queued = False  # Hay una copia esperando en la cola de salida
+        self.sent_ms = 0     # Al encolar: momento del push; al salir al aire: de la escritura
+        self.deadline = None
+        self.retries = 0
+
+class _Peer:
+    __slots__ = ('next_seq', 'pending', 'outstanding', 'rtt', 'synced',
+                 'known', 'cum', 'bitmap', 'ack_due')
+    def __init__(self, rtt):
+        # Estado de emisor
+        self.next_seq = random.getrandbits(8)
+        self.pending = []
+        self.outstanding = []
+        self.rtt = rtt
+        self.synced = False
+        # Estado de receptor
+        self.known = False
+        self.cum = 0
+        self.bitmap = 0
+        self.ack_due = None
+
+class ReliableChannel:
+    def __init__(self, my_id: int, emit, window: int = ACK_BITMAP_BITS, max_pending: int = 8,
+                 rto_initial_ms: int = 3000, rto_min_ms: int = 500, rto_max_ms: int = 60000,
+                 max_retries: int = 4, ack_delay_ms: int = 250, on_fail=None):
+        self.my_id = my_id
+        self.emit = emit
+        self.window = min(window, ACK_BITMAP_BITS)
+        self.max_pending = max_pending
+        self.rto_initial_ms = rto_initial_ms
+        self.rto_min_ms = rto_min_ms
+        self.rto_max_ms = rto_max_ms
+        self.max_retries = max_retries
+        # Es un parámetro de toda la red: se usa como demora de los ACKs propios y
+        # como cota de la demora de los ACKs del par al calcular el RTO.
+        self.ack_delay_ms = ack_delay_ms
+        self.on_fail = on_fail
+        self.peers = {}
+        self.stats = {"sent": 0, "retransmits": 0, "requeued": 0, "acked": 0, "failed": 0, "dropped": 0,
+                      "acks_sent": 0, "delivered": 0, "duplicates": 0, "rejected": 0}
+
+    def _peer(self, node_id: int):
+        peer = self.peers.get(node_id)
+        if peer is None:
+            peer = _Peer(RttEstimator(self.rto_initial_ms, self.rto_min_ms, self.rto_max_ms, self.ack_delay_ms))
+            self.peers[node_id] = peer
+        return peer
+
+    # --- Lado emisor ---
+
+    def send(self, packet) -> bool:
+        """
+        Encola un paquete completo para entrega confiable. El seq y las banderas
+        se asignan al entrar en la ventana. Retorna False si la cola está llena.
+        """
+        peer = self._peer(packet[OFF_DEST])
+        if len(peer.pending) >= self.max_pending:
+            self.stats["dropped"] += 1
+            return False
+        peer.pending.append(bytearray(packet))
+        return True
+
+    def congested(self, node_id: int) -> bool:
+        """True si un send() hacia node_id sería rechazado por la cola llena."""
+        peer = self.peers.get(node_id)
+        return peer is not None and len(peer.pending) >= self.max_pending
+
+    def in_flight(self, node_id: int) -> int:
+        peer = self.peers.get(node_id)
+        return len(peer.outstanding) + len(peer.pending) if peer else 0
+
+    def on_ack(self, parsed, now: int):
+        """Procesa una trama ACK/NACK (PacketView) dirigida a este nodo."""
+        values = ACK_PAYLOAD.decode(parsed.payload)
+        if values is None: return
+        cum, bitmap = values
+        peer = self._peer(parsed.src_id)
+        keep, highest_sacked = [], -1
+        for entry in peer.outstanding:
+            seq = entry.frame[OFF_SEQ]
+            if (cum - seq) & 0xFF < 128:
+                acked = True
+            else:
+                bit = (seq - cum - 1) & 0xFF
+                acked = bit < ACK_BITMAP_BITS and (bitmap >> bit) & 1
+                if acked and bit > highest_sacked: highest_sacked = bit
+            if acked:
+                # Algoritmo de Karn: solo se mide el RTT de tramas no retransmitidas.
+                if entry.retries == 0 and not entry.queued: peer.rtt.sample(time.ticks_diff(now, entry.sent_ms))
+                if entry.frame[OFF_CONTROL] & FLAG_SEQ_RESET: peer.synced = True
+                self.stats["acked"] += 1
+            else:
+                keep.append(entry)
+        if len(keep) < len(peer.outstanding): peer.rtt.restore()
+        peer.outstanding = keep
+        if parsed.frame_type == FRAME_TYPE_NACK:
+            # Retransmisión rápida de los huecos anteriores a la última trama confirmada.
+            for entry in keep:
+                if entry.retries == 0 and (entry.frame[OFF_SEQ] - cum - 1) & 0xFF < highest_sacked:
+                    self._retransmit(peer, entry, now, backoff=False)
+
+    def on_sent(self, frame, now: int) -> bool:
+        """
+        Informa que `frame` se escribió en el módulo de radio. Arranca el RTO de
+        la trama pendiente con ese seq. False si no es una trama propia en espera.
+        """
+        if frame[OFF_SRC] != self.my_id or not frame[OFF_CONTROL] & FLAG_ACK_REQUIRED: return False
+        peer = self.peers.get(frame[OFF_DEST])
+        if peer is None: return False
+        seq = frame[OFF_SEQ]
+        for entry in peer.outstanding:
+            if entry.queued and entry.frame[OFF_SEQ] == seq:
+                entry.queued = False
+                entry.sent_ms = now
+                entry.deadline = time.ticks_add(now, peer.rtt.rto)
+                return True
+        return False
+
+    def _push(self, entry, now):
+        entry.queued = True
+        entry.sent_ms = now
+        entry.deadline = None
+        self.emit(bytes(entry.frame))
+
+    def _retransmit(self, peer, entry, now, backoff: bool):
+        # La copia anterior todavía no salió: otra costaría su propio tiempo en el aire.
+        if entry.queued: return
+        if entry.retries >= self.max_retries:
+            peer.outstanding.remove(entry)
+            # El receptor queda detenido en este hueco: la próxima trama abre sesión nueva.
+            peer.synced = False
+            self.stats["failed"] += 1
+            if self.on_fail: self.on_fail(entry.frame)
+            return
+        if backoff: peer.rtt.backoff()
+        entry.retries += 1
+        # El número de intento distingue la retransmisión de las copias del
+        # original en la caché de duplicados de los nodos que reenvían.
+        entry.frame[OFF_CONTROL] = (entry.frame[OFF_CONTROL] & ~ATTEMPT_MASK) | (entry.retries & ATTEMPT_MASK)
+        self.stats["retransmits"] += 1
+        self._push(entry, now)
+
+    def _window_open(self, peer) -> bool:
+        """
+        True si next_seq cabe en la ventana contada desde la trama pendiente más
+        antigua. Sin sesión confirmada solo viaja la trama de reinicio, para que
+        su seq sea el primero de la sesión.
+        """
+        if not peer.outstanding:
+            return True
+        if not peer.synced:
+            return False
+        return (peer.next_seq - peer.outstanding[0].frame[OFF_SEQ]) & 0xFF < self.window
+
+    # --- Lado receptor ---
+
+    def on_frame(self, parsed, now: int) -> bool:
+        """
+        Registra una trama con FLAG_ACK_REQUIRED y programa su ACK.
+        Retorna False si es un duplicado que no debe procesarse otra vez o si
+        cae fuera de la ventana (se descarta sin mover el ACK acumulativo).
+        """
+        peer = self._peer(parsed.src_id)
+        seq = parsed.seq
+        if not peer.known or (parsed.control & FLAG_SEQ_RESET and not self._recent(peer, seq)):
+            peer.known = True
+            peer.cum = (seq - 1) & 0xFF
+            peer.bitmap = 0
+        diff = (seq - peer.cum) & 0xFF
+        if diff == 0 or diff >= 128 or (diff <= ACK_BITMAP_BITS and (peer.bitmap >> (diff - 1)) & 1):
+            self.stats["duplicates"] += 1
+            peer.ack_due = now  # El ACK anterior se perdió: se repite de inmediato.
+            return False
+        if diff > ACK_BITMAP_BITS:
+            self.stats["rejected"] += 1
+            peer.ack_due = now  # Se informa al emisor hasta dónde llegó el receptor.
+            return False
+        peer.bitmap |= 1 << (diff - 1)
+        while peer.bitmap & 1:
+            peer.cum = (peer.cum + 1) & 0xFF
+            peer.bitmap >>= 1
+        self.stats["delivered"] += 1
+        if peer.bitmap:
+            peer.ack_due = now  # Hay un hueco: NACK inmediato.
+        elif peer.ack_due is None:
+            peer.ack_due = time.ticks_add(now, self.ack_delay_ms)
+        return True
+
+    @staticmethod
+    def _recent(peer, seq: int) -> bool:
+        """True si seq está entre las últimas tramas recibidas (retransmisión de algo ya visto)."""
+        behind = (peer.cum - seq) & 0xFF
+        ahead = (seq - peer.cum) & 0xFF
+        return behind < ACK_BITMAP_BITS or (0 < ahead <= ACK_BITMAP_BITS and (peer.bitmap >> (ahead - 1)) & 1)
+
+    # --- Ciclo ---
+
+    def update(self, now: int):
+        """
+        Envía tramas nuevas dentro de la ventana, retransmite vencidas y emite ACKs.
+        Una copia que lleva rto_max en la cola sin salir se da por descartada de
+        la cola y se vuelve a encolar tal cual (no cuenta como intento).
+        """
+        for node_id, peer in self.peers.items():
+            while peer.pending and self._window_open(peer):
+                frame = peer.pending.pop(0)
+                frame[OFF_SEQ] = peer.next_seq
+                frame[OFF_CONTROL] |= FLAG_ACK_REQUIRED | (0 if peer.synced else FLAG_SEQ_RESET)
+                peer.next_seq = (peer.next_seq + 1) & 0xFF
+                entry = _Outstanding(frame)
+                peer.outstanding.append(entry)
+                self.stats["sent"] += 1
+                self._push(entry, now)
+            for entry in peer.outstanding[:]:
+                if entry.queued:
+                    if time.ticks_diff(now, entry.sent_ms) >= self.rto_max_ms:
+                        self.stats["requeued"] += 1
+                        self._push(entry, now)
+                elif time.ticks_diff(now, entry.deadline) >= 0:
+                    self._retransmit(peer, entry, now, backoff=True)
+            if peer.ack_due is not None and time.ticks_diff(now, peer.ack_due) >= 0:
+                frame_type = FRAME_TYPE_NACK if peer.bitmap else FRAME_TYPE_ACK
+                self.emit(build_packet(node_id, self.my_id, frame_type, INITIAL_TTL, CMD_NONE,
+                                       ACK_PAYLOAD.encode(peer.cum, peer.bitmap)))
+                self.stats["acks_sent"] += 1
+                peer.ack_due = None
@@ -0,0 +1,15 @@
+"""
+Pruebas en el host (CPython) de los módulos del firmware. tools/hostenv.py
+agrega las carpetas del proyecto a sys.path, instala las funciones de tiempo
+de MicroPython sobre hostenv.clock y la máquina simulada de fakehw para
+importar los módulos del nodo sin modificarlos.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'tools'))
+
+import hostenv  # noqa: E402
+
+hostenv.install_time()
+hostenv.install_micropython()
@@ -0,0 +1,39 @@
+from backlog import Backlog
+from datalog import RingLog
+
+def _marked(backlog):
+    return [n for first, end in backlog.ranges for n in range(first, end)]
+
+def _expected(log, start_ts, end_ts):
+    return [n for n in range(log.tail, log.head) if start_ts <= log.read(n)[0] < end_ts]
+
+def _stepped_log(path):
+    # 128 B por página: 12 registros. El reloj vuelve 300 s atrás en el registro 30, a mitad de página.
+    log = RingLog(path, pages=8, page_size=128)
+    for i in range(30): log.append(1000 + 10 * i, i, 0)
+    for i in range(40): log.append(1000 + 10 * i, 100 + i, 0)
+    return log
+
+def test_add_time_after_backward_clock_step(tmp_path):
+    log = _stepped_log(str(tmp_path / "data.log"))
+    backlog = Backlog(log, str(tmp_path / "backlog.bin"), max_ranges=8)
+    backlog.add_time(1100, 1200)
+    assert _marked(backlog) == _expected(log, 1100, 1200)
+    assert len(backlog) == 20
+
+def test_add_time_after_reopening_a_stepped_log(tmp_path):
+    log = _stepped_log(str(tmp_path / "data.log"))
+    log.close()
+    log = RingLog(str(tmp_path / "data.log"), pages=8, page_size=128)
+    backlog = Backlog(log, str(tmp_path / "backlog.bin"), max_ranges=8)
+    for start_ts, end_ts in ((1000, 1050), (1250, 1400), (1280, 1300), (0, 2000)):
+        backlog.ranges = []
+        backlog.add_time(start_ts, end_ts)
+        assert _marked(backlog) == _expected(log, start_ts, end_ts), (start_ts, end_ts)
+
+def test_add_time_on_monotonic_log(tmp_path):
+    log = RingLog(str(tmp_path / "data.log"), pages=4, page_size=128)
+    for i in range(40): log.append(1000 + 10 * i, i, 0)
+    backlog = Backlog(log, str(tmp_path / "backlog.bin"))
+    backlog.add_time(1105, 1305)
+    assert backlog.ranges == [[11, 31]]
@@ -0,0 +1,39 @@
+import hostenv
+import modules
+from datalog import RingLog, LOG_FLAG_UNSYNCED
+
+T_2026, T_2000 = 1_790_000_000, 946_684_800
+
+class _Clock:
+    synced = True
+
+def _log_at(logger, monkeypatch, seconds):
+    monkeypatch.setattr(modules.time, "time", lambda: seconds)
+    hostenv.clock.advance_ms(1000)
+    logger.update()
+
+def test_unsynced_records_keep_time_order(tmp_path, monkeypatch):
+    logger = modules.DataLogger({"log_interval_s": 1, "path": str(tmp_path / "data.log"), "pages": 4, "page_size": 256})
+    monkeypatch.setitem(modules._modules, "clock", _Clock())
+    for i in range(20): _log_at(logger, monkeypatch, T_2026 + 60 * i)
+    logger.log.close()
+    # Reinicio sin DS3231 ni hora de la red: el reloj arranca en 2000.
+    logger = modules.DataLogger({"log_interval_s": 1, "path": str(tmp_path / "data.log"), "pages": 4, "page_size": 256})
+    modules._modules["clock"].synced = False
+    for i in range(20): _log_at(logger, monkeypatch, T_2000 + 60 * i)
+    log = logger.log
+    stamps = [log.read(n)[0] for n in range(log.tail, log.head)]
+    assert stamps == sorted(stamps)
+    timestamp, _, _, flags = log.read(log.head - 1)
+    assert timestamp == T_2026 + 60 * 19 and flags & LOG_FLAG_UNSYNCED
+    # El primero con esa hora es el último registro sincronizado, en la página anterior.
+    assert log.seek(T_2026 + 60 * 19) == 19
+    logger.log.close()
+
+def test_seek_on_monotonic_log(tmp_path):
+    log = RingLog(str(tmp_path / "seek.log"), pages=4, page_size=128)
+    for i in range(50): log.append(1000 + 10 * i, i, 0)
+    assert log.seek(0) == log.tail
+    assert log.seek(1000 + 10 * 45) == 45
+    assert log.seek(1000 + 10 * 45 - 5) == 45
+    assert log.seek(10 ** 9) == log.head
@@ -0,0 +1,130 @@
+from fragment import FragmentChannel
+from protocol import (
+    build_packet, parse_packet, FRAME_TYPE_RESP, INITIAL_TTL, CMD_SENSOR_SERIES, CMD_FRAGMENT, CMD_FRAGMENT_STATUS,
+)
+
+NODE_ID, BASE_ID = 1, 0
+FRAME_SIZE = 40  # 28 bytes de datos por fragmento
+
+class _Endpoint:
+    def __init__(self, node_id, frame_size=FRAME_SIZE, **args):
+        self.air = []
+        self.delivered = []
+        self.failed = []
+        self.channel = FragmentChannel(node_id, self.air.append, self.delivered.append, frame_size=frame_size,
+                                       on_fail=self.failed.append, **args)
+    def take(self):
+        frames = [parse_packet(f) for f in self.air]
+        self.air.clear()
+        return frames
+
+def _packet(size):
+    return build_packet(BASE_ID, NODE_ID, FRAME_TYPE_RESP, INITIAL_TTL, CMD_SENSOR_SERIES, bytes(i & 0xFF for i in range(size)))
+
+def _fragments(node, packet, now=0):
+    """Envía `packet` y retorna sus fragmentos de la primera ronda."""
+    assert node.channel.send(packet)
+    frames = []
+    for t in range(now, now + 10000, 10):
+        node.channel.update(t)
+        frames += node.take()
+        if node.channel._active.deadline is not None: break
+    return frames
+
+def _status(base, now):
+    base.channel.update(now)
+    (status,) = [f for f in base.take() if f.command == CMD_FRAGMENT_STATUS]
+    return status
+
+def test_out_of_order_fragments_are_reassembled():
+    node, base = _Endpoint(NODE_ID), _Endpoint(BASE_ID)
+    packet = _packet(140)
+    frames = _fragments(node, packet)
+    assert len(frames) == 5 and all(f.command == CMD_FRAGMENT for f in frames)
+    for frame in reversed(frames):
+        base.channel.on_frame(frame, 100)
+    assert base.delivered == [packet]
+    assert base.channel.stats["reassembled"] == 1
+
+def test_fragments_use_the_sender_chunk_size():
+    # El receptor tiene otro sub-paquete configurado: ubica los datos con el tamaño del emisor.
+    for receiver_size in (FRAME_SIZE - 16, FRAME_SIZE + 60):
+        node, base = _Endpoint(NODE_ID), _Endpoint(BASE_ID, frame_size=receiver_size)
+        packet = _packet(140)
+        for frame in reversed(_fragments(node, packet)):
+            base.channel.on_frame(frame, 100)
+        assert base.delivered == [packet] and base.channel.stats["rejected"] == 0
+
+def test_duplicate_fragments_are_stored_once():
+    node, base = _Endpoint(NODE_ID), _Endpoint(BASE_ID)
+    packet = _packet(100)
+    frames = _fragments(node, packet)
+    for frame in frames[:-1] + frames[:-1]:
+        base.channel.on_frame(frame, 100)
+    assert base.channel.stats["received"] == len(frames) - 1 and not base.delivered
+    base.channel.on_frame(frames[-1], 100)
+    base.channel.on_frame(frames[-1], 110)
+    assert base.delivered == [packet]
+    assert _status(base, 110).values[2] == b'\x0f'
+    # Un fragmento repetido tras completar repite el estado final, que pudo perderse.
+    base.channel.on_frame(frames[0], 200)
+    assert _status(base, 200).values[2] == b'\x0f'
+    assert len(base.delivered) == 1
+
+def test_status_bitmap_and_selective_retransmit():
+    node, base = _Endpoint(NODE_ID), _Endpoint(BASE_ID, status_delay_ms=500)
+    packet = _packet(300)  # 11 fragmentos
+    frames = _fragments(node, packet)
+    assert len(frames) == 11
+    for frame in frames:
+        if frame.values[2] not in (1, 3, 10): base.channel.on_frame(frame, 100)
+    # Sin silencio todavía no hay estado.
+    base.channel.update(400)
+    assert not base.take()
+    status = _status(base, 600)
+    xfer_id, total, bitmap = status.values
+    assert total == 11 and bytes(bitmap) == bytes([0b11110101, 0b00000011])
+    node.channel.on_frame(status, 700)
+    resent = []
+    for t in range(700, 800, 10):
+        node.channel.update(t)
+        resent += node.take()
+    assert [f.values[2] for f in resent] == [1, 3, 10]
+    assert node.channel.stats["retransmits"] == 3
+    for frame in resent:
+        base.channel.on_frame(frame, 800)
+    assert base.delivered == [packet]
+    node.channel.on_frame(_status(base, 800), 900)
+    assert not node.channel.busy() and node.channel.stats["completed"] == 1
+
+def test_missing_final_fragment_is_probed_then_fails():
+    node, base = _Endpoint(NODE_ID, rto_ms=1000, max_rounds=2), _Endpoint(BASE_ID)
+    packet = _packet(100)
+    frames = _fragments(node, packet)
+    for frame in frames[:-1]:
+        base.channel.on_frame(frame, 100)
+    # Ningún estado llega al emisor: al vencer el RTO reenvía el último fragmento para provocarlo.
+    probes = []
+    for t in range(100, 5000, 10):
+        node.channel.update(t)
+        probes += node.take()
+    assert [f.values[2] for f in probes] == [3, 3]
+    assert node.failed == [packet] and node.channel.stats["failed"] == 1
+    assert not node.channel.busy()
+    # El sondeo completa la transferencia del lado del receptor.
+    base.channel.on_frame(probes[0], 5000)
+    assert base.delivered == [packet]
+
+def test_receiver_slot_times_out_for_a_new_source():
+    base = _Endpoint(BASE_ID, max_sources=1, timeout_ms=1000)
+    first, second = _Endpoint(NODE_ID), _Endpoint(7)
+    frames = _fragments(first, _packet(100))
+    base.channel.on_frame(frames[0], 0)
+    other = build_packet(BASE_ID, 7, FRAME_TYPE_RESP, INITIAL_TTL, CMD_SENSOR_SERIES, bytes(100))
+    other_frames = _fragments(second, other)
+    # La ranura sigue ocupada por la transferencia inconclusa del nodo 1.
+    base.channel.on_frame(other_frames[0], 500)
+    assert base.channel.stats["rejected"] == 1
+    for frame in other_frames:
+        base.channel.on_frame(frame, 1500)
+    assert base.delivered == [other]
@@ -0,0 +1,57 @@
+import fakehw
+import hostenv
+import hardware
+from lib.lora_e220 import LoRaE220
+from virtual_e220 import Ether, VirtualE220
+
+REG3_RSSI, REG3_FIXED = 0x80, 0x40
+
+def _module(reg3):
+    """Driver sobre un E220 virtual con REG3 = reg3 en sus registros guardados."""
+    registers = bytes([0x00, 0x05, 0x62, 0x00, 0x17, reg3, 0x00, 0x00])
+    uart = fakehw.UART(1, baudrate=9600, txbuf=512)
+    module = VirtualE220(hostenv.clock, uart, aux_pin=4, m0_pin=18, m1_pin=19, ether=Ether(hostenv.clock),
+                         registers=registers)
+    driver = LoRaE220('900T30D', uart, aux_pin=4, m0_pin=18, m1_pin=19)
+    assert driver.begin() == 1
+    return module, driver
+
+def test_module_is_read_not_written_by_default():
+    module, driver = _module(0x03 | REG3_FIXED)
+    saved = bytes(module.saved)
+    rssi = hardware._configure_lora(driver, {"rssi": True, "fixed_transmission": False})
+    # El framer sigue al módulo (sin byte de RSSI) y el modo fijo puesto a mano se conserva.
+    assert rssi is False
+    assert bytes(module.registers) == saved and bytes(module.saved) == saved
+    assert driver.config_stats["writes"] == 0
+
+def test_configure_module_writes_volatile_registers():
+    module, driver = _module(0x03)
+    saved = bytes(module.saved)
+    assert hardware._configure_lora(driver, {"rssi": True, "configure_module": True}) is True
+    assert module.rssi_enabled and bytes(module.saved) == saved
+
+def test_configure_module_permanent_writes_saved_registers():
+    module, driver = _module(0x03)
+    assert hardware._configure_lora(driver, {"rssi": True, "configure_module": "permanent"}) is True
+    assert module.saved[5] & REG3_RSSI
+
+def test_fixed_mode_is_kept_without_the_option():
+    module, driver = _module(0x03 | REG3_FIXED)
+    hardware._configure_lora(driver, {"rssi": True, "configure_module": True})
+    assert module.fixed and module.address == 0x0005 and module.rssi_enabled
+
+def test_fixed_transmission_sets_mode_and_address(monkeypatch):
+    monkeypatch.setitem(hardware.config_manager._config, "SYSTEM_ID", 0x0107)
+    module, driver = _module(0x03)
+    hardware._configure_lora(driver, {"fixed_transmission": True, "configure_module": True})
+    assert module.fixed and module.address == 0x07
+    hardware._configure_lora(driver, {"fixed_transmission": False, "configure_module": True})
+    assert not module.fixed
+
+def test_busy_follows_the_lora_drivers(monkeypatch):
+    module, driver = _module(0x03)
+    monkeypatch.setitem(hardware._drivers, "lora_test", driver)
+    assert not hardware.busy()
+    assert driver.send_async(b"hola") == 1
+    assert hardware.busy()
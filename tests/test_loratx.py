@@ -0,0 +1,53 @@
+import hostenv
+import board
+import hardware
+import modules
+from lora_e220_operation_constant import ResponseStatusCode
+from protocol import build_command, FRAME_TYPE_RESP, INITIAL_TTL, CMD_GET_SENSOR_STATUS
+from queues import MessageQueue
+
+class _Driver:
+    """Driver mínimo: send_async retorna siempre `code`."""
+    configuration = None
+    def __init__(self, code):
+        self.code = code
+        self.calls = 0
+    def sub_packet_size(self): return 200
+    def channel(self): return 23
+    def busy(self): return False
+    def send_async(self, message, *address, timeout=1000, airtime_ms=None):
+        self.calls += 1
+        return self.code
+    def poll_tx(self): return None
+
+def _loratx(code):
+    hardware._drivers["lora_test"] = _Driver(code)
+    board.messages["uart_9"] = {"in": MessageQueue(4), "out": MessageQueue(4)}
+    board.messages["uart_9"]["out"].push(build_command(0, 1, FRAME_TYPE_RESP, INITIAL_TTL, CMD_GET_SENSOR_STATUS, 1, 2))
+    return modules.LoraTX({"device_key": "lora_test", "bus_type": "uart", "bus_id": "9", "check_interval_s": 0.1,
+                           "duty_cycle_permille": 10, "tx_retries": 2})
+
+def _cycles(tx, n):
+    for _ in range(n):
+        hostenv.clock.advance_ms(200)
+        tx.update()
+
+def test_failed_write_is_retried_then_dropped_without_charge():
+    tx = _loratx(ResponseStatusCode.ERR_E220_DATA_SIZE_NOT_MATCH)
+    out = board.messages["uart_9"]["out"]
+    _cycles(tx, 2)
+    assert len(out) == 1 and tx.tx_stats["errors"] == 0
+    _cycles(tx, 1)
+    assert len(out) == 0
+    assert tx.driver.calls == 3
+    assert tx.tx_stats["errors"] == 1
+    assert tx.tx_stats["airtime_us_total"] == 0
+    assert tx.utilization() == 0.0
+
+def test_successful_write_is_charged():
+    tx = _loratx(ResponseStatusCode.E220_SUCCESS)
+    _cycles(tx, 1)
+    assert len(board.messages["uart_9"]["out"]) == 0
+    assert tx.tx_pending
+    assert tx.tx_stats["airtime_us_total"] > 0
+    assert tx.utilization() > 0.0
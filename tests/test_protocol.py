@@ -0,0 +1,107 @@
+import pytest
+
+from protocol import (
+    SeriesEncoder, iter_series, decode_payload, _read_varint, _write_varint, SERIES, SERIES_PREFIX,
+    FRAME_TYPE_CMD, FRAME_TYPE_RESP, CMD_SENSOR_SERIES, CMD_SENSOR_BATCH, CMD_GET_SENSOR_STATUS,
+    CMD_SET_PARAM, CMD_UPDATE_RTC,
+)
+
+SAMPLES = [
+    (1_700_000_000, 2150, 812),
+    (1_700_000_030, 2150, 812),   # solo el paso: racha de deltas nulos
+    (1_700_000_060, 2150, 812),
+    (1_700_000_091, 2148, -3),    # desvío del paso y presión negativa
+    (1_700_000_121, -32768, 32767),
+    (1_700_000_151, -32768, 32767),
+]
+
+def _encode(samples, step=30, size=256):
+    buf = bytearray(size)
+    encoder = SeriesEncoder(buf)
+    encoder.begin(samples[0][0], len(samples[0]) - 1, step)
+    for sample in samples:
+        assert encoder.append(*sample)
+    return bytes(buf[:encoder.finish()])
+
+def _varint(n):
+    buf = bytearray(10)
+    return bytes(buf[:_write_varint(buf, 0, n)])
+
+@pytest.mark.parametrize("step", [0, 30])
+def test_series_round_trip(step):
+    payload = _encode(SAMPLES, step)
+    assert list(iter_series(payload)) == SAMPLES
+    assert decode_payload(CMD_SENSOR_SERIES, payload, FRAME_TYPE_RESP) == (SAMPLES[0][0], step, tuple(SAMPLES))
+
+def test_series_run_spanning_samples_is_compact():
+    samples = [(1000 + 60 * i, 500, 700, 900) for i in range(40)]
+    payload = _encode(samples, 60)
+    # Prefijo, paso, la primera muestra (desvío nulo y tres valores base) y una sola
+    # racha de 2 bytes para las 39 restantes.
+    assert len(payload) == SERIES_PREFIX.size + 1 + (1 + 3 * 2) + 2
+    assert list(iter_series(payload)) == samples
+
+def test_series_layout_encode_matches_encoder():
+    assert SERIES.encode(SAMPLES[0][0], 30, SAMPLES) == _encode(SAMPLES, 30)
+    assert SERIES.decode(SERIES.encode(123, 10, [])) == (123, 10, ())
+
+def test_encoder_rejects_sample_that_does_not_fit():
+    buf = bytearray(SERIES_PREFIX.size + 1 + 7)
+    encoder = SeriesEncoder(buf)
+    encoder.begin(0, 2, 1)
+    assert encoder.append(0, 1000, 2000)
+    pos = encoder.pos
+    assert not encoder.append(1, 50000, 60000)
+    assert encoder.pos == pos and encoder.count == 1
+    assert list(iter_series(buf[:encoder.finish()])) == [(0, 1000, 2000)]
+
+def test_encoder_rejects_invalid_channel_count():
+    encoder = SeriesEncoder(bytearray(32))
+    with pytest.raises(ValueError):
+        encoder.begin(0, 0)
+    with pytest.raises(ValueError):
+        encoder.begin(0, 16)
+
+def test_varint_limits():
+    for n in (0, 1, 0x7F, 0x80, 0x3FFF, 0x4000, 0xFFFFFFFF, (1 << 35) - 1):
+        data = _varint(n)
+        assert _read_varint(data, 0, len(data)) == (n, len(data))
+    with pytest.raises(ValueError, match="truncado"):
+        _read_varint(b'\x80\x80', 0, 2)
+    # El fin se respeta aunque el buffer siga.
+    with pytest.raises(ValueError, match="truncado"):
+        _read_varint(b'\x80\x01', 0, 1)
+    with pytest.raises(ValueError, match="32 bits"):
+        _read_varint(b'\x80\x80\x80\x80\x80\x01', 0, 6)
+
+def test_truncated_series_is_rejected():
+    payload = _encode(SAMPLES, 30)
+    for cut in range(SERIES_PREFIX.size + 1):
+        assert decode_payload(CMD_SENSOR_SERIES, payload[:cut], FRAME_TYPE_RESP) is None
+    # Un varint cortado a mitad de la muestra.
+    bad = payload + b'\x80'
+    with pytest.raises(ValueError):
+        list(iter_series(bad))
+    assert decode_payload(CMD_SENSOR_SERIES, bad, FRAME_TYPE_RESP) is None
+
+def test_overlong_and_empty_run_tokens_are_rejected():
+    prefix = SERIES_PREFIX.pack(1, 1000) + _varint(0)
+    overlong = prefix + b'\xff' * 6 + b'\x01'
+    assert decode_payload(CMD_SENSOR_SERIES, overlong, FRAME_TYPE_RESP) is None
+    # Un token de racha con n = 0 dejaría a iter_series en un ciclo sin fin.
+    assert decode_payload(CMD_SENSOR_SERIES, prefix + b'\x01', FRAME_TYPE_RESP) is None
+
+def test_decode_payload_bound_checks():
+    assert decode_payload(CMD_GET_SENSOR_STATUS, b'\x00\x01\x00\x02', FRAME_TYPE_RESP) == (1, 2)
+    assert decode_payload(CMD_GET_SENSOR_STATUS, b'\x00\x01\x00', FRAME_TYPE_RESP) is None
+    assert decode_payload(CMD_UPDATE_RTC, b'\x00\x00\x00\x01\x00') is None
+    # Lote: prefijo de 4 bytes y registros de 7.
+    assert decode_payload(CMD_SENSOR_BATCH, b'\x00' * 3, FRAME_TYPE_RESP) is None
+    assert decode_payload(CMD_SENSOR_BATCH, b'\x00' * 12, FRAME_TYPE_RESP) is None
+    assert decode_payload(CMD_SENSOR_BATCH, b'\x00' * 11, FRAME_TYPE_RESP) == (0, ((0, 0, 0, 0),))
+    # Parámetro con dtype desconocido o valor del largo equivocado.
+    assert decode_payload(CMD_SET_PARAM, b'\x01\x09\x00\x00\x00\x00') is None
+    assert decode_payload(CMD_SET_PARAM, b'\x01\x01\x00\x00') is None
+    # Sin layout para esa dirección o comando desconocido.
+    assert decode_payload(CMD_SENSOR_SERIES, _encode(SAMPLES), FRAME_TYPE_CMD) is None
+    assert decode_payload(0xEE, b'') is None
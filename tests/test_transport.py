@@ -0,0 +1,213 @@
+from protocol import (
+    build_command, parse_packet, FRAME_TYPE_RESP, FRAME_TYPE_ACK, FRAME_TYPE_NACK, INITIAL_TTL, CMD_GET_SENSOR_STATUS,
+    ACK_PAYLOAD, FLAG_ACK_REQUIRED, FLAG_SEQ_RESET, OFF_CONTROL, OFF_SEQ, ATTEMPT_MASK,
+)
+from queues import MessageQueue, COALESCE, PRIO_REPORT
+from transport import ReliableChannel, RttEstimator
+
+NODE_ID, BASE_ID = 1, 0
+
+def _report(i):
+    return build_command(BASE_ID, NODE_ID, FRAME_TYPE_RESP, INITIAL_TTL, CMD_GET_SENSOR_STATUS, i, 100 + i)
+
+def _run(channel, start, end, step=100):
+    for now in range(start, end, step):
+        channel.update(now)
+
+def test_no_retransmit_while_previous_copy_is_queued():
+    # Cola que nunca se vacía (ciclo de trabajo agotado o módulo ocupado).
+    queued = []
+    channel = ReliableChannel(NODE_ID, queued.append, rto_initial_ms=1000, rto_max_ms=60000)
+    channel.send(_report(0))
+    _run(channel, 0, 20000)
+    assert len(queued) == 1
+    assert channel.stats["retransmits"] == 0
+    assert isinstance(queued[0], bytes)
+
+def test_rto_starts_when_frame_goes_on_air():
+    queued = []
+    channel = ReliableChannel(NODE_ID, queued.append, rto_initial_ms=1000)
+    channel.send(_report(0))
+    channel.update(0)
+    # Sale al aire 5 s después de encolarse: la espera no cuenta como pérdida.
+    assert channel.on_sent(queued[0], 5000)
+    _run(channel, 5000, 5900)
+    assert len(queued) == 1
+    channel.update(6000)
+    assert len(queued) == 2 and queued[1] is not queued[0]
+    assert queued[0][OFF_CONTROL] & ATTEMPT_MASK == 0
+    assert queued[1][OFF_CONTROL] & ATTEMPT_MASK == 1
+    # Hasta que salga la retransmisión no se encola otra.
+    _run(channel, 6100, 20000)
+    assert len(queued) == 2
+
+def test_stale_copy_is_requeued_in_place():
+    out = MessageQueue(4, COALESCE)
+    def emit(frame):
+        out.push(frame, PRIO_REPORT, (frame[0], frame[OFF_SEQ]), 0)
+    channel = ReliableChannel(NODE_ID, emit, rto_max_ms=10000)
+    channel.send(_report(0))
+    _run(channel, 0, 30100)
+    assert channel.stats["requeued"] == 3
+    assert channel.stats["retransmits"] == 0
+    assert len(out) == 1
+
+def test_rtt_sample_excludes_queue_wait():
+    queued = []
+    channel = ReliableChannel(NODE_ID, queued.append, rto_initial_ms=3000, rto_min_ms=100, ack_delay_ms=0)
+    channel.send(_report(0))
+    channel.update(0)
+    channel.on_sent(queued[0], 8000)
+    acks = []
+    base = ReliableChannel(BASE_ID, acks.append, ack_delay_ms=0)
+    base.on_frame(parse_packet(queued[0]), 8100)
+    base.update(8100)
+    channel.on_ack(parse_packet(acks[0]), 8200)
+    assert channel.peers[BASE_ID].rtt.srtt == 200
+
+class _Endpoint:
+    """Canal cuyas tramas salen al aire en el acto y quedan en `air` para entregarlas a mano."""
+    def __init__(self, node_id, **args):
+        self.air = []
+        self.channel = ReliableChannel(node_id, self._emit, **args)
+        self.now = 0
+    def _emit(self, frame):
+        self.air.append(frame)
+        self.channel.on_sent(frame, self.now)
+    def update(self, now):
+        self.now = now
+        self.channel.update(now)
+    def take(self):
+        frames, self.air = self.air, []
+        return frames
+
+def _deliver(frames, endpoint, now, drop=()):
+    """Entrega `frames` a `endpoint`; retorna los valores de las tramas de datos aceptadas."""
+    accepted = []
+    for frame in frames:
+        view = parse_packet(frame)
+        if view.seq in drop and view.frame_type not in (FRAME_TYPE_ACK, FRAME_TYPE_NACK): continue
+        if view.frame_type in (FRAME_TYPE_ACK, FRAME_TYPE_NACK): endpoint.channel.on_ack(view, now)
+        elif endpoint.channel.on_frame(view, now): accepted.append(view.values)
+    return accepted
+
+def _pair(first_seq=0, **args):
+    node = _Endpoint(NODE_ID, ack_delay_ms=0, **args)
+    base = _Endpoint(BASE_ID, ack_delay_ms=0)
+    node.channel._peer(BASE_ID).next_seq = first_seq
+    return node, base
+
+def _sync(node, base, now=0):
+    """Envía la trama de reinicio de sesión y entrega su ACK."""
+    node.channel.send(_report(0))
+    node.update(now)
+    _deliver(node.take(), base, now)
+    base.update(now)
+    _deliver(base.take(), node, now)
+    assert node.channel.peers[BASE_ID].synced
+
+def test_sequence_numbers_wrap_around():
+    node, base = _pair(first_seq=250, max_pending=16)
+    _sync(node, base)
+    received = []
+    for i in range(1, 13):
+        node.channel.send(_report(i))
+    for now in range(100, 1000, 100):
+        node.update(now)
+        received += _deliver(node.take(), base, now)
+        base.update(now)
+        _deliver(base.take(), node, now)
+    assert [v[0] for v in received] == list(range(1, 13))
+    assert node.channel.in_flight(BASE_ID) == 0
+    assert base.channel.peers[NODE_ID].cum == (250 + 12) & 0xFF
+
+def test_hole_is_sacked_nacked_and_fast_retransmitted():
+    node, base = _pair(first_seq=254)
+    _sync(node, base)
+    for i in range(1, 4): node.channel.send(_report(i))
+    node.update(100)
+    frames = node.take()
+    seqs = [f[OFF_SEQ] for f in frames]
+    assert seqs == [255, 0, 1]
+    _deliver(frames, base, 100, drop=(0,))
+    # El hueco en 0 deja el ACK acumulativo en 255 y pide NACK inmediato con 1 en el mapa.
+    assert base.channel.peers[NODE_ID].cum == 255
+    base.update(100)
+    (nack,) = base.take()
+    view = parse_packet(nack)
+    assert view.frame_type == FRAME_TYPE_NACK
+    assert ACK_PAYLOAD.decode(view.payload) == (255, 0b10)
+    rto = node.channel.peers[BASE_ID].rtt.rto
+    _deliver([nack], node, 150)
+    # 255 confirmada por el acumulativo, 1 por el mapa; 0 sale de nuevo sin esperar el RTO.
+    (retransmit,) = node.take()
+    assert retransmit[OFF_SEQ] == 0 and retransmit[OFF_CONTROL] & ATTEMPT_MASK == 1
+    assert [e.frame[OFF_SEQ] for e in node.channel.peers[BASE_ID].outstanding] == [0]
+    assert node.channel.stats["retransmits"] == 1 and node.channel.peers[BASE_ID].rtt.rto == rto
+    _deliver([retransmit], base, 200)
+    assert base.channel.peers[NODE_ID].cum == 1 and base.channel.peers[NODE_ID].bitmap == 0
+
+def test_receiver_never_acks_past_a_hole():
+    node, base = _pair(first_seq=10)
+    _sync(node, base)
+    peer = base.channel.peers[NODE_ID]
+    # Más allá del mapa de bits: se rechaza sin mover el acumulativo.
+    far = bytearray(_report(1))
+    far[OFF_SEQ], far[OFF_CONTROL] = 10 + 10, far[OFF_CONTROL] | FLAG_ACK_REQUIRED
+    assert not base.channel.on_frame(parse_packet(far), 0)
+    assert peer.cum == 10 and peer.bitmap == 0 and base.channel.stats["rejected"] == 1
+
+def test_send_window_is_bounded_by_oldest_outstanding():
+    node, base = _pair(first_seq=0, window=4)
+    _sync(node, base)
+    for i in range(1, 10): node.channel.send(_report(i))
+    node.update(100)
+    frames = node.take()
+    assert [f[OFF_SEQ] for f in frames] == [1, 2, 3, 4]
+    # Se pierde la 1: las demás se confirman por el mapa pero la ventana sigue anclada en 1.
+    _deliver(frames, base, 100, drop=(1,))
+    base.update(100)
+    _deliver(base.take(), node, 100)
+    node.take()
+    node.update(150)
+    assert [f[OFF_SEQ] for f in node.take()] == []
+    assert [e.frame[OFF_SEQ] for e in node.channel.peers[BASE_ID].outstanding] == [1]
+
+def test_seq_reset_resyncs_receiver_after_sender_restart():
+    node, base = _pair(first_seq=40)
+    _sync(node, base)
+    assert base.channel.peers[NODE_ID].cum == 40
+    # El nodo se reinicia con otra numeración: su primera trama lleva FLAG_SEQ_RESET.
+    node, _ = _pair(first_seq=200)
+    node.channel.send(_report(7))
+    node.update(0)
+    (frame,) = node.take()
+    assert frame[OFF_CONTROL] & FLAG_SEQ_RESET
+    assert _deliver([frame], base, 0) == [(7, 107)]
+    assert base.channel.peers[NODE_ID].cum == 200
+    # Una copia repetida de la misma trama de reinicio es un duplicado, no otro reinicio.
+    assert _deliver([frame], base, 10) == []
+    assert base.channel.stats["duplicates"] == 1
+
+def test_failed_frame_opens_a_new_session():
+    node, base = _pair(first_seq=0, max_retries=1, rto_initial_ms=500, rto_min_ms=100)
+    _sync(node, base)
+    node.channel.send(_report(1))
+    for now in range(100, 5000, 100):
+        node.update(now)
+    assert node.channel.stats["failed"] == 1 and not node.channel.peers[BASE_ID].synced
+    node.take()
+    node.channel.send(_report(2))
+    node.update(5000)
+    (frame,) = node.take()
+    assert frame[OFF_CONTROL] & FLAG_SEQ_RESET
+    assert _deliver([frame], base, 5000) == [(2, 102)]
+
+def test_rto_floor_includes_ack_delay():
+    rtt = RttEstimator(3000, 500, 60000, ack_delay_ms=250)
+    for _ in range(20): rtt.sample(20)
+    assert rtt.rto == 750
+    rtt.backoff()
+    assert rtt.rto == 1500
+    rtt.restore()
+    assert rtt.rto == 750
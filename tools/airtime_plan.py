@@ -0,0 +1,127 @@
+"""
+Planificación de flota con el modelo de airtime.py: tiempo en el aire por
+velocidad de aire, reportes por hora sostenibles, probabilidad de colisión
+para distintos tamaños de red e intervalos de reporte, y tiempo en el aire
+por lectura de los reportes agregados (CMD_SENSOR_BATCH) según el sub-paquete.
+
+El barrido usa NumPy (vectorizado sobre velocidad x largo x nodos x
+intervalo) y se verifica contra el modelo escalar que corre en el nodo.
+
+Uso: python tools/airtime_plan.py [largo_reporte]
+"""
+import sys
+import time
+import tracemalloc
+
+import hostenv
+hostenv.install_time()
+hostenv.install_micropython()
+
+from airtime import AIR_RATE_SF_BW, ALOHA_MAX_LOAD, PREAMBLE_SYMBOLS, CODING_RATE, AirtimeModel, time_on_air_us  # noqa: E402
+from lora_e220_constants import AirDataRate, SubPacketSetting  # noqa: E402
+from protocol import COMMANDS, CMD_GET_SENSOR_STATUS, HEADER_SIZE, SENSOR_BATCH  # noqa: E402
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+RATES = (AirDataRate.AIR_DATA_RATE_010_24, AirDataRate.AIR_DATA_RATE_011_48, AirDataRate.AIR_DATA_RATE_100_96,
+         AirDataRate.AIR_DATA_RATE_101_192, AirDataRate.AIR_DATA_RATE_110_384, AirDataRate.AIR_DATA_RATE_111_625)
+
+def time_on_air_us_np(rates, lengths):
+    """time_on_air_us vectorizado: `rates` y `lengths` son arrays que se combinan por broadcasting."""
+    sf = np.array([AIR_RATE_SF_BW[r][0] for r in range(8)])[rates]
+    bw_shift = np.array([AIR_RATE_SF_BW[r][1] for r in range(8)])[rates]
+    sym = np.left_shift(8, sf) >> bw_shift
+    de = np.where(sym >= 16000, 2, 0)
+    low = sf < 7
+    bits = 8 * lengths + 16 - 4 * sf + 20 + np.where(low, 0, 8)
+    extra = np.where(low, 25, 17)
+    step = 4 * (sf - de)
+    payload = 8 + np.where(bits > 0, -(-bits // step) * (CODING_RATE + 4), 0)
+    return sym * (4 * (PREAMBLE_SYMBOLS + payload) + extra) // 4
+
+def check_reference():
+    # Calculadora de Semtech, SF7 / 125 kHz / CR 4/5 / 20 B: 56.58 ms; SF9: 185.34 ms.
+    assert time_on_air_us(AirDataRate.AIR_DATA_RATE_011_48, 20) == 56576
+    assert time_on_air_us(AirDataRate.AIR_DATA_RATE_010_24, 20) == 185344
+    model = AirtimeModel(AirDataRate.AIR_DATA_RATE_100_96, SubPacketSetting.SPS_064_10)
+    assert model.frame_us(130) == 2 * time_on_air_us(AirDataRate.AIR_DATA_RATE_100_96, 64) + \
+        time_on_air_us(AirDataRate.AIR_DATA_RATE_100_96, 2)
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for length in range(1, 255): model.frame_us(length)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    blocks = sum(s.count_diff for s in after.compare_to(before, 'filename') if s.count_diff > 0 and 'airtime' in str(s))
+    print("referencias de Semtech OK; bloques retenidos por frame_us en 254 llamadas: {}".format(blocks))
+
+def table(length):
+    print("\n{} B por reporte, sub-paquete de 200 B:".format(length))
+    print("{:<18} {:>9} {:>14} {:>14} {:>14}".format("velocidad", "aire ms", "máx/h 10 nod.", "máx/h 50 nod.",
+                                                     "máx/h 200 nod."))
+    for rate in RATES:
+        model = AirtimeModel(rate)
+        print("{:<18} {:>9.1f} {:>14} {:>14} {:>14}".format(
+            AirDataRate.get_description(rate), model.frame_us(length) / 1000,
+            *(model.max_reports_per_hour(n, length, 10) for n in (10, 50, 200))))
+    model = AirtimeModel()
+    print("\nColisión por reporte a {} con {} B (ALOHA puro):".format(AirDataRate.get_description(model.air_data_rate), length))
+    intervals = (30, 60, 300, 900)
+    print("{:<8}".format("nodos") + "".join("{:>10}".format("{} s".format(i)) for i in intervals))
+    for nodes in (10, 50, 200):
+        print("{:<8}".format(nodes) + "".join("{:>10.1%}".format(model.collision_probability(nodes, length, i))
+                                              for i in intervals))
+
+def batches():
+    single = HEADER_SIZE + COMMANDS[CMD_GET_SENSOR_STATUS].response.size
+    for rate in (AirDataRate.AIR_DATA_RATE_010_24, AirDataRate.AIR_DATA_RATE_100_96):
+        single_us = AirtimeModel(rate).frame_us(single)
+        print("\nAire por lectura a {}:".format(AirDataRate.get_description(rate)))
+        print("  reporte simple        {:>3} B          {:>6.1f} ms/lectura".format(single, single_us / 1000))
+        for setting in (SubPacketSetting.SPS_032_11, SubPacketSetting.SPS_064_10, SubPacketSetting.SPS_200_00):
+            model = AirtimeModel(rate, setting)
+            records = SENSOR_BATCH.capacity(model.sub_packet)
+            frame_us = model.frame_us(HEADER_SIZE + SENSOR_BATCH.payload_size(records))
+            print("  lote, sub-paquete {:>3} B {:>2} registros {:>6.1f} ms/lectura ({:.1f}x menos)".format(
+                model.sub_packet, records, frame_us / records / 1000, single_us * records / frame_us))
+
+def sweep(length):
+    if np is None:
+        print("\nNumPy no está instalado: se omite el barrido vectorizado.")
+        return
+    rates = np.array(RATES)[:, None]
+    lengths = np.arange(1, 256)[None, :]
+    t0 = time.perf_counter()
+    toa = time_on_air_us_np(rates, lengths)
+    vector_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    scalar = [[time_on_air_us(r, n) for n in range(1, 256)] for r in RATES]
+    scalar_s = time.perf_counter() - t0
+    assert (toa == np.array(scalar)).all()
+    # Velocidad x nodos x intervalo para un largo dado.
+    nodes = np.arange(2, 501)[None, :, None]
+    intervals = np.arange(10, 3601, 10)[None, None, :]
+    frame = time_on_air_us_np(np.array(RATES), np.array(length))[:, None, None]
+    t0 = time.perf_counter()
+    collision = 1 - np.exp(-2 * (nodes - 1) * frame / (intervals * 1e6))
+    grid_s = time.perf_counter() - t0
+    print("\nBarrido NumPy: {} tiempos en el aire en {:.2f} ms (escalar {:.1f} ms, idénticos); "
+          "{} combinaciones velocidad x nodos x intervalo en {:.1f} ms".format(
+              toa.size, vector_s * 1000, scalar_s * 1000, collision.size, grid_s * 1000))
+    print("Intervalo mínimo para colisión < 1 % ({} B):".format(length))
+    for i, rate in enumerate(RATES):
+        cells = []
+        for n in (10, 50, 200):
+            ok = np.nonzero(collision[i, n - 2] < 0.01)[0]
+            cells.append("{:>6} s".format(int(intervals[0, 0, ok[0]])) if ok.size else "   >1 h")
+        print("  {:<18} 10 nodos {}  50 nodos {}  200 nodos {}".format(AirDataRate.get_description(rate), *cells))
+    print("(rendimiento máximo de ALOHA puro: {:.1%} del canal)".format(ALOHA_MAX_LOAD))
+
+if __name__ == '__main__':
+    length = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    check_reference()
+    table(length)
+    batches()
+    sweep(length)
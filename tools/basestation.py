@@ -0,0 +1,102 @@
+"""
+Biblioteca de la estación base para CPython. Construye peticiones y decodifica
+tramas con la misma tabla de comandos que usa el firmware (protocol.COMMANDS),
+así un comando nuevo se declara una sola vez en protocol.py.
+"""
+import time
+
+import hostenv  # noqa: F401
+from protocol import (
+    COMMANDS, FRAME_TYPE_CMD, FRAME_TYPE_RESP, INITIAL_TTL,
+    CMD_GET_PARAM, CMD_GET_SENSOR_STATUS, CMD_MODULE_CTRL, CMD_PING, CMD_SENSOR_BACKLOG, CMD_SENSOR_BATCH, CMD_SENSOR_SERIES, CMD_SET_PARAM, CMD_SET_SLOT, CMD_UPDATE_RTC,
+    build_command, iter_series, param_dtype, parse_packet,
+)
+
+_FRAME_TYPE_NAMES = {FRAME_TYPE_CMD: 'cmd', FRAME_TYPE_RESP: 'resp'}
+
+class BaseStation:
+    def __init__(self, station_id: int = 0, ttl: int = INITIAL_TTL):
+        self.station_id = station_id
+        self.ttl = ttl
+
+    def request(self, dest_id: int, command: int, *values) -> bytes:
+        """Construye una petición (FRAME_TYPE_CMD) para cualquier comando de la tabla."""
+        return build_command(dest_id, self.station_id, FRAME_TYPE_CMD, self.ttl, command, *values)
+
+    def ping(self, dest_id: int) -> bytes:
+        return self.request(dest_id, CMD_PING)
+
+    def get_sensor_status(self, dest_id: int) -> bytes:
+        return self.request(dest_id, CMD_GET_SENSOR_STATUS)
+
+    def get_param(self, dest_id: int, param_id: int) -> bytes:
+        return self.request(dest_id, CMD_GET_PARAM, param_id)
+
+    def set_param(self, dest_id: int, param_id: int, value, dtype: int = None) -> bytes:
+        dtype = dtype if dtype is not None else param_dtype(value)
+        if dtype is None:
+            raise ValueError("Tipo de valor no soportado: {!r}".format(type(value)))
+        return self.request(dest_id, CMD_SET_PARAM, param_id, dtype, value)
+
+    def update_rtc(self, dest_id: int, seconds: int = None) -> bytes:
+        return self.request(dest_id, CMD_UPDATE_RTC, int(time.time() if seconds is None else seconds))
+
+    def module_ctrl(self, dest_id: int, module_id: int, enable: bool) -> bytes:
+        return self.request(dest_id, CMD_MODULE_CTRL, module_id, 1 if enable else 0)
+
+    def set_slot(self, dest_id: int, slot: int, slots: int) -> bytes:
+        """Asigna la ranura de reporte `slot` de `slots`; slots = 0 vuelve a la derivada del id."""
+        return self.request(dest_id, CMD_SET_SLOT, slot, slots)
+
+    def slot_map(self, node_ids) -> list:
+        """
+        Peticiones que reparten una ranura distinta a cada nodo, en el orden dado
+        (por ejemplo, ids dispersos o nodos agrupados por salto).
+        """
+        node_ids = list(node_ids)
+        return [self.set_slot(node_id, slot, len(node_ids)) for slot, node_id in enumerate(node_ids)]
+
+    @staticmethod
+    def decode(frame: bytes):
+        """
+        Decodifica una trama recibida a un diccionario. Retorna None si la trama
+        es inválida; 'values' es None si el payload no respeta la tabla.
+        """
+        view = parse_packet(frame)
+        if view is None:
+            return None
+        spec = COMMANDS.get(view.command)
+        return {
+            "dest_id": view.dest_id,
+            "src_id": view.src_id,
+            "ttl": view.ttl,
+            "type": _FRAME_TYPE_NAMES.get(view.frame_type, view.frame_type),
+            "command": spec.name if spec else view.command,
+            "values": view.values,
+        }
+
+    @staticmethod
+    def readings(frame: bytes, received_at: int = None):
+        """
+        Expande un reporte de sensores (simple, agregado o historial pendiente)
+        a una lista de (timestamp, src_id, sensor, temperatura °C, presión psi).
+        Los reportes simples no llevan timestamp y usan received_at; el
+        historial puede repetir registros ya recibidos (mismo timestamp).
+        """
+        view = parse_packet(frame)
+        if view is None or view.frame_type != FRAME_TYPE_RESP or view.values is None:
+            return []
+        if view.command == CMD_GET_SENSOR_STATUS:
+            temperature, pressure = view.values
+            return [(received_at, view.src_id, 0, temperature / 100, pressure)]
+        if view.command == CMD_SENSOR_BATCH:
+            base_ts, records = view.values
+            return [(base_ts + dt, view.src_id, sensor, temperature / 100, pressure)
+                    for dt, sensor, temperature, pressure in records]
+        if view.command == CMD_SENSOR_SERIES:
+            return [(sample[0], view.src_id, sensor, sample[1] / 100, pressure)
+                    for sample in iter_series(view.payload)
+                    for sensor, pressure in enumerate(sample[2:])]
+        if view.command == CMD_SENSOR_BACKLOG:
+            return [(ts, view.src_id, 0, temperature / 100, pressure) for ts, pressure, temperature, _ in view.values]
+        return []
@@ -0,0 +1,176 @@
+"""
+Vaciado de una semana de historial pendiente (almacenamiento y reenvío) en un
+nodo a un salto de la base, con los módulos reales (LoraTX, DataLogger y
+DataReporter) sobre el driver LoRaE220 y un modelo del E220 en tiempo virtual
+como en bench_duty: AUX queda bajo mientras dura el paquete en el aire.
+
+El historial se llena con una semana de registros cada 60 s que no llegaron a
+la base y se marca pendiente; después corre el nodo con ruta, reportando cada
+30 s y registrando cada 60 s, hasta que no queda nada pendiente (o hasta el
+tope de horas, y entonces se extrapola al ritmo medido). Se informa el tiempo
+de vaciado, las tramas y el tiempo en el aire, los reportes en vivo que
+salieron y cuánto esperaron en la cola mientras tanto.
+
+Al final, una estimación para toda la red: N nodos vaciando a la vez sin
+coordinación, sobre la carga máxima de ALOHA puro y el ciclo de trabajo de
+cada nodo, con cada salto intermedio volviendo a transmitir la trama.
+
+Uso: python tools/bench_backlog.py [--hours H]
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+
+import hostenv
+clock = hostenv.VirtualClock()
+hostenv.install_time(clock, patch_time=True)
+fakehw = hostenv.install_micropython()
+
+import board  # noqa: E402
+import hardware  # noqa: E402
+import modules  # noqa: E402
+from airtime import AirtimeModel, ALOHA_MAX_LOAD, time_on_air_us  # noqa: E402
+from lora_e220 import LoRaE220, Configuration  # noqa: E402
+from lora_e220_constants import AirDataRate  # noqa: E402
+from lora_e220_operation_constant import ResponseStatusCode  # noqa: E402
+from protocol import HEADER_SIZE, LOG_RECORDS, CMD_GET_SENSOR_STATUS, CMD_SENSOR_BACKLOG  # noqa: E402
+from queues import MessageQueue, PRIO_REPORT  # noqa: E402
+
+AUX_PIN, M0_PIN, M1_PIN = 4, 18, 19
+LOOP_MS = 20
+WEEK_S = 7 * 86400
+LOG_S, REPORT_S = 60, 30
+
+class Radio:
+    """AUX bajo desde que llegan los bytes por UART hasta el fin del paquete en el aire."""
+    def __init__(self, uart, queue):
+        self.uart, self.queue, self.driver = uart, queue, None
+        self.busy = (0, 0)
+        self.backlog_frames = self.reports = 0
+        self.report_waits = []
+        self.report_queued = None
+        uart.peer = self
+        fakehw.Pin.sources[AUX_PIN] = self.aux_level
+
+    def on_write(self, data):
+        now = clock.now_us
+        uart_us = len(data) * 10 * 1_000_000 // self.uart.baudrate
+        self.busy = (now + 300, now + uart_us + time_on_air_us(self.driver.air_data_rate(), len(data)))
+        if data[4] == CMD_SENSOR_BACKLOG: self.backlog_frames += 1
+        elif data[4] == CMD_GET_SENSOR_STATUS:
+            self.reports += 1
+            if self.report_queued is not None: self.report_waits.append(clock.now_ms() - self.report_queued)
+            self.report_queued = None
+
+    def watch(self):
+        # Desde que el reporte entra a la cola hasta que se escribe en el UART.
+        if self.report_queued is None and self.queue._count[PRIO_REPORT]: self.report_queued = clock.now_ms()
+
+    def aux_level(self):
+        start, end = self.busy
+        return 0 if start <= clock.now_us < end else 1
+
+def _node(tmp, air_rate, duty_permille, order):
+    uart = fakehw.UART(1, baudrate=9600, txbuf=512)
+    queue = MessageQueue(16, "coalesce")
+    radio = Radio(uart, queue)
+    driver = LoRaE220('900T30D', uart, aux_pin=AUX_PIN, m0_pin=M0_PIN, m1_pin=M1_PIN)
+    assert driver.begin() == ResponseStatusCode.E220_SUCCESS
+    driver.configuration = Configuration('900T30D')
+    driver.configuration.SPED.airDataRate = air_rate
+    radio.driver = driver
+    hardware._drivers = {"lora_module": driver}
+    board.messages = {"uart_1": {"in": MessageQueue(8), "out": queue}}
+    board.states = {"pressure": 120, "temperature": 21.5}
+    modules.config_manager._set_nested("SYSTEM_ID", 7)
+    modules._modules = {}
+    path = os.path.join(tmp, "data.log")
+    for name in (path, path + ".pending"):
+        if os.path.exists(name): os.remove(name)
+    with contextlib.redirect_stdout(io.StringIO()):
+        modules._modules["lora_tx"] = modules.LoraTX({"device_key": "lora_module", "check_interval_s": 0.1, "async_tx": True,
+                                                      "duty_cycle_permille": duty_permille, "bus_type": "uart", "bus_id": "1"})
+        logger = modules._modules["data_logger"] = modules.DataLogger({"log_interval_s": LOG_S, "path": path})
+        # Una semana sin llegar a la base, ya registrada en la flash.
+        now = int(clock.time())
+        first = logger.log.head
+        for ts in range(now - WEEK_S, now, LOG_S): logger.log.append(ts, 120, 2150, 0)
+        logger.log.flush()
+        reporter = modules._modules["data_reporter"] = modules.DataReporter(
+            {"report_interval_s": REPORT_S, "schedule": "jitter", "backlog_order": order, "backlog_interval_s": 10,
+             "device_key": "lora_module", "bus_type": "uart", "bus_id": "1"})
+        reporter.backlog.add(first, logger.log.head)
+    return reporter, radio
+
+def drain(tmp, air_rate, duty_permille, order, max_hours):
+    reporter, radio = _node(tmp, air_rate, duty_permille, order)
+    backlog = reporter.backlog
+    pending = len(backlog)
+    start = clock.now_ms()
+    end = start + max_hours * 3600_000
+    with contextlib.redirect_stdout(io.StringIO()):
+        while backlog.ranges and clock.now_ms() < end:
+            fakehw.Pin.service_all()
+            for module in modules._modules.values(): module.update()
+            radio.watch()
+            clock.advance_ms(LOOP_MS)
+    hours = (clock.now_ms() - start) / 3600_000
+    sent = backlog.stats["sent"]
+    done = not backlog.ranges
+    drain_h = hours if done else hours * pending / max(sent, 1)
+    lora_tx = modules._modules["lora_tx"]
+    waits = sorted(radio.report_waits) or [0]
+    frame = HEADER_SIZE + LOG_RECORDS.size * LOG_RECORDS.capacity(reporter.driver.sub_packet_size())
+    print("{:<9} ciclo {:<7} {:<6}: {} registros en {:>5.1f} h{}; {} tramas de {} B, {:.0f} s en el aire; "
+          "reportes {}/{}, espera en cola p50 {:.0f} ms, máx {:.0f} ms".format(
+              AirDataRate.get_description(air_rate), "{} ‰".format(duty_permille) if duty_permille else "libre", order,
+              pending, drain_h, "" if done else " (extrapolado de {} en {:.0f} h)".format(sent, hours),
+              radio.backlog_frames, frame, lora_tx.tx_stats["airtime_us_total"] / 1e6, radio.reports,
+              int(hours * 3600 / REPORT_S), waits[len(waits) // 2], waits[-1]))
+    return drain_h
+
+def network(air_rate, duty_permille, nodes, hops):
+    """
+    Horas para vaciar una semana en cada uno de `nodes` nodos a la vez, con
+    `hops` saltos en promedio hasta la base: el canal da ALOHA_MAX_LOAD de la
+    hora, los reportes en vivo de todos los nodos van primero y cada trama se
+    transmite una vez por salto. El ciclo de trabajo limita el vaciado de cada
+    nodo de origen a bulk_permille de LoraTX (600 ‰, o lo que dejen los
+    reportes y la reserva de control); el de los relés no se cuenta.
+    """
+    model = AirtimeModel(air_rate)
+    per_frame = LOG_RECORDS.capacity(model.sub_packet)
+    frames = -(-(WEEK_S // LOG_S) // per_frame)
+    frame_us = model.frame_us(HEADER_SIZE + per_frame * LOG_RECORDS.size)
+    report_us = model.frame_us(HEADER_SIZE + 4) * 3600 // REPORT_S
+    free_us = ALOHA_MAX_LOAD * 3600_000_000 - nodes * hops * report_us
+    hours = nodes * frames * hops * frame_us / free_us if free_us > 0 else float('inf')
+    if duty_permille:
+        budget_us = 3600_000 * duty_permille
+        bulk_permille = max(0, min(600, 1000 - 100 - report_us * 1000 // budget_us - 1))
+        bulk_us = budget_us * bulk_permille // 1000
+        hours = max(hours, frames * frame_us / bulk_us if bulk_us else float('inf'))
+    return hours
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--hours", type=float, default=12, help="tope de tiempo virtual por caso")
+    args = parser.parse_args()
+    tmp = tempfile.mkdtemp()
+    print("una semana con un registro cada {} s ({} registros), reportes en vivo cada {} s, "
+          "una trama del historial cada 10 s como máximo".format(LOG_S, WEEK_S // LOG_S, REPORT_S))
+    for air_rate in (AirDataRate.AIR_DATA_RATE_010_24, AirDataRate.AIR_DATA_RATE_100_96):
+        for duty_permille in (None, 10):
+            drain(tmp, air_rate, duty_permille, "oldest", args.hours)
+    drain(tmp, AirDataRate.AIR_DATA_RATE_100_96, 10, "newest", args.hours)
+    for air_rate in (AirDataRate.AIR_DATA_RATE_010_24, AirDataRate.AIR_DATA_RATE_100_96):
+        for nodes, hops in ((10, 1), (50, 3)):
+            hours = network(air_rate, 10, nodes, hops)
+            print("{:<9} {} nodos vaciando a la vez, {} saltos en promedio, ciclo 10 ‰: {}".format(
+                AirDataRate.get_description(air_rate), nodes, hops,
+                "{:.0f} h".format(hours) if hours != float('inf') else "los reportes en vivo ya saturan el canal"))
+
+if __name__ == '__main__':
+    main()
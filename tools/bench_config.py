@@ -0,0 +1,63 @@
+"""
+Configuración del E220 con copia en caché: cambios de modo y tiempo fuera de
+modo normal para una secuencia típica de un nodo, frente a la cantidad que
+hacía el driver sin caché (dos cambios de modo por cada lectura o escritura).
+
+Secuencia: lectura al arrancar; 50 lecturas de configuración (tamaño de
+sub-paquete, velocidad de aire, ...); un CMD_SET_PARAM que cambia canal y
+potencia en dos pasos; 10 reescrituras de la misma configuración.
+
+El módulo simulado (virtual_e220) responde a los comandos C0/C1/C2 en modo
+programa y baja AUX 8 ms tras cada cambio de M0/M1.
+
+Uso: python tools/bench_config.py
+"""
+import hostenv
+clock = hostenv.VirtualClock()
+hostenv.install_time(clock)
+fakehw = hostenv.install_micropython()
+
+from lora_e220 import LoRaE220  # noqa: E402
+from lora_e220_operation_constant import ResponseStatusCode  # noqa: E402
+from virtual_e220 import VirtualE220  # noqa: E402
+
+AUX_PIN, M0_PIN, M1_PIN = 4, 18, 19
+
+def run():
+    uart = fakehw.UART(1)
+    module = VirtualE220(clock, uart, aux_pin=AUX_PIN, m0_pin=M0_PIN, m1_pin=M1_PIN)
+    driver = LoRaE220('900T30D', uart, aux_pin=AUX_PIN, m0_pin=M0_PIN, m1_pin=M1_PIN)
+    assert driver.begin() == ResponseStatusCode.E220_SUCCESS
+    t0 = clock.now_us
+    code, cfg = driver.get_configuration()
+    assert code == ResponseStatusCode.E220_SUCCESS, code
+    for _ in range(50):
+        code, cfg = driver.get_configuration()
+        assert code == ResponseStatusCode.E220_SUCCESS
+    code, cfg = driver.get_configuration()
+    cfg.CHAN = 30
+    driver.stage_configuration(cfg)
+    code, cfg = driver.get_configuration()
+    cfg.OPTION.transmissionPower = 2
+    driver.stage_configuration(cfg)
+    code, cfg = driver.commit_configuration()
+    assert code == ResponseStatusCode.E220_SUCCESS, code
+    assert module.registers[4] == 30 and module.registers[3] & 0b11 == 2
+    for _ in range(10):
+        code, _ = driver.set_configuration(cfg)
+        assert code == ResponseStatusCode.E220_SUCCESS
+    code, fresh = driver.get_configuration(refresh=True)
+    assert fresh.to_bytes() == cfg.to_bytes()
+    elapsed_ms = (clock.now_us - t0) / 1000
+    operations = 1 + 50 + 2 + 2 + 10 + 1  # 54 lecturas y 12 escrituras, contando la verificación final
+    stats = driver.config_stats
+    print("con caché : {:>3} cambios de modo ({} evitados), {} lecturas y {} escritura(s) reales de {} B, "
+          "{:>6.0f} ms en modo programa, {:>6.0f} ms en total".format(
+              stats["mode_switches"], stats["mode_switches_avoided"], stats["reads"], stats["writes"],
+              stats["bytes_written"], module.program_us / 1000, elapsed_ms))
+    per_session_ms = elapsed_ms / max(1, stats["mode_switches"] // 2)
+    print("sin caché : {:>3} cambios de modo (2 por operación, {} operaciones), ~{:>6.0f} ms con el módulo sin "
+          "poder transmitir ni recibir".format(2 * operations, operations, operations * per_session_ms))
+
+if __name__ == '__main__':
+    run()
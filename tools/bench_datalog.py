@@ -0,0 +1,120 @@
+"""
+Registro local en la flash (datalog.RingLog) durante una semana de muestras:
+por intervalo de registro y de escritura, cuántas páginas se escriben por día,
+la amplificación de escritura (bytes escritos en la flash / bytes de
+registros) y cuántos registros llegan a estar solo en RAM (lo que se pierde
+como mucho en un corte de energía). Después mide
+en este equipo la latencia de flush() (CRC, empaquetado y escritura de la
+página a un archivo) y las lecturas de la flash por búsqueda por tiempo. La
+escritura en la flash del ESP32 (borrado y programación del bloque) no se
+puede medir acá; se informa aparte el costo en Python sin la escritura.
+
+Uso: python tools/bench_datalog.py
+"""
+import os
+import sys
+import tempfile
+import time
+
+import hostenv
+hostenv.install_micropython()
+
+from datalog import RingLog, RECORD_SIZE  # noqa: E402
+
+WEEK_S = 7 * 86400
+PAGES, PAGE_SIZE = 64, 4096
+
+class _CountingFile:
+    """Archivo que cuenta las lecturas (seek + read/readinto) para las búsquedas."""
+    def __init__(self, f):
+        self.f, self.reads = f, 0
+
+    def __getattr__(self, name):
+        return getattr(self.f, name)
+
+    def read(self, *args):
+        self.reads += 1
+        return self.f.read(*args)
+
+    def readinto(self, buf):
+        self.reads += 1
+        return self.f.readinto(buf)
+
+class _NullFile:
+    """Descarta lo escrito: deja solo el costo en Python de flush()."""
+    def seek(self, offset): pass
+    def write(self, data): return len(data)
+    def flush(self): pass
+
+def week(path, log_s, flush_s):
+    """Una semana registrando cada log_s y escribiendo la página al llenarse o cada flush_s."""
+    if os.path.exists(path): os.remove(path)
+    log = RingLog(path, PAGES, PAGE_SIZE)
+    pending, at_risk = None, 0
+    for t in range(0, WEEK_S, log_s):
+        at_risk = max(at_risk, log.dirty + 1)
+        log.append(1_700_000_000 + t, 2500 + t % 97, 2150 + t % 31, 0)
+        if not log.dirty: pending = None
+        elif pending is None: pending = t
+        elif flush_s and t - pending >= flush_s:
+            log.flush()
+            pending = None
+    log.close()
+    stats = log.stats
+    return log, stats["bytes_written"] / (stats["records"] * RECORD_SIZE), stats["flushes"] / 7, at_risk
+
+def main():
+    path = os.path.join(tempfile.gettempdir(), "bench_datalog.log")
+    print("Python", sys.version.split()[0], "- {} páginas de {} B, registros de {} B".format(PAGES, PAGE_SIZE, RECORD_SIZE))
+    for log_s in (30, 60, 300):
+        for flush_s in (0, 3600, 600, log_s):
+            log, amplification, per_day, at_risk = week(path, log_s, flush_s)
+            print("registro cada {:>3} s, escritura {:<16}: {:>6.1f} páginas/día, amplificación {:>6.2f}, "
+                  "en RAM hasta {:>3} registros ({:.1f} h)".format(
+                      log_s, "al llenar página" if not flush_s else "cada {} s".format(flush_s), per_day, amplification,
+                      at_risk, at_risk * log_s / 3600))
+        print("  capacidad {} registros: {:.1f} días".format(log.per_page * (PAGES - 1), log.per_page * (PAGES - 1) * log_s / 86400))
+
+    # Latencia de flush() con una página a medio llenar (la escritura periódica), hasta el
+    # disco de este equipo (fsync) y sin escribir nada.
+    log = RingLog(path, PAGES, PAGE_SIZE)
+    times, python_only = [], []
+    for i in range(500):
+        log.append(1_800_000_000 + i, 2500, 2150, 0)
+        start = time.perf_counter()
+        log.flush()
+        os.fsync(log._file.fileno())
+        times.append(time.perf_counter() - start)
+    real, log._file = log._file, _NullFile()
+    for i in range(500):
+        log.append(1_800_001_000 + i, 2500, 2150, 0)
+        start = time.perf_counter()
+        log.flush()
+        python_only.append(time.perf_counter() - start)
+    log._file = real
+    times.sort()
+    python_only.sort()
+    print("flush() de una página de {} B: p50 {:.0f} us, p99 {:.0f} us (con fsync en este equipo); "
+          "sin la escritura p50 {:.0f} us".format(PAGE_SIZE, times[len(times) // 2] * 1e6,
+                                                   times[int(len(times) * 0.99)] * 1e6, python_only[len(python_only) // 2] * 1e6))
+
+    # Búsquedas por tiempo sobre el anillo lleno: lecturas de la flash por búsqueda.
+    log.close()
+    log = RingLog(path, PAGES, PAGE_SIZE)
+    counting = log._file = _CountingFile(log._file)
+    first, last = log.read(log.tail)[0], log.read(log.head - 1)[0]
+    seeks, reads, elapsed = 1000, 0, 0
+    for i in range(seeks):
+        target = first + (last - first) * i // seeks
+        before, start = counting.reads, time.perf_counter()
+        n = log.seek(target)
+        elapsed += time.perf_counter() - start
+        reads += counting.reads - before
+        assert log.read(n)[0] >= target and (n == log.tail or log.read(n - 1)[0] < target)
+    print("seek() sobre {} registros: {:.1f} lecturas de la flash por búsqueda, {:.0f} us".format(
+        len(log), reads / seeks, elapsed / seeks * 1e6))
+    log.close()
+    os.remove(path)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+LoraTX con presupuesto de tiempo en el aire (airtime.DutyCycle), corriendo el
+módulo real sobre el driver LoRaE220 y un modelo del E220 en tiempo virtual:
+AUX queda bajo mientras dura el paquete según airtime.time_on_air_us.
+
+  1. Vaciado de una cola de 16 tramas de 200 B: sin presupuesto la siguiente
+     trama sale apenas sube AUX, no en el próximo check de 0.1 s (el UART a
+     9600 baudios tarda 208 ms por trama).
+  2. Una hora de carga excesiva a 2.4 kbps (reporte de 60 B cada 5 s más HELLO
+     cada 30 s) con y sin un límite del 1 %: tiempo en el aire por hora y
+     cuántos HELLO y reportes salieron.
+
+Uso: python tools/bench_duty.py
+"""
+import contextlib
+import io
+
+import hostenv
+clock = hostenv.VirtualClock()
+hostenv.install_time(clock)
+fakehw = hostenv.install_micropython()
+
+import board  # noqa: E402
+import hardware  # noqa: E402
+import modules  # noqa: E402
+from airtime import time_on_air_us  # noqa: E402
+from lora_e220 import LoRaE220, Configuration  # noqa: E402
+from lora_e220_constants import AirDataRate  # noqa: E402
+from lora_e220_operation_constant import ResponseStatusCode  # noqa: E402
+from protocol import build_packet, build_command, BROADCAST_ID, FRAME_TYPE_CMD, FRAME_TYPE_RESP, INITIAL_TTL, \
+    CMD_HELLO, CMD_GET_SENSOR_STATUS  # noqa: E402
+from queues import MessageQueue, PRIO_CONTROL, PRIO_REPORT  # noqa: E402
+
+AUX_PIN, M0_PIN, M1_PIN = 4, 18, 19
+LOOP_MS = 10
+
+class Radio:
+    """AUX bajo desde que llegan los bytes por UART hasta el fin del paquete en el aire."""
+    def __init__(self, uart):
+        self.uart, self.driver = uart, None
+        self.busy = (0, 0)
+        self.sent = []
+        uart.peer = self
+        fakehw.Pin.sources[AUX_PIN] = self.aux_level
+
+    def on_write(self, data):
+        now = clock.now_us
+        uart_us = len(data) * 10 * 1_000_000 // self.uart.baudrate
+        self.busy = (now + 300, now + uart_us + time_on_air_us(self.driver.air_data_rate(), len(data)))
+        self.sent.append((now, data))
+
+    def aux_level(self):
+        start, end = self.busy
+        return 0 if start <= clock.now_us < end else 1
+
+def _node(air_rate, duty_permille):
+    uart = fakehw.UART(1, baudrate=9600, txbuf=512)
+    radio = Radio(uart)
+    driver = LoRaE220('900T30D', uart, aux_pin=AUX_PIN, m0_pin=M0_PIN, m1_pin=M1_PIN)
+    assert driver.begin() == ResponseStatusCode.E220_SUCCESS
+    driver.configuration = Configuration('900T30D')
+    driver.configuration.SPED.airDataRate = air_rate
+    radio.driver = driver
+    hardware._drivers["lora_module"] = driver
+    queue = MessageQueue(16, "coalesce")
+    board.messages["uart_1"] = {"in": MessageQueue(8), "out": queue}
+    tx = modules.LoraTX({"device_key": "lora_module", "check_interval_s": 0.1, "async_tx": True,
+                         "duty_cycle_permille": duty_permille, "bus_type": "uart", "bus_id": "1"})
+    return tx, queue, radio
+
+def _run_until(tx, end_ms, events=()):
+    events = list(events)
+    with contextlib.redirect_stdout(io.StringIO()):
+        while clock.now_ms() < end_ms:
+            while events and events[0][0] <= clock.now_ms():
+                events.pop(0)[1]()
+            fakehw.Pin.service_all()
+            tx.update()
+            clock.advance_ms(LOOP_MS)
+
+def drain(air_rate):
+    tx, queue, radio = _node(air_rate, None)
+    frame = bytes(200)
+    for _ in range(16): queue.push(frame)
+    start = clock.now_ms()
+    _run_until(tx, start + 60_000)
+    interval = (radio.sent[-1][0] - radio.sent[0][0]) / 1000 / (len(radio.sent) - 1)
+    uart_ms = 200 * 10 * 1000 / 9600
+    toa = time_on_air_us(air_rate, 200) / 1000
+    print("{:<9} 16 x 200 B: una trama cada {:>6.1f} ms; UART {:.1f} ms + aire {:>6.1f} ms; "
+          "esperando el check de 0.1 s serían {:>6.1f} ms; errores {}".format(
+              AirDataRate.get_description(air_rate), interval, uart_ms, toa, 100 * -(-(uart_ms + toa + 10) // 100),
+              tx.tx_stats["errors"]))
+
+def overload(duty_permille):
+    air_rate = AirDataRate.AIR_DATA_RATE_010_24
+    tx, queue, radio = _node(air_rate, duty_permille)
+    start = clock.now_ms()
+    hello = build_packet(BROADCAST_ID, 5, FRAME_TYPE_CMD, 1, CMD_HELLO)
+    events = []
+    for t in range(0, 3600_000, 5000):
+        report = build_command(0, 5, FRAME_TYPE_RESP, INITIAL_TTL, CMD_GET_SENSOR_STATUS, 2500, t // 5000)
+        report += bytes(60 - len(report))
+        events.append((start + t, lambda p=report: queue.push(p, PRIO_REPORT)))
+        if t % 30000 == 0:
+            events.append((start + t, lambda: queue.push(hello, PRIO_CONTROL, CMD_HELLO)))
+    _run_until(tx, start + 3600_000, events)
+    hellos = sum(1 for _, d in radio.sent if d[4] == CMD_HELLO)
+    reports = len(radio.sent) - hellos
+    airtime = tx.tx_stats["airtime_us_total"] / 1e6
+    print("límite {:>6}: {:>5.1f} s en el aire en la hora ({:>4.1f} %), HELLO {:>3}/120, reportes {:>3}/720, "
+          "tramas retenidas {:>5}, uso del presupuesto {:>5.1%}".format(
+              "{} ‰".format(duty_permille) if duty_permille else "ninguno", airtime, airtime / 36,
+              hellos, reports, tx.tx_stats["deferred"], tx.utilization()))
+
+if __name__ == '__main__':
+    for rate in (AirDataRate.AIR_DATA_RATE_010_24, AirDataRate.AIR_DATA_RATE_100_96, AirDataRate.AIR_DATA_RATE_111_625):
+        drain(rate)
+    overload(None)
+    overload(10)
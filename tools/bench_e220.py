@@ -0,0 +1,156 @@
+"""
+Driver LoRaE220, LoraTX y UartFramer sin modificar contra dos módulos E220
+simulados (virtual_e220) en tiempo virtual.
+
+  1. Protocolo: lectura y escritura de registros, PID, transmisión fija con
+     filtrado por dirección y byte de RSSI.
+  2. Módulo de fábrica (sin byte de RSSI) y un framer que espera RSSI: tramas
+     recuperadas antes y después de habilitar el RSSI en el módulo (lo que
+     hace hardware.init con "configure_module"; sin esa opción el framer
+     sigue lo que el módulo tiene).
+  3. Throughput: 16 tramas de 200 B de un nodo a otro con LoraTX asíncrono y
+     bloqueante, por velocidad de aire: tramas por segundo, bytes útiles por
+     segundo, latencia de cola a cola y cota del tiempo en el aire.
+
+Uso: python tools/bench_e220.py
+"""
+import contextlib
+import io
+
+import hostenv
+clock = hostenv.VirtualClock()
+hostenv.install_time(clock)
+fakehw = hostenv.install_micropython()
+
+import board  # noqa: E402
+import hardware  # noqa: E402
+import modules  # noqa: E402
+from airtime import AirtimeModel  # noqa: E402
+from framer import UartFramer  # noqa: E402
+from lora_e220 import LoRaE220  # noqa: E402
+from lora_e220_constants import AirDataRate, FixedTransmission, RssiEnableByte  # noqa: E402
+from lora_e220_operation_constant import ResponseStatusCode  # noqa: E402
+from protocol import build_packet, FRAME_TYPE_RESP, INITIAL_TTL, CMD_GET_SENSOR_STATUS, OFF_SEQ  # noqa: E402
+from queues import MessageQueue  # noqa: E402
+from virtual_e220 import Ether, VirtualE220  # noqa: E402
+
+OK = ResponseStatusCode.E220_SUCCESS
+LOOP_MS = 5
+PINS = ((4, 18, 19), (25, 26, 27))  # AUX, M0, M1 de cada nodo
+
+def _pair(registers=None, rssi_dbm=-70):
+    ether = Ether(clock, rssi_dbm=rssi_dbm)
+    nodes = []
+    for aux, m0, m1 in PINS:
+        uart = fakehw.UART(len(nodes) + 1, baudrate=9600, txbuf=512)
+        kwargs = {"registers": registers} if registers else {}
+        module = VirtualE220(clock, uart, aux_pin=aux, m0_pin=m0, m1_pin=m1, ether=ether, **kwargs)
+        driver = LoRaE220('900T30D', uart, aux_pin=aux, m0_pin=m0, m1_pin=m1)
+        assert driver.begin() == OK
+        nodes.append((uart, module, driver))
+    return ether, nodes
+
+def _run(ether, ms, step=None):
+    end = clock.now_us + ms * 1000
+    while clock.now_us < end:
+        fakehw.Pin.service_all()
+        ether.run_due()
+        if step and step(): return True
+        clock.advance_ms(LOOP_MS)
+    return False
+
+def protocol():
+    ether, ((_, mod_a, drv_a), (uart_b, mod_b, drv_b)) = _pair()
+    code, cfg = drv_a.get_configuration()
+    assert code == OK and cfg.to_bytes()[3:9] == bytes(mod_a.registers[:6])
+    code, info = drv_a.get_module_information()
+    assert code == OK and info.model == 0x20
+    for driver, address in ((drv_a, 0x0102), (drv_b, 0x0103)):
+        code, cfg = driver.get_configuration()
+        cfg.ADDH, cfg.ADDL = address >> 8, address & 0xFF
+        cfg.TRANSMISSION_MODE.fixedTransmission = FixedTransmission.FIXED_TRANSMISSION
+        cfg.TRANSMISSION_MODE.enableRSSI = RssiEnableByte.RSSI_ENABLED
+        code, _ = driver.set_configuration(cfg)
+        assert code == OK, code
+    assert mod_b.address == 0x0103 and mod_b.fixed and mod_b.rssi_enabled and mod_b.saved == mod_b.registers
+    assert drv_a.send_fixed_message(0x01, 0x03, 23, b'hola nodo 3') == OK
+    _run(ether, 100)
+    code, msg, rssi = drv_b.receive_message(rssi=True)
+    assert code == OK and msg == b'hola nodo 3' and rssi == 256 - 70, (code, msg, rssi)
+    assert drv_a.send_fixed_message(0x01, 0x09, 23, b'para otro') == OK
+    assert drv_a.send_broadcast_message(23, b'a todos') == OK
+    _run(ether, 100)
+    code, msg, _ = drv_b.receive_message(rssi=True)
+    assert msg == b'a todos', msg
+    print("protocolo: registros C0/C1/C2, PID, transmisión fija, difusión y RSSI OK; "
+          "{} comandos de programa, {} cambios de modo en el módulo A, {} paquete(s) filtrado(s) por dirección en B".format(
+              mod_a.stats["commands"], mod_a.stats["mode_switches"], mod_b.stats["rx_filtered"]))
+
+def _frames(count, size=200):
+    out = []
+    for i in range(count):
+        packet = build_packet(0, 5, FRAME_TYPE_RESP, INITIAL_TTL, CMD_GET_SENSOR_STATUS, bytes(size - 7), seq=i)
+        out.append(packet)
+    return out
+
+def factory_rssi(count=16):
+    # Módulo de fábrica: REG3 = 0x03, sin byte de RSSI.
+    ether, ((_, _, drv_a), (uart_b, mod_b, drv_b)) = _pair()
+    queue = MessageQueue(count)
+    framer = UartFramer(uart_b, queue, rssi=True, slots=count)
+    results = []
+    for enable in (False, True):
+        if enable:
+            code, cfg = drv_b.get_configuration()
+            cfg.TRANSMISSION_MODE.enableRSSI = RssiEnableByte.RSSI_ENABLED
+            assert drv_b.set_configuration(cfg)[0] == OK
+        for frame in _frames(count, 40):
+            assert drv_a.send_transparent_message(frame) == OK
+            _run(ether, 50, lambda: framer.poll() and False)
+        _run(ether, 300, lambda: framer.poll() and False)
+        results.append((len(queue), framer.stats["truncated"] + framer.stats["resync"]))
+        queue.clear()
+    print("framer con rssi=True: módulo de fábrica {}/{} tramas ({} descartadas o resincronizadas); con RSSI habilitado "
+          "en el módulo {}/{} ({})".format(results[0][0], count, results[0][1], results[1][0], count,
+                                                results[1][1] - results[0][1]))
+
+def throughput(air_rate, async_tx, count=16):
+    registers = bytes([0x00, 0x00, 0x60 | air_rate, 0x00, 0x17, 0x83, 0x00, 0x00])
+    ether, ((uart_a, mod_a, drv_a), (uart_b, mod_b, drv_b)) = _pair(registers)
+    drv_a.get_configuration()
+    hardware._drivers["lora_module"] = drv_a
+    out = MessageQueue(count, "drop_oldest")
+    board.messages["uart_1"] = {"in": MessageQueue(8), "out": out}
+    tx = modules.LoraTX({"device_key": "lora_module", "check_interval_s": 0.1, "async_tx": async_tx,
+                         "bus_type": "uart", "bus_id": "1"})
+    received = MessageQueue(count)
+    framer = UartFramer(uart_b, received, rssi=True, slots=count)
+    start = clock.now_us
+    for frame in _frames(count): out.push(frame)
+    arrivals = {}
+
+    def step():
+        tx.update()
+        framer.poll()
+        while received:
+            arrivals[received.pop()['data'][OFF_SEQ]] = clock.now_us
+        return len(arrivals) == count
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        _run(ether, 120_000, step)
+    elapsed_s = (max(arrivals.values()) - start) / 1e6 if arrivals else float('inf')
+    latencies = sorted((t - start) / 1000 for t in arrivals.values())
+    air_s = count * AirtimeModel(air_rate).frame_us(200) / 1e6
+    print("{:<9} {:<10} {:>2}/{} tramas en {:>6.2f} s: {:>5.2f} tramas/s, {:>6.0f} B/s útiles; latencia media {:>7.0f} ms, "
+          "máx {:>7.0f} ms; aire {:>5.2f} s ({:>3.0%} del tiempo); errores de envío {}".format(
+              AirDataRate.get_description(air_rate), "asíncrono" if async_tx else "bloqueante", len(arrivals), count,
+              elapsed_s, len(arrivals) / elapsed_s, len(arrivals) * 193 / elapsed_s,
+              sum(latencies) / max(1, len(latencies)), latencies[-1] if latencies else 0, air_s,
+              air_s / elapsed_s, tx.tx_stats["errors"]))
+
+if __name__ == '__main__':
+    protocol()
+    factory_rssi()
+    for rate in (AirDataRate.AIR_DATA_RATE_010_24, AirDataRate.AIR_DATA_RATE_100_96, AirDataRate.AIR_DATA_RATE_111_625):
+        for async_tx in (True, False):
+            throughput(rate, async_tx)
@@ -0,0 +1,105 @@
+"""
+Reenvío en un nodo relé: Routing.forward_packet (cabecera leída por
+desplazamiento, TTL decrementado en el lugar sobre una única copia de la
+ranura del framer) frente a la versión anterior con parse_packet y
+build_packet. Cada llamada reenvía una trama de reporte recibida (memoryview
+de una ranura del framer, como la entrega MessageLora) y saca de la cola de
+salida lo encolado; el reloj avanza más que el TTL de la caché de duplicados
+para que cada trama se reenvíe. Reporta reenvíos por segundo y lo asignado
+por el firmware que sigue vivo al encolar la trama (parse_packet además crea
+y libera antes el payload y la cabecera).
+
+Uso: python tools/bench_forward.py [N]
+"""
+import sys
+import time
+
+import hostenv
+clock = hostenv.VirtualClock()
+hostenv.install_time(clock)
+hostenv.install_micropython()
+
+import board  # noqa: E402
+import modules  # noqa: E402
+from protocol import build_command, build_packet, parse_packet, FRAME_TYPE_RESP, INITIAL_TTL, CMD_GET_SENSOR_STATUS  # noqa: E402
+from queues import MessageQueue, PRIO_REPORT  # noqa: E402
+
+def _live_at_push(routing, fn, frame, out):
+    """
+    Bloques y bytes asignados por el firmware (project/) que están vivos cuando la trama
+    se encola: la copia reenviada más los objetos del análisis que siguen referenciados.
+    No cuenta los enteros de CPython (28 o 32 B), que en MicroPython son inmediatos.
+    """
+    import tracemalloc
+    taken = []
+    push = out.push
+
+    def spy(item, *args, **kwargs):
+        taken.append(tracemalloc.take_snapshot())
+        return push(item, *args, **kwargs)
+    out.push = spy
+    tracemalloc.start()
+    clock.advance_ms(CONFIG["dedup_ttl_s"] * 1000 + 1)
+    before = tracemalloc.take_snapshot()
+    fn(routing, frame)
+    tracemalloc.stop()
+    out.push = push
+    out.pop()
+    stats = [s for s in taken[0].compare_to(before, 'lineno') if s.count_diff > 0
+             and s.traceback[0].filename.startswith(hostenv.PROJECT_DIR) and s.size_diff not in (28 * s.count_diff, 32 * s.count_diff)]
+    return sum(s.count_diff for s in stats), sum(s.size_diff for s in stats)
+
+MY_ID, NEXT_HOP, BASE_ID = 5, 3, 0
+CONFIG = {"dedup_entries": 64, "dedup_ttl_s": 10, "bus_type": "uart", "bus_id": "1"}
+
+def legacy_forward(self, packet: bytes):
+    """Copia de Routing.forward_packet previo al camino rápido, solo para comparar."""
+    parsed = parse_packet(packet)
+    if not parsed or parsed.ttl <= 1 or parsed.src_id == self.my_id: return
+    if self.duplicates.seen(packet):
+        self.forward_stats["duplicates"] += 1
+        return
+    if parsed.dest_id not in self.routing_table:
+        self.forward_stats["no_route"] += 1
+    else:
+        self.forward_stats["forwarded"] += 1
+        new_packet = build_packet(parsed.dest_id, parsed.src_id, parsed.control, parsed.ttl - 1, parsed.command, parsed.payload, parsed.seq)
+        board.messages[f"{self.bus_type}_{self.bus_id}"]["out"].push(new_packet, PRIO_REPORT)
+
+def _routing():
+    board.messages = {"uart_1": {"in": MessageQueue(), "out": MessageQueue()}}
+    modules.config_manager._set_nested("SYSTEM_ID", MY_ID)
+    routing = modules.Routing(CONFIG, "routing")
+    routing.routing_table.set(NEXT_HOP, NEXT_HOP, 16, 0, time.ticks_ms())
+    routing.routing_table.set(BASE_ID, NEXT_HOP, 40, 0, time.ticks_ms())
+    return routing
+
+def main(n=100000):
+    routing = _routing()
+    out = board.messages["uart_1"]["out"]
+    slot = bytearray(build_command(BASE_ID, 9, FRAME_TYPE_RESP, INITIAL_TTL, CMD_GET_SENSOR_STATUS, 2345, 120))
+    received = memoryview(slot)
+    skip_ms = CONFIG["dedup_ttl_s"] * 1000 + 1
+
+    def forward(fn):
+        def step():
+            clock.advance_ms(skip_ms)
+            fn(routing, received)
+            return out.pop()
+        return step
+
+    print("Python", sys.version.split()[0], "- N =", n, "- trama de", len(slot), "B")
+    for label, fn in (("parse_packet + build_packet (anterior)", legacy_forward),
+                      ("forward_packet (en el lugar)", modules.Routing.forward_packet)):
+        step = forward(fn)
+        frame = step()
+        assert frame[3] == INITIAL_TTL - 1 and bytes(frame[4:]) == bytes(slot[4:]), frame
+        start = time.perf_counter()
+        for _ in range(n): step()
+        elapsed = time.perf_counter() - start
+        blocks, size = _live_at_push(routing, fn, received, out)
+        print("{:<40} {:>10,.0f} reenvíos/s   al encolar {} bloques vivos ({} B)".format(label, n / elapsed, blocks, size))
+    print("reenvíos:", routing.forward_stats)
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,77 @@
+"""
+Tiempo de CPU ocupada por cambio de modo del módulo E220 (NORMAL -> PROGRAM ->
+NORMAL), con el driver real sobre pines simulados en tiempo virtual:
+  espera activa : el bucle `while ticks_diff(...) < timeout: pass` anterior
+  sleep_ms      : espera por defecto del driver (la CPU queda libre)
+  cooperativa   : yielding_delay con un planificador de 1 ms de trabajo por vuelta
+
+Cada lectura de ticks cuesta 5 us de CPU virtual; dormir no consume CPU. El
+modelo baja AUX durante 8 ms tras cada cambio de M0/M1.
+
+Uso: python tools/bench_mode.py [cambios]
+"""
+import sys
+
+import hostenv
+clock = hostenv.VirtualClock(tick_cost_us=5)
+hostenv.install_time(clock)
+fakehw = hostenv.install_micropython()
+
+import time  # noqa: E402
+from lora_e220 import LoRaE220, yielding_delay  # noqa: E402
+from lora_e220_operation_constant import ModeType, ResponseStatusCode  # noqa: E402
+
+AUX_PIN, M0_PIN, M1_PIN = 4, 18, 19
+MODE_SWITCH_MS = 8
+
+class ModeTiming:
+    def __init__(self):
+        self.pins = None
+        self.busy_until = 0
+        fakehw.Pin.sources[AUX_PIN] = self.aux_level
+
+    def aux_level(self):
+        m0, m1 = fakehw.Pin.instances.get(M0_PIN), fakehw.Pin.instances.get(M1_PIN)
+        pins = (m0._value, m1._value) if m0 and m1 else None
+        if pins != self.pins:
+            self.pins = pins
+            self.busy_until = clock.now_us + MODE_SWITCH_MS * 1000
+        return 0 if clock.now_us < self.busy_until else 1
+
+def busy_wait(ms):
+    t = time.ticks_ms()
+    while time.ticks_diff(time.ticks_ms(), t) < ms:
+        pass
+
+class Scheduler:
+    """Ciclo de módulos simulado: cada vuelta ocupa 1 ms de CPU."""
+    def __init__(self):
+        self.steps = 0
+
+    def step(self):
+        self.steps += 1
+        clock.now_us += 1000
+        clock.cpu_us += 1000
+
+def run(name, changes):
+    ModeTiming()
+    scheduler = Scheduler()
+    hooks = {'espera activa': busy_wait, 'sleep_ms': None, 'cooperativa': yielding_delay(scheduler.step)}
+    driver = LoRaE220('900T30D', fakehw.UART(1), aux_pin=AUX_PIN, m0_pin=M0_PIN, m1_pin=M1_PIN,
+                      delay_hook=hooks[name])
+    assert driver.begin() == ResponseStatusCode.E220_SUCCESS
+    t0, cpu0 = clock.now_us, clock.cpu_us
+    for _ in range(changes):
+        assert driver.set_mode(ModeType.MODE_3_PROGRAM) == ResponseStatusCode.E220_SUCCESS
+        assert driver.set_mode(ModeType.MODE_0_NORMAL) == ResponseStatusCode.E220_SUCCESS
+    n = 2 * changes
+    elapsed, cpu = (clock.now_us - t0) / n / 1000, (clock.cpu_us - cpu0) / n / 1000
+    driver_cpu = cpu - scheduler.steps / n
+    print("{:<14}: {:>6.1f} ms por cambio de modo, CPU ocupada por el driver {:>6.2f} ms ({:>5.1%}), "
+          "vueltas del planificador {:>4.1f}".format(
+              name, elapsed, driver_cpu, driver_cpu / elapsed, scheduler.steps / n))
+
+if __name__ == '__main__':
+    changes = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    for name in ('espera activa', 'sleep_ms', 'cooperativa'):
+        run(name, changes)
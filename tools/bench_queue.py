@@ -0,0 +1,55 @@
+"""
+Cola de salida durante un corte del enlace de una hora, en un nodo que reporta
+cada 30 s y envía HELLO cada 30 s y anuncios de ruta cada 10 min: lista de
+Python (append / insert(0)) frente a queues.MessageQueue con cada política.
+Muestra los paquetes retenidos y qué sale cuando vuelve el enlace.
+
+Uso: python tools/bench_queue.py
+"""
+import hostenv
+hostenv.install_time()
+hostenv.install_micropython()
+
+from protocol import build_packet, build_command, BROADCAST_ID, FRAME_TYPE_CMD, FRAME_TYPE_RESP, INITIAL_TTL, \
+    CMD_HELLO, CMD_ROUTE_AD, CMD_GET_SENSOR_STATUS  # noqa: E402
+from queues import MessageQueue, PRIO_CONTROL, PRIO_REPORT, DROP_OLDEST, DROP_LOWEST, COALESCE  # noqa: E402
+
+def _traffic(minutes):
+    """(segundo, paquete, prioridad, clave) del nodo durante el corte."""
+    out = []
+    for t in range(0, minutes * 60, 30):
+        out.append((t, build_packet(BROADCAST_ID, 5, FRAME_TYPE_CMD, 1, CMD_HELLO), PRIO_CONTROL, CMD_HELLO))
+        status = build_command(0, 5, FRAME_TYPE_RESP, INITIAL_TTL, CMD_GET_SENSOR_STATUS, 2500 + t % 100, t // 30)
+        out.append((t, status, PRIO_REPORT, CMD_GET_SENSOR_STATUS))
+        if t % 600 == 0:
+            routes = [(d, d, 0, 10 + d) for d in range(2, 12)]
+            out.append((t, build_command(BROADCAST_ID, 5, FRAME_TYPE_CMD, 1, CMD_ROUTE_AD, routes), PRIO_CONTROL, CMD_ROUTE_AD))
+    return out
+
+def outage(minutes=60):
+    traffic = _traffic(minutes)
+    end_ms = minutes * 60 * 1000
+    q = []
+    for _, packet, prio, _ in traffic:
+        if prio == PRIO_CONTROL: q.insert(0, packet)
+        else: q.append(packet)
+    print("{:<12}: {:>4} paquetes ({:>5} B) en cola y creciendo; al volver el enlace salen {} HELLO viejos "
+          "antes del primer reporte".format("lista", len(q), sum(len(p) for p in q),
+                                            next(i for i, p in enumerate(q) if p[4] == CMD_GET_SENSOR_STATUS)))
+    for policy in (DROP_OLDEST, DROP_LOWEST, COALESCE):
+        q = MessageQueue(16, policy)
+        for t, packet, prio, key in traffic:
+            q.push(packet, prio, key, t * 1000)
+        depth, stats = len(q), q.stats
+        order = []
+        while q:
+            order.append(q.pop(end_ms))
+        reports = [p for p in order if p[4] == CMD_GET_SENSOR_STATUS]
+        print("{:<12}: {:>4} paquetes ({:>5} B) en cola, descartados {:>3}, fusionados {:>3}, rechazados {:>3}; "
+              "salen {} HELLO, {} anuncios, {} reportes; espera máx {:>4} s".format(
+                  policy, depth, sum(len(p) for p in order), stats["dropped"], stats["coalesced"], stats["rejected"],
+                  sum(1 for p in order if p[4] == CMD_HELLO), sum(1 for p in order if p[4] == CMD_ROUTE_AD),
+                  len(reports), stats["wait_ms_max"] // 1000))
+
+if __name__ == '__main__':
+    outage()
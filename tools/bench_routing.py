@@ -0,0 +1,133 @@
+"""
+Tablas de Routing: diccionarios por entrada (versión anterior) frente a
+mesh.RouteTable / mesh.NeighborTable sobre arrays indexados por id.
+
+  1. Memoria: heap de la tabla de rutas y de vecinos con N entradas en
+     CPython (sys.getsizeof de tablas y entradas) y bytes de datos de las tablas en el ESP32.
+  2. Tiempo por anuncio recibido (tabla ya convergida, N registros) y por
+     anuncio enviado, incluida la serialización en tramas de 200 B.
+
+Uso: python tools/bench_routing.py [N]
+"""
+import sys
+import time
+from array import array
+
+import hostenv
+hostenv.install_time()
+
+from mesh import NeighborTable, RouteTable  # noqa: E402
+from protocol import (  # noqa: E402
+    build_command, parse_packet, pack_header_into, BROADCAST_ID, FRAME_TYPE_CMD, HEADER_SIZE, CMD_ROUTE_AD, ROUTE_AD,
+)
+
+MY_ID = 1
+FRAME_SIZE = 200
+
+class LegacyRouting:
+    """Lógica de tablas de Routing previa a mesh.RouteTable, solo para comparar."""
+    def __init__(self):
+        self.neighbor_table = {}
+        self.routing_table = {MY_ID: {"next_hop": MY_ID, "cost": 0, "last_updated": time.ticks_ms()}}
+
+    def process(self, parsed_packet, rssi):
+        src_id = parsed_packet.src_id
+        link_cost = max(1, 255 - rssi)
+        self.neighbor_table[src_id] = {"rssi": rssi, "last_seen": time.ticks_ms(), "cost": link_cost}
+        direct = self.routing_table.get(src_id)
+        if not direct or direct['next_hop'] == src_id or link_cost < direct['cost']:
+            self.routing_table[src_id] = {"next_hop": src_id, "cost": link_cost, "last_updated": time.ticks_ms()}
+        for dest_id, _, _, cost_from_neighbor in parsed_packet.values:
+            if dest_id == MY_ID: continue
+            new_total_cost = link_cost + cost_from_neighbor
+            current_route = self.routing_table.get(dest_id)
+            if not current_route or new_total_cost < current_route['cost']:
+                self.routing_table[dest_id] = {"next_hop": parsed_packet.src_id, "cost": new_total_cost, "last_updated": time.ticks_ms()}
+
+    def advertise(self):
+        routes = [(dest, route_info['next_hop'], 0, int(route_info['cost'])) for dest, route_info in self.routing_table.items()
+                  if dest != MY_ID]
+        return [build_command(BROADCAST_ID, MY_ID, FRAME_TYPE_CMD, 1, CMD_ROUTE_AD, routes)]
+
+class TableRouting:
+    """Misma lógica que Routing con las tablas de mesh.py."""
+    def __init__(self):
+        self.neighbor_table = NeighborTable()
+        self.routing_table = RouteTable()
+        self.routing_table.set(MY_ID, MY_ID, 0, 0, time.ticks_ms())
+        self._ad = bytearray(HEADER_SIZE + ROUTE_AD.size * ROUTE_AD.capacity(FRAME_SIZE))
+
+    def process(self, parsed_packet, rssi):
+        src_id, now = parsed_packet.src_id, time.ticks_ms()
+        link_cost = self.neighbor_table.observe(src_id, rssi - 256, None, now)
+        table = self.routing_table
+        if table.next_hop(src_id) in (None, src_id) or table.better(src_id, link_cost):
+            table.set(src_id, src_id, link_cost, table.seq(src_id), now)
+        buf = parsed_packet.buf
+        table.merge(src_id, link_cost, buf, HEADER_SIZE, len(buf), MY_ID, now)
+
+    def advertise(self):
+        frame, limit = self._ad, (len(self._ad) - HEADER_SIZE) // ROUTE_AD.size
+        frames, start, now = [], 0, time.ticks_ms()
+        while True:
+            count, start = self.routing_table.pack_into(frame, HEADER_SIZE, start, limit, False, now)
+            if not count: return frames
+            size = HEADER_SIZE + count * ROUTE_AD.size
+            pack_header_into(frame, 0, BROADCAST_ID, MY_ID, FRAME_TYPE_CMD, 1, CMD_ROUTE_AD, 0, size - HEADER_SIZE)
+            frames.append(bytes(memoryview(frame)[:size]))
+
+def _ads(routes):
+    """Anuncios de un vecino con `routes` destinos, de a lo sumo una trama cada uno."""
+    records = [(d, d, 0, 100 + d) for d in range(2, 2 + routes)]
+    limit = ROUTE_AD.capacity(FRAME_SIZE)
+    return [build_command(BROADCAST_ID, 2, FRAME_TYPE_CMD, 1, CMD_ROUTE_AD, records[i:i + limit])
+            for i in range(0, len(records), limit)]
+
+def _sizeof(obj):
+    """Tamaño en CPython de la tabla y de lo que contiene (dicts por entrada o arrays)."""
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(_sizeof(v) for v in obj.values())
+    if isinstance(obj, (RouteTable, NeighborTable)):
+        return sys.getsizeof(obj) + sum(sys.getsizeof(v) for v in vars(obj).values())
+    return sys.getsizeof(obj) if isinstance(obj, (bytearray, array)) else 0
+
+def _heap(factory, routes):
+    node = factory()
+    for ad in _ads(routes): node.process(parse_packet(ad), 200)
+    assert len(node.routing_table) == routes + 1, len(node.routing_table)
+    return node, _sizeof(node.routing_table) + _sizeof(node.neighbor_table)
+
+def _per_call(fn, n):
+    fn()
+    start = time.perf_counter()
+    for _ in range(n): fn()
+    return (time.perf_counter() - start) / n * 1e6
+
+def memory():
+    print("Memoria de las tablas (rutas + vecinos):")
+    for routes in (8, 64, 200):
+        _, legacy = _heap(LegacyRouting, routes)
+        node, tables = _heap(TableRouting, routes)
+        esp32 = node.routing_table.memory_bytes() + node.neighbor_table.memory_bytes()
+        print("  {:>3} rutas: dicts {:>6} B ({:>4.0f} B/ruta)   arrays {:>5} B ({:>4.0f} B/ruta) en CPython, "
+              "{} B fijos de datos en el ESP32".format(routes, legacy, legacy / routes, tables, tables / routes, esp32))
+
+def timing(n):
+    print("Tiempo por anuncio (tabla convergida, CPython):")
+    for routes in (8, 64, 200):
+        ads = _ads(routes)
+        for label, factory in (("dicts ", LegacyRouting), ("arrays", TableRouting)):
+            node = factory()
+            for ad in ads: node.process(parse_packet(ad), 200)
+
+            def receive():
+                for ad in ads: node.process(parse_packet(ad), 200)
+            frames = node.advertise()
+            rx = _per_call(receive, n)
+            tx = _per_call(node.advertise, n)
+            print("  {:>3} rutas, {}: recibir {:>7.1f} us   enviar {:>6.1f} us en {} trama(s) de hasta {} B".format(
+                routes, label, rx, tx, len(frames), max(len(f) for f in frames)))
+
+if __name__ == '__main__':
+    memory()
+    timing(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,115 @@
+"""
+Recepción por UART: framer.UartFramer frente al receive_message del driver,
+con un UART simulado que recibe tramas consecutivas (cada una con su byte de
+RSSI) en trozos de tamaño aleatorio, más bytes basura ocasionales y tramas
+cortadas por la mitad.
+
+Uso: python tools/bench_rx.py [tramas]
+"""
+import random
+import sys
+import time
+import tracemalloc
+
+import hostenv
+clock = hostenv.install_time()
+fakehw = hostenv.install_micropython()
+
+from protocol import build_command, parse_packet, FRAME_TYPE_RESP, INITIAL_TTL, CMD_GET_SENSOR_STATUS, CMD_ROUTE_AD  # noqa: E402
+from framer import UartFramer  # noqa: E402
+from queues import MessageQueue  # noqa: E402
+from lora_e220 import LoRaE220  # noqa: E402
+
+def _traffic(frames, seed, noise=0.02, cut=0.01):
+    """
+    Retorna (segmentos, tramas válidas esperadas). Cada segmento es un bloque de
+    bytes seguido de un silencio en la línea: así llegan las tramas cortadas y
+    los bytes basura (ruido tras un reinicio del módulo, por ejemplo).
+    """
+    rng = random.Random(seed)
+    segments, current, expected = [], bytearray(), []
+    for i in range(frames):
+        if rng.random() < 0.5:
+            frame = build_command(0, 1 + i % 20, FRAME_TYPE_RESP, INITIAL_TTL, CMD_GET_SENSOR_STATUS, i % 3000, i % 500)
+        else:
+            routes = [(d, 1, 0, rng.randrange(1, 500)) for d in range(rng.randrange(1, 39))]
+            frame = build_command(255, 1 + i % 20, 0, 1, CMD_ROUTE_AD, routes)
+        if rng.random() < cut:
+            current += frame[:len(frame) // 2]
+            segments.append(bytes(current))
+            current = bytearray()
+            continue
+        if rng.random() < noise:
+            current += bytes(rng.randrange(256) for _ in range(rng.randrange(1, 4)))
+            segments.append(bytes(current))
+            current = bytearray()
+        current += frame + bytes([rng.randrange(256)])
+        expected.append(bytes(frame))
+    segments.append(bytes(current))
+    return segments, expected
+
+def _chunks(segments, seed):
+    """Trozos de 1 a 64 bytes; True al final de cada segmento (sigue un silencio)."""
+    rng = random.Random(seed + 1)
+    for segment in segments:
+        pos = 0
+        while pos < len(segment):
+            n = rng.randrange(1, 65)
+            pos += n
+            yield segment[pos - n:pos], pos >= len(segment)
+
+def run_framer(frames, seed=5):
+    segments, expected = _traffic(frames, seed)
+    uart = fakehw.UART(1)
+    queue = MessageQueue(8)
+    framer = UartFramer(uart, queue)
+    received = []
+    start = time.perf_counter()
+    for chunk, silence in _chunks(segments, seed):
+        uart.feed(chunk)
+        clock.advance_ms(2)
+        framer.poll()
+        if silence:
+            clock.advance_ms(200)
+            framer.poll()
+        while queue:
+            msg = queue.pop()
+            received.append(bytes(msg['data']))
+    clock.advance_ms(500)
+    framer.poll()
+    elapsed = time.perf_counter() - start
+    got, valid = set(received), set(expected)
+    ok = sum(1 for f in expected if f in got)
+    bogus = sum(1 for f in received if f not in valid)
+    print("UartFramer      : {:>5}/{} tramas válidas recuperadas, {:>3} espurias, resync {:>4}, truncadas {:>3}, "
+          "{:>6.1f} us/trama (CPython)".format(ok, len(expected), bogus, framer.stats["resync"], framer.stats["truncated"],
+                                                1e6 * elapsed / max(1, len(received))))
+    # Memoria retenida por trama en régimen: la vista que se encola.
+    tracemalloc.start()
+    uart.feed(b''.join(segments)[:2000])
+    before = tracemalloc.take_snapshot()
+    n = framer.poll()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    blocks = sum(s.count_diff for s in after.compare_to(before, 'filename') if s.count_diff > 0)
+    print("                  bloques asignados por trama: {:.1f} ({} tramas)".format(blocks / max(1, n), n))
+
+def run_driver(frames, seed=5):
+    segments, expected = _traffic(frames, seed)
+    uart = fakehw.UART(1)
+    driver = LoRaE220('900T30D', uart)
+    received = []
+    for chunk, _ in _chunks(segments, seed):
+        uart.feed(chunk)
+        if driver.available() > 0:
+            code, data, rssi = driver.receive_message(rssi=True)
+            if data is not None and parse_packet(data) is not None:
+                received.append(bytes(data))
+    got = set(received)
+    ok = sum(1 for f in expected if f in got)
+    print("receive_message : {:>5}/{} tramas válidas recuperadas (una lectura = una trama)".format(ok, len(expected)))
+
+if __name__ == '__main__':
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    run_framer(frames)
+    run_driver(frames)
@@ -0,0 +1,88 @@
+"""
+Bloqueo del ciclo principal por paquete transmitido: envío bloqueante
+(send_transparent_message) frente a send_async + poll_tx, con el driver real
+LoRaE220 sobre un UART y un pin AUX simulados en tiempo virtual.
+
+El modelo del módulo baja AUX al recibir los bytes por UART y lo sube al
+terminar la transmisión: tiempo UART (10 bits/byte) + tiempo en el aire
+aproximado como 8 * bytes / tasa + 25 ms de preámbulo y cabecera.
+El UART bloquea write() como el del ESP32 (FIFO de 128 bytes + txbuf).
+El ciclo principal duerme 10 ms por vuelta como main.py; cada lectura de ticks
+cuesta 5 us de CPU virtual, así las esperas activas del driver avanzan el reloj.
+
+Uso: python tools/bench_tx.py [paquetes]
+"""
+import sys
+
+import hostenv
+clock = hostenv.VirtualClock(tick_cost_us=5)
+hostenv.install_time(clock)
+fakehw = hostenv.install_micropython()
+
+from lora_e220 import LoRaE220  # noqa: E402
+from lora_e220_operation_constant import ResponseStatusCode  # noqa: E402
+
+AUX_PIN, M0_PIN, M1_PIN = 4, 18, 19
+LOOP_SLEEP_MS = 10
+
+class TxTiming:
+    def __init__(self, uart, air_kbps):
+        self.uart = uart
+        self.air_kbps = air_kbps
+        self.busy = (0, 0)
+        uart.peer = self
+        fakehw.Pin.sources[AUX_PIN] = self.aux_level
+
+    def on_write(self, data):
+        now = clock.now_us
+        uart_us = len(data) * 10 * 1_000_000 // self.uart.baudrate
+        air_us = int((8 * len(data) / self.air_kbps + 25) * 1000)
+        self.busy = (now + 300, now + uart_us + air_us)
+
+    def aux_level(self):
+        start, end = self.busy
+        return 0 if start <= clock.now_us < end else 1
+
+def _driver(air_kbps, txbuf):
+    uart = fakehw.UART(1, txbuf=txbuf)
+    TxTiming(uart, air_kbps)
+    driver = LoRaE220('900T30D', uart, aux_pin=AUX_PIN, m0_pin=M0_PIN, m1_pin=M1_PIN)
+    assert driver.begin() == ResponseStatusCode.E220_SUCCESS
+    return driver
+
+def run(mode, air_kbps, size, txbuf, packets):
+    driver = _driver(air_kbps, txbuf)
+    frame = bytes(i & 0xFF for i in range(size))
+    stalls, loops_in_tx, tx_ms = [], 0, []
+    for _ in range(packets):
+        start_ms = clock.now_ms()
+        t0 = clock.now_us
+        if mode == 'bloqueante':
+            code = driver.send_transparent_message(frame)
+            stall = clock.now_us - t0
+        else:
+            code = driver.send_async(frame)
+            stall = clock.now_us - t0
+            while True:
+                clock.advance_ms(LOOP_SLEEP_MS)  # resto del ciclo: sensores, display, ...
+                loops_in_tx += 1
+                fakehw.Pin.service_all()
+                t0 = clock.now_us
+                code = driver.poll_tx()
+                stall += clock.now_us - t0
+                if code is not None:
+                    break
+        assert code == ResponseStatusCode.E220_SUCCESS, code
+        tx_ms.append(clock.now_ms() - start_ms)
+        stalls.append(stall / 1000)
+        clock.advance_ms(LOOP_SLEEP_MS)
+    print("{:>3} B txbuf {:>3} {:<10} {:>5} kbps: bloqueo medio {:>7.2f} ms, máx {:>7.2f} ms, envío completo {:>6.1f} ms, "
+          "vueltas del ciclo durante el envío {:>4.1f}".format(
+              size, txbuf, mode, air_kbps, sum(stalls) / packets, max(stalls), sum(tx_ms) / packets, loops_in_tx / packets))
+
+if __name__ == '__main__':
+    packets = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    for size, txbuf in ((50, 0), (200, 0), (200, 512)):
+        for air_kbps in (2.4, 9.6, 62.5):
+            run('bloqueante', air_kbps, size, txbuf, packets)
+            run('async', air_kbps, size, txbuf, packets)
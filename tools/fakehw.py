@@ -0,0 +1,155 @@
+"""
+Sustituto mínimo del módulo `machine` de MicroPython para correr los drivers en
+el host. Los pines de entrada pueden leerse de un modelo (Pin.sources) y los
+UART entregan lo escrito a un periférico simulado (UART.peer); ambos usan el
+reloj virtual de hostenv a través de time.ticks_ms.
+"""
+import time
+
+class Pin:
+    IN = 1
+    OUT = 3
+    PULL_UP = 2
+    PULL_DOWN = 1
+    IRQ_FALLING = 1
+    IRQ_RISING = 2
+
+    # pin_id -> callable que retorna el nivel de un pin de entrada manejado por un modelo
+    sources = {}
+    # pin_id -> última instancia creada (para que los modelos lean las salidas)
+    instances = {}
+
+    def __init__(self, pin_id, mode=None, pull=None, value=None):
+        self.id = pin_id
+        self.mode = mode
+        self._value = value or 0
+        self._trigger = 0
+        self._handler = None
+        self._last = None
+        Pin.instances[pin_id] = self
+
+    def value(self, v=None):
+        if v is not None:
+            self._value = 1 if v else 0
+            return None
+        source = Pin.sources.get(self.id)
+        return source() if source else self._value
+
+    def on(self):
+        self._value = 1
+
+    def off(self):
+        self._value = 0
+
+    def irq(self, trigger=None, handler=None):
+        self._trigger = trigger or 0
+        self._handler = handler
+        self._last = self.value()
+
+    def service(self):
+        """Dispara el handler de IRQ si hubo un flanco desde la última llamada."""
+        if self._handler is None:
+            return
+        level = self.value()
+        if level != self._last:
+            rising = level == 1
+            if (rising and self._trigger & Pin.IRQ_RISING) or (not rising and self._trigger & Pin.IRQ_FALLING):
+                self._handler(self)
+            self._last = level
+
+    @staticmethod
+    def service_all():
+        for pin in Pin.instances.values():
+            pin.service()
+
+class UART:
+    # Como en el ESP32: FIFO de hardware de 128 bytes más el buffer txbuf del driver.
+    # write() bloquea hasta que lo que no entra en ambos termina de salir por la línea.
+    HW_FIFO = 128
+
+    def __init__(self, uart_id, baudrate=9600, txbuf=0, **kwargs):
+        self.id = uart_id
+        self.baudrate = baudrate
+        self.txbuf = txbuf
+        self.peer = None
+        self.rx = bytearray()
+
+    def init(self, baudrate=9600, txbuf=None, **kwargs):
+        self.baudrate = baudrate
+        if txbuf is not None:
+            self.txbuf = txbuf
+
+    def deinit(self):
+        pass
+
+    def write(self, data):
+        data = bytes(data)
+        if self.peer is not None:
+            self.peer.on_write(data)
+        overflow = len(data) - self.HW_FIFO - self.txbuf
+        if overflow > 0:
+            time.sleep_us(overflow * 10 * 1_000_000 // self.baudrate)
+        return len(data)
+
+    def feed(self, data):
+        """Agrega bytes al buffer de recepción (los envía el periférico simulado)."""
+        self.rx += data
+
+    def any(self):
+        return len(self.rx)
+
+    def read(self, n=None):
+        if not self.rx:
+            return None
+        if n is None or n >= len(self.rx):
+            data, self.rx = bytes(self.rx), bytearray()
+        else:
+            data, self.rx = bytes(self.rx[:n]), self.rx[n:]
+        return data
+
+    def readinto(self, buf, n=None):
+        n = min(len(buf) if n is None else n, len(self.rx))
+        if not n:
+            return None
+        buf[:n] = self.rx[:n]
+        del self.rx[:n]
+        return n
+
+class RTC:
+    def __init__(self):
+        self._datetime = (2000, 1, 1, 5, 0, 0, 0, 0)
+
+    def datetime(self, value=None):
+        if value is None:
+            return self._datetime
+        self._datetime = tuple(value)
+
+class I2C:
+    """Bus sin dispositivos: cualquier acceso falla como en un bus vacío."""
+    def __init__(self, bus_id, scl=None, sda=None, freq=400000):
+        self.id = bus_id
+
+    def scan(self):
+        return []
+
+    def writeto(self, addr, buf, stop=True):
+        raise OSError(19)
+
+    def readfrom_mem(self, addr, reg, n):
+        raise OSError(19)
+
+    def writeto_mem(self, addr, reg, buf):
+        raise OSError(19)
+
+class ADC:
+    ATTN_0DB, ATTN_2_5DB, ATTN_6DB, ATTN_11DB = 0, 1, 2, 3
+
+    def __init__(self, pin, atten=None):
+        self.pin = pin
+        self.value = 0
+
+    def atten(self, atten):
+        pass
+
+    def read(self):
+        return self.value
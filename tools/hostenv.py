@@ -0,0 +1,97 @@
+"""
+Entorno de ejecución en el host (CPython) para las herramientas de banco y
+simulación. Agrega las carpetas del firmware a sys.path para importar los
+módulos del nodo sin modificarlos y, bajo demanda, instala las funciones de
+tiempo de MicroPython (ticks_ms, ticks_diff, ...) sobre un reloj virtual.
+"""
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROJECT_DIR = os.path.join(ROOT, 'project')
+LIB_DIR = os.path.join(PROJECT_DIR, 'lib')
+
+for _path in (PROJECT_DIR, LIB_DIR):
+    if _path not in sys.path:
+        sys.path.insert(0, _path)
+
+# Igual que en el ESP32: los ticks dan la vuelta en 2**30.
+TICKS_PERIOD = 1 << 30
+_TICKS_HALF = TICKS_PERIOD // 2
+
+def ticks_diff(a, b):
+    return ((a - b + _TICKS_HALF) % TICKS_PERIOD) - _TICKS_HALF
+
+def ticks_add(a, b):
+    return (a + b) % TICKS_PERIOD
+
+class VirtualClock:
+    """
+    Reloj virtual en microsegundos; solo avanza cuando la simulación lo pide.
+    Con tick_cost_us > 0 cada lectura de ticks avanza el reloj, lo que modela el
+    tiempo de CPU de un bucle de espera activa (si no, nunca terminaría).
+    """
+    def __init__(self, epoch_s=1_700_000_000, start_ms=0, tick_cost_us=0):
+        self.epoch_s = epoch_s
+        self.now_us = start_ms * 1000
+        self.tick_cost_us = tick_cost_us
+        self.cpu_us = 0  # tiempo acumulado por lecturas de ticks (CPU ocupada)
+
+    def ticks_ms(self):
+        self.now_us += self.tick_cost_us
+        self.cpu_us += self.tick_cost_us
+        return (self.now_us // 1000) % TICKS_PERIOD
+
+    def ticks_us(self):
+        self.now_us += self.tick_cost_us
+        self.cpu_us += self.tick_cost_us
+        return self.now_us % TICKS_PERIOD
+
+    def time(self):
+        return self.epoch_s + self.now_us // 1_000_000
+
+    def now_ms(self):
+        """Milisegundos absolutos (sin vuelta), para medir en la simulación."""
+        return self.now_us / 1000
+
+    def advance_ms(self, ms):
+        self.now_us += int(ms * 1000)
+
+    def advance_us(self, us):
+        self.now_us += int(us)
+
+clock = VirtualClock()
+
+def install_micropython():
+    """
+    Registra los módulos de MicroPython que tienen equivalente directo en CPython
+    (utime sobre el time con reloj virtual, ure, ujson) y la máquina simulada de
+    fakehw, para importar los drivers sin modificarlos.
+    """
+    import json, re
+    import fakehw
+    sys.modules.setdefault('utime', time)
+    sys.modules.setdefault('ure', re)
+    sys.modules.setdefault('ujson', json)
+    sys.modules.setdefault('machine', fakehw)
+    return fakehw
+
+def install_time(virtual_clock=None, patch_time=False):
+    """
+    Instala ticks_ms/ticks_us/ticks_diff/ticks_add/sleep_ms en el módulo time.
+    sleep_ms avanza el reloj virtual. Con patch_time=True, time.time() también
+    pasa a ser virtual.
+    """
+    global clock
+    if virtual_clock is not None:
+        clock = virtual_clock
+    time.ticks_ms = lambda: clock.ticks_ms()
+    time.ticks_us = lambda: clock.ticks_us()
+    time.ticks_diff = ticks_diff
+    time.ticks_add = ticks_add
+    time.sleep_ms = lambda ms: clock.advance_ms(ms)
+    time.sleep_us = lambda us: clock.advance_us(us)
+    if patch_time:
+        time.time = lambda: clock.time()
+    return clock
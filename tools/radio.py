@@ -0,0 +1,52 @@
+"""
+Medio de radio en memoria sobre el reloj virtual de hostenv. Cada transmisión
+llega a todos los demás extremos a su alcance tras su tiempo en el aire, salvo que se
+pierda según la probabilidad configurada. El filtrado por destino lo hace el
+receptor, como con el módulo real en modo transparente.
+"""
+import heapq
+import random
+
+class InMemoryRadio:
+    def __init__(self, clock, loss=0.0, latency_ms=5.0, ms_per_byte=4.0, seed=None, in_range=None):
+        """in_range(src_id, dst_id) -> bool limita el alcance; None = todos se oyen."""
+        self.clock = clock
+        self.in_range = in_range
+        self.loss = loss
+        self.latency_ms = latency_ms
+        self.ms_per_byte = ms_per_byte
+        self.rng = random.Random(seed)
+        self.endpoints = {}
+        self._queue = []
+        self._order = 0
+        self.stats = {"frames": 0, "bytes": 0, "lost": 0, "airtime_ms": 0.0}
+
+    def attach(self, node_id, on_receive):
+        """on_receive(frame) se llama al entregar cada trama a este extremo."""
+        self.endpoints[node_id] = on_receive
+
+    def airtime_ms(self, frame):
+        return self.latency_ms + self.ms_per_byte * len(frame)
+
+    def transmit(self, src_id, frame):
+        frame = bytes(frame)
+        airtime = self.airtime_ms(frame)
+        self.stats["frames"] += 1
+        self.stats["bytes"] += len(frame)
+        self.stats["airtime_ms"] += airtime
+        due = self.clock.now_ms() + airtime
+        for node_id in self.endpoints:
+            if node_id == src_id or (self.in_range and not self.in_range(src_id, node_id)):
+                continue
+            if self.rng.random() < self.loss:
+                self.stats["lost"] += 1
+                continue
+            self._order += 1
+            heapq.heappush(self._queue, (due, self._order, node_id, frame))
+
+    def deliver_due(self):
+        """Entrega las tramas cuyo tiempo en el aire ya transcurrió."""
+        now = self.clock.now_ms()
+        while self._queue and self._queue[0][0] <= now:
+            _, _, node_id, frame = heapq.heappop(self._queue)
+            self.endpoints[node_id](frame)
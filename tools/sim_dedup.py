@@ -0,0 +1,104 @@
+"""
+Simulación del reenvío mesh con y sin caché de duplicados (mesh.DuplicateCache).
+
+Los nodos se reparten al azar en un área cuadrada y solo se oyen dentro de un
+radio de alcance. Cada nodo sensor envía reportes unicast a la estación base y
+todo nodo que oye un paquete ajeno lo reenvía con la misma regla que
+Routing.forward_packet (TTL > 1, no es propio, no está en la caché). Sin caché
+el tráfico crece con el TTL, por lo que se limita el número de transmisiones.
+
+Uso: python tools/sim_dedup.py [nodos] [reportes por nodo]
+"""
+import math
+import random
+import sys
+
+import hostenv
+clock = hostenv.install_time()
+
+from protocol import (  # noqa: E402
+    build_command, parse_packet, FRAME_TYPE_RESP, INITIAL_TTL, OFF_TTL, CMD_GET_SENSOR_STATUS,
+)
+from mesh import DuplicateCache  # noqa: E402
+from radio import InMemoryRadio  # noqa: E402
+
+BASE_ID = 0
+TX_LIMIT = 200_000
+
+class Node:
+    def __init__(self, node_id, radio, cache):
+        self.node_id = node_id
+        self.radio = radio
+        self.cache = cache
+        self.forwarded = 0
+        self.dropped = 0
+        self.received = set()
+        radio.attach(node_id, self.on_receive)
+
+    def on_receive(self, frame):
+        view = parse_packet(frame)
+        if view is None:
+            return
+        if view.dest_id == self.node_id:
+            self.received.add((view.src_id, view.values[0]))
+            return
+        if view.ttl <= 1 or view.src_id == self.node_id:
+            return
+        if self.cache is not None and self.cache.seen(frame, clock.ticks_ms()):
+            self.dropped += 1
+            return
+        if self.radio.stats["frames"] >= TX_LIMIT:
+            return
+        out = bytearray(frame)
+        out[OFF_TTL] -= 1
+        self.forwarded += 1
+        self.radio.transmit(self.node_id, out)
+
+def _topology(nodes, seed, side=1000.0, reach=320.0):
+    """Posiciones al azar hasta obtener una red conexa."""
+    rng = random.Random(seed)
+    while True:
+        pos = {0: (side / 2, side / 2)}
+        for node_id in range(1, nodes):
+            pos[node_id] = (rng.uniform(0, side), rng.uniform(0, side))
+        links = {a: {b for b in pos if b != a and math.dist(pos[a], pos[b]) <= reach} for a in pos}
+        seen, stack = {0}, [0]
+        while stack:
+            for b in links[stack.pop()] - seen:
+                seen.add(b)
+                stack.append(b)
+        if len(seen) == nodes:
+            return links
+
+def run(nodes, reports, ttl, use_cache, seed=3):
+    clock.now_us = 0
+    links = _topology(nodes, seed)
+    radio = InMemoryRadio(clock, seed=seed, in_range=lambda a, b: b in links[a])
+    mesh = [Node(i, radio, DuplicateCache() if use_cache else None) for i in range(nodes)]
+    for n in range(reports):
+        for node in mesh[1:]:
+            radio.transmit(node.node_id, build_command(
+                BASE_ID, node.node_id, FRAME_TYPE_RESP, ttl, CMD_GET_SENSOR_STATUS, n, 0))
+            clock.advance_ms(37)
+            radio.deliver_due()
+        while radio._queue:
+            clock.advance_ms(10)
+            radio.deliver_due()
+    forwarded = sum(node.forwarded for node in mesh)
+    dropped = sum(node.dropped for node in mesh)
+    originated = (nodes - 1) * reports
+    delivered = len(mesh[BASE_ID].received)
+    degree = sum(len(v) for v in links.values()) / nodes
+    memory = mesh[0].cache.memory_bytes() if use_cache else 0
+    print("{:>2} nodos (grado {:.1f}) TTL {:>2} {:<9}: entregados {:>4}/{}, reenvíos {:>7}{} "
+          "({:.1f}/reporte), descartados {:>5}, memoria {} B/nodo".format(
+              nodes, degree, ttl, "con caché" if use_cache else "sin caché", delivered, originated,
+              forwarded, "+" if radio.stats["frames"] >= TX_LIMIT else "", forwarded / originated,
+              dropped, memory))
+
+if __name__ == '__main__':
+    nodes = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    reports = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    for ttl in (3, 4, 5, INITIAL_TTL):
+        run(nodes, reports, ttl, use_cache=False)
+        run(nodes, reports, ttl, use_cache=True)
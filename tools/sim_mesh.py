@@ -0,0 +1,518 @@
+"""
+Red mesh completa en un solo proceso: N nodos con el firmware sin modificar
+(Routing, LoraTX, MessageLora y DataReporter de modules.py, UartFramer y el
+driver LoRaE220) sobre módulos E220 simulados (virtual_e220) que comparten un
+medio de radio en tiempo virtual:
+
+  - RSSI por distancia (pérdida log-distancia con sombra fija por enlace y
+    desvanecimiento por paquete) y sensibilidad según SF y ancho de banda de
+    la velocidad de aire; por debajo de ella el paquete se pierde.
+  - Colisiones: un paquete que se solapa en el aire con otro que llega con
+    menos de CAPTURE_DB de diferencia se pierde (efecto captura).
+  - Half-duplex: el módulo no recibe mientras transmite (virtual_e220).
+  - Transmisión fija por defecto (cada trama con destino va al siguiente salto
+    y los demás módulos la descartan); --link transparent la desactiva.
+  - Cristal de cada nodo con una deriva al azar de hasta ±--drift ppm (ticks y
+    RTC) y RTC que arranca con un error al azar de hasta ±--clock-error ms. Con
+    --sync ntp (por defecto) el módulo Clock de cada nodo sincroniza con la base
+    (CMD_TIME_SYNC), cuyo reloj es exacto; con --sync none el RTC se da por
+    sincronizado desde el arranque y deriva libremente. Los nodos corren su
+    bucle cada --step ms (50 por defecto), que es también la resolución de las
+    marcas de tiempo de la sincronización.
+
+Los nodos se reparten al azar con densidad constante (unos DEGREE vecinos
+cada uno) y la estación base (id 0) en el centro; arrancan en momentos al
+azar dentro de los primeros --boot segundos (0: todos juntos, como tras un
+corte de energía en el sitio). Cada nodo tiene sus propias colas,
+estados, pubsub y configuración, que se instalan en board, hardware y modules
+antes de correr sus módulos.
+
+Reporta tiempo de convergencia de rutas (todos con ruta a la base, todos con
+ruta a todos), mensajes, bytes y tiempo en el aire de control (HELLO y anuncios),
+entrega de reportes a la base y percentiles de latencia, para los reportes
+la fracción de transmisiones perdidas en el siguiente salto por colisión, y el
+error de los RTC respecto de la base en la segunda mitad de la simulación.
+
+Cada cantidad de nodos se simula con la radio que despliega env.py (velocidad
+de aire de fábrica y su ciclo de trabajo); --rate y --duty agregan, al lado,
+una corrida con esos valores.
+
+Uso: python tools/sim_mesh.py [nodos ...] [--hours H] [--rate 2.4|4.8|9.6|19.2|38.4|62.5]
+                               [--duty POR_MIL (0: sin límite)] [--report S] [--ads S]
+                               [--link fixed|transparent] [--schedule slots|jitter|interval]
+                               [--boot S] [--clock-error MS] [--drift PPM] [--sync ntp|none]
+                               [--step MS]
+"""
+import bisect
+import calendar
+import contextlib
+import io
+import math
+import random
+import sys
+import time as host_time
+
+import hostenv
+clock = hostenv.VirtualClock()
+hostenv.install_time(clock)
+fakehw = hostenv.install_micropython()
+
+import board  # noqa: E402
+import hardware  # noqa: E402
+import modules  # noqa: E402
+from airtime import sensitivity_dbm  # noqa: E402
+from config import ConfigManager  # noqa: E402
+from env import HARDWARE_CONFIGURATION, MODULE_CONFIGURATION  # noqa: E402
+from framer import UartFramer  # noqa: E402
+from lora_e220 import LoRaE220  # noqa: E402
+from lora_e220_constants import AirDataRate  # noqa: E402
+from lora_e220_operation_constant import ResponseStatusCode  # noqa: E402
+from protocol import FRAME_TYPE_RESP, FRAME_TYPE_MASK, OFF_CONTROL, CMD_HELLO, CMD_ROUTE_AD, CMD_GET_SENSOR_STATUS, CMD_TIME_SYNC, OFF_COMMAND  # noqa: E402
+from pubsub import EventManager  # noqa: E402
+from queues import MessageQueue  # noqa: E402
+from virtual_e220 import Ether, VirtualE220  # noqa: E402
+
+STEP_MS = 50
+BASE_ID = 0
+PIN_BASE = 100
+DEGREE = 8              # vecinos promedio por nodo
+PATH_LOSS_1M_DB = 31.7  # espacio libre a 1 m en 915 MHz
+PATH_LOSS_EXP = 3.5     # sensores a nivel del suelo
+SHADOW_DB = 4.0         # desviación de la sombra fija por enlace
+FADING_DB = 2.0         # desviación del desvanecimiento por paquete
+CAPTURE_DB = 6.0
+BROADCAST_ADDRESS = 0xFFFF
+
+# Configuración de red del nodo: la comentada en env.py, con HELLO cada 30 a 240 s,
+# anuncios completos cada 30 a 600 s (--ads cambia el máximo) y parciales con los cambios cada 5 s.
+ROUTING = {"hello_interval_s": 30, "hello_max_s": 240, "route_update_min_s": 30, "route_update_interval_s": 600,
+           "route_redundancy": 4, "triggered_update_s": 5, "holddown_s": 60,
+           "dedup_entries": 64, "dedup_ttl_s": 10, "device_key": "lora_module", "bus_type": "uart", "bus_id": "1"}
+MESSAGE = {"read_interval_s": 0.1, "bus_type": "uart", "bus_id": "1"}
+# El de env.py con sincronización por red; los nodos no tienen DS3231.
+CLOCK = dict(MODULE_CONFIGURATION["clock"], sync=True)
+# Los de env.py; --duty y --report los cambian para todos los nodos.
+LORA_TX = dict(MODULE_CONFIGURATION["lora_tx"])
+# Velocidad de aire desplegada: env.py no la programa y el E220 queda en la de fábrica.
+SHIPPED_RATE = AirDataRate.AIR_DATA_RATE_010_24
+REPORTER = dict(MODULE_CONFIGURATION["data_reporter"])
+RATES = {"2.4": AirDataRate.AIR_DATA_RATE_010_24, "4.8": AirDataRate.AIR_DATA_RATE_011_48,
+         "9.6": AirDataRate.AIR_DATA_RATE_100_96, "19.2": AirDataRate.AIR_DATA_RATE_101_192,
+         "38.4": AirDataRate.AIR_DATA_RATE_110_384, "62.5": AirDataRate.AIR_DATA_RATE_111_625}
+
+class FieldEther(Ether):
+    """Ether con posiciones, RSSI por distancia, pérdida, colisiones y captura."""
+    def __init__(self, clock, air_data_rate, seed=None):
+        super().__init__(clock, seed=seed)
+        self.sensitivity = sensitivity_dbm(air_data_rate)
+        self.links = {}      # módulo -> {receptor: RSSI medio en dBm}
+        self.recent = []     # paquetes recientes por fin en el aire, para buscar solapamientos
+        self.stats.update({"collisions": 0, "weak": 0, "delivered": 0})
+        self.by_command = {}
+        # Transmisiones de reportes (del origen o reenviadas) según lo que pasó en el siguiente salto.
+        self.report_hops = {"delivered": 0, "collided": 0, "half_duplex": 0, "weak": 0}
+
+    def connect(self):
+        """Calcula el RSSI medio de cada enlace con alcance (sombra fija por par)."""
+        for a in self.modules:
+            self.links[a] = {}
+        for i, a in enumerate(self.modules):
+            for b in self.modules[i + 1:]:
+                d = max(1.0, math.dist(a.position, b.position))
+                loss = PATH_LOSS_1M_DB + 10 * PATH_LOSS_EXP * math.log10(d) + self.rng.gauss(0, SHADOW_DB)
+                for src, dst in ((a, b), (b, a)):
+                    rssi = src.tx_power_dbm - loss
+                    if rssi >= self.sensitivity - 3 * FADING_DB:
+                        self.links[src][dst] = rssi
+
+    def neighbors(self, module):
+        return [m for m, rssi in self.links[module].items() if rssi >= self.sensitivity]
+
+    def transmit(self, packet):
+        super().transmit(packet)
+        payload = packet.payload
+        command = payload[OFF_COMMAND] if len(payload) > OFF_COMMAND else None
+        count, size, air = self.by_command.get(command, (0, 0, 0))
+        self.by_command[command] = (count + 1, size + len(payload), air + packet.end_us - packet.start_us)
+
+    def _deliver(self, packet):
+        now = self.clock.now_us
+        recent = self.recent
+        # Se conservan los paquetes que pueden solaparse con uno que todavía está en el aire.
+        while recent and recent[0][0] < now - 10_000_000:
+            recent.pop(0)
+        bisect.insort(recent, (packet.end_us, id(packet), packet))
+        overlapping = [p for _, _, p in recent if p is not packet and p.channel == packet.channel
+                       and p.start_us < packet.end_us and packet.start_us < p.end_us]
+        overlapping += [p for p in self.on_air if p is not packet and p.end_us > packet.end_us
+                        and p.channel == packet.channel and p.start_us < packet.end_us]
+        payload = packet.payload
+        report = (packet.dest != BROADCAST_ADDRESS and len(payload) > OFF_COMMAND and payload[OFF_COMMAND] == CMD_GET_SENSOR_STATUS
+                  and payload[OFF_CONTROL] & FRAME_TYPE_MASK == FRAME_TYPE_RESP)
+        for module, mean in self.links[packet.src].items():
+            hop = report and module.address == packet.dest
+            rssi = mean + self.rng.gauss(0, FADING_DB)
+            if rssi < self.sensitivity:
+                self.stats["weak"] += 1
+                if hop: self.report_hops["weak"] += 1
+                continue
+            collided = False
+            for other in overlapping:
+                if other.src is module: continue
+                interference = self.links[other.src].get(module)
+                if interference is not None and rssi - interference < CAPTURE_DB:
+                    collided = True
+                    break
+            if collided:
+                self.stats["collisions"] += 1
+                if hop: self.report_hops["collided"] += 1
+                continue
+            self.stats["delivered"] += 1
+            if hop:
+                transmitting = any(start < packet.end_us and packet.start_us < end for start, end in module._tx_windows)
+                self.report_hops["half_duplex" if transmitting else "delivered"] += 1
+            module.on_air(packet, rssi)
+
+def _timetuple(seconds):
+    """seconds2timetuple de lib.urtc (el localtime de MicroPython tiene 8 campos; el de CPython, 9)."""
+    t = host_time.gmtime(seconds)
+    return (t.tm_year, t.tm_mon, t.tm_mday, t.tm_wday, t.tm_hour, t.tm_min, t.tm_sec, 0)
+
+class NodeRTC:
+    """machine.RTC de un nodo: cuenta con el cristal del nodo desde el último datetime() escrito."""
+    def __init__(self, node):
+        self.node = node
+
+    def datetime(self, value=None):
+        node = self.node
+        if value is None:
+            us = node.rtc_us()
+            return _timetuple(clock.epoch_s + us // 1_000_000)[:7] + (us % 1_000_000,)
+        seconds = calendar.timegm((value[0], value[1], value[2], value[4], value[5], value[6]))
+        node.rtc_offset_us = (seconds - clock.epoch_s) * 1_000_000 + value[7] - node.local_us()
+
+class FirmwareNode:
+    """Un nodo con su propio estado de firmware; activate() lo instala en los módulos globales."""
+    def __init__(self, node_id, ether, position, registers, rtc_error_us=0, ppm=0, tick_origin_us=0):
+        self.node_id = node_id
+        # Ticks y RTC del nodo cuentan con su cristal (ppm); el RTC arranca con rtc_error_us de error.
+        self.ppm = ppm
+        self.tick_origin_us = tick_origin_us
+        self.rtc_offset_us = rtc_error_us - tick_origin_us
+        self.rtc = NodeRTC(self)
+        aux, m0, m1 = PIN_BASE + 3 * node_id, PIN_BASE + 3 * node_id + 1, PIN_BASE + 3 * node_id + 2
+        uart_config = HARDWARE_CONFIGURATION["uart"]["1"]
+        self.uart = fakehw.UART(node_id, baudrate=uart_config["baudrate"], txbuf=uart_config["txbuf"])
+        self.radio = VirtualE220(clock, self.uart, aux_pin=aux, m0_pin=m0, m1_pin=m1, registers=registers)
+        self.radio.position = position
+        ether.attach(self.radio)
+        queues = uart_config.get("queues", {})
+        self.messages = {"uart_1": {"in": MessageQueue(**queues.get("in", {})), "out": MessageQueue(**queues.get("out", {}))}}
+        self.states = {"pressure": 0, "temperature": 0}
+        self.events = EventManager()
+        self.config = ConfigManager()
+        self.modules = {}
+        self.drivers = {}
+        self.booted = False
+
+    def activate(self):
+        board.messages = self.messages
+        board.states = self.states
+        hardware._drivers = self.drivers
+        modules._modules = self.modules
+        modules.event_manager = self.events
+        modules.config_manager = self.config
+        modules.RTC = self.machine_rtc
+        modules.seconds2timetuple = _timetuple
+        host_time.ticks_ms = self.ticks_ms
+        host_time.ticks_us = self.ticks_us
+        host_time.time = self.rtc_time
+
+    def machine_rtc(self):
+        return self.rtc
+
+    def local_us(self):
+        """Microsegundos contados por el cristal del nodo."""
+        return self.tick_origin_us + clock.now_us + clock.now_us * self.ppm // 1_000_000
+
+    def ticks_ms(self):
+        return (self.local_us() // 1000) % hostenv.TICKS_PERIOD
+
+    def ticks_us(self):
+        return self.local_us() % hostenv.TICKS_PERIOD
+
+    def rtc_us(self):
+        """Hora del RTC del nodo en us desde clock.epoch_s."""
+        return self.local_us() + self.rtc_offset_us
+
+    def rtc_time(self):
+        """time.time() del nodo: segundos enteros del RTC."""
+        return clock.epoch_s + self.rtc_us() // 1_000_000
+
+    def boot(self, sync=True):
+        self.activate()
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.config.load()
+        self.config._set_nested("SYSTEM_ID", self.node_id)
+        aux, m0, m1 = self.radio_pins()
+        driver = LoRaE220('900T30D', self.uart, aux_pin=aux, m0_pin=m0, m1_pin=m1)
+        assert driver.begin() == ResponseStatusCode.E220_SUCCESS
+        driver.get_configuration()
+        self.drivers["lora_module"] = driver
+        self.framer = UartFramer(self.uart, self.messages["uart_1"]["in"], frame_size=driver.sub_packet_size())
+        if sync: self.modules["clock"] = modules.Clock(CLOCK, "clock")
+        self.modules["routing"] = modules.Routing(ROUTING, "routing")
+        self.modules["lora_tx"] = modules.LoraTX(LORA_TX, "lora_tx")
+        self.modules["message"] = modules.MessageLora(MESSAGE, "message")
+        self.modules["data_reporter"] = modules.DataReporter(REPORTER, "data_reporter")
+        # Sin sincronización por red el RTC se da por sincronizado (DS3231 o CMD_UPDATE_RTC ya recibido).
+        if not sync: self.events.publish('clock:updated')
+        self.booted = True
+
+    def radio_pins(self):
+        base = PIN_BASE + 3 * self.node_id
+        return base, base + 1, base + 2
+
+    def step(self):
+        self.activate()
+        self.framer.poll()
+        for module in self.modules.values():
+            if module.autostart and module.polling:
+                module.update()
+
+class MeshSim:
+    def __init__(self, nodes, air_data_rate=AirDataRate.AIR_DATA_RATE_010_24, seed=1, fixed=False,
+                 boot_s=ROUTING["hello_interval_s"], clock_error_ms=1000, drift_ppm=20, sync=True):
+        clock.now_us = 0
+        self.rng = random.Random(seed)
+        random.seed(seed)  # el firmware usa el generador global (Trickle, secuencias de transporte)
+        self.ether = FieldEther(clock, air_data_rate, seed=seed)
+        # RSSI habilitado y la velocidad de aire pedida; con fixed, transmisión fija y la
+        # dirección del módulo igual al id del nodo (lo que hace hardware.init con fixed_transmission).
+        reg3 = 0x83 | (0x40 if fixed else 0)
+        reach = 10 ** ((30 - PATH_LOSS_1M_DB - self.ether.sensitivity) / (10 * PATH_LOSS_EXP))
+        side = math.sqrt(nodes * math.pi * reach ** 2 / DEGREE)
+        positions = [(side / 2, side / 2)] + [(self.rng.uniform(0, side), self.rng.uniform(0, side))
+                                               for _ in range(nodes - 1)]
+        self.nodes = [FirmwareNode(i, self.ether, positions[i],
+                                   bytes([0x00, i if fixed else 0x00, 0x60 | air_data_rate, 0x00, 0x17, reg3, 0x00, 0x00]),
+                                   *self._clock(i, clock_error_ms, drift_ppm))
+                      for i in range(nodes)]
+        self.sync = sync
+        self.clock_errors = []
+        self.ether.connect()
+        self.boot_at = sorted(((self.rng.uniform(0, boot_s * 1000), node) for node in self.nodes),
+                              key=lambda item: item[0])
+        self._components()
+        self.generated = {}
+        self.arrivals = {}
+        self.converged_base = None
+        self.converged_full = None
+        self.oversized = 0
+        modules.print = self._print  # LoraTX imprime cada envío
+
+    def _clock(self, node_id, clock_error_ms, drift_ppm):
+        """Error inicial del RTC, deriva y origen de los ticks de un nodo; la base tiene el reloj exacto."""
+        if node_id == BASE_ID: return 0, 0, 0
+        return (int(self.rng.uniform(-clock_error_ms, clock_error_ms) * 1000), int(self.rng.uniform(-drift_ppm, drift_ppm)),
+                self.rng.randrange(1 << 40))
+
+    def _print(self, *args, **kwargs):
+        if args and "descartado" in str(args[0]):
+            self.oversized += 1
+
+    def _components(self):
+        ids = {n.radio: n.node_id for n in self.nodes}
+        graph = {n.node_id: {ids[m] for m in self.ether.neighbors(n.radio)} for n in self.nodes}
+        self.component = {}
+        for node_id in graph:
+            if node_id in self.component: continue
+            seen, stack = {node_id}, [node_id]
+            while stack:
+                for other in graph[stack.pop()] - seen:
+                    seen.add(other)
+                    stack.append(other)
+            for other in seen: self.component[other] = seen
+        self.degree = sum(len(v) for v in graph.values()) / len(graph)
+        self.hops = self._hops(graph)
+
+    @staticmethod
+    def _hops(graph):
+        dist, frontier = {BASE_ID: 0}, [BASE_ID]
+        while frontier:
+            nxt = []
+            for a in frontier:
+                for b in graph[a]:
+                    if b not in dist:
+                        dist[b] = dist[a] + 1
+                        nxt.append(b)
+            frontier = nxt
+        return dist
+
+    def _instrument(self, node):
+        if node.node_id == BASE_ID:
+            def on_packet(parsed_packet, rssi):
+                if parsed_packet.dest_id == BASE_ID and parsed_packet.command == CMD_GET_SENSOR_STATUS \
+                        and parsed_packet.frame_type == FRAME_TYPE_RESP and parsed_packet.values:
+                    key = (parsed_packet.src_id, parsed_packet.values[1])
+                    self.arrivals.setdefault(key, clock.now_us)
+            node.events.subscribe('lora:message:received', on_packet)
+            return
+        reporter = node.modules["data_reporter"]
+        enqueue = reporter._enqueue
+
+        def counted(packet):
+            self.generated[(node.node_id, node.states["pressure"])] = clock.now_us
+            enqueue(packet)
+        reporter._enqueue = counted
+
+    def _check_routes(self, now):
+        tables = {n.node_id: n.modules["routing"].routing_table for n in self.nodes if n.booted}
+        if len(tables) < len(self.nodes): return
+        if self.converged_base is None and all(BASE_ID in tables[i] for i in self.component[BASE_ID]):
+            self.converged_base = now
+        if self.converged_full is None and all(self.component[i] <= set(tables[i]) for i in tables):
+            self.converged_full = now
+
+    def run(self, hours):
+        end_us = int(hours * 3600e6)
+        step_us = STEP_MS * 1000
+        next_check = 0
+        booted = []
+        while clock.now_us < end_us:
+            now = clock.now_us
+            while self.boot_at and self.boot_at[0][0] * 1000 <= now:
+                node = self.boot_at.pop(0)[1]
+                node.boot(self.sync)
+                self._instrument(node)
+                booted.append(node)
+                clock.now_us = now  # el arranque no consume tiempo de los demás nodos
+            self.ether.run_due()
+            token = (now // 100_000) % 32768  # décimas de segundo: identifica el reporte y su hora
+            for node in booted:
+                node.states["pressure"] = token
+                node.step()
+            if now >= next_check:
+                self._check_routes(now)
+                if now * 2 >= end_us and now % 60_000_000 < 1_000_000:
+                    self.clock_errors.extend(abs(n.rtc_us() - now) / 1000 for n in booted if n.node_id != BASE_ID)
+                next_check = now + 1_000_000
+            clock.now_us = now + step_us
+        return end_us
+
+    def report(self, hours, wall_s):
+        end_us = int(hours * 3600e6)
+        interval_us = REPORTER["report_interval_s"] * 1_000_000
+        # Reportes generados tras la convergencia a la base (o tras 10 min) y con tiempo para llegar.
+        since = self.converged_base if self.converged_base is not None else 600_000_000
+        window = [(key, t) for key, t in self.generated.items() if since <= t <= end_us - 4 * interval_us]
+        latencies = sorted((self.arrivals[key] - t) / 1000 for key, t in window if key in self.arrivals)
+        reachable = len(self.component[BASE_ID]) - 1
+        stats = self.ether.by_command
+        hello = stats.get(CMD_HELLO, (0, 0, 0))
+        ads = stats.get(CMD_ROUTE_AD, (0, 0, 0))
+        reports = stats.get(CMD_GET_SENSOR_STATUS, (0, 0, 0))
+        partial = sum(n.modules["routing"].ad_stats["partial"] for n in self.nodes)
+        switched = sum(n.modules["routing"].routing_table.stats["switched"] for n in self.nodes)
+        lost = sum(n.modules["routing"].routing_table.stats["lost"] for n in self.nodes)
+        routed = sum(1 for n in self.nodes[1:] if BASE_ID in n.modules["routing"].routing_table)
+        forwarded = sum(n.modules["routing"].forward_stats["forwarded"] for n in self.nodes)
+
+        def pct(p):
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))] / 1000 if latencies else float('nan')
+
+        def fmt(t):
+            return "{:>6.0f} s".format(t / 1e6) if t is not None else "   nunca"
+
+        n = len(self.nodes)
+        print("\n{} nodos: grado medio {:.1f}, {} alcanzables desde la base en hasta {} saltos; {:.1f} h virtuales en {:.0f} s".format(
+            n, self.degree, reachable, max(self.hops.values()), hours, wall_s))
+        print("  convergencia: todos con ruta a la base {}, todos con ruta a todos {}; al final {}/{} con ruta a la base; "
+              "{} cambios de siguiente salto y {} rutas perdidas por nodo y hora".format(
+                  fmt(self.converged_base), fmt(self.converged_full), routed, n - 1, switched / n / hours, lost / n / hours))
+        control = hello[1] + ads[1]
+        suppressed = sum(n.modules["routing"].ad_trickle.stats["suppressed"] for n in self.nodes)
+        print("  control: {} HELLO ({} B) + {} anuncios ({} B; {} parciales encolados, {} completos suprimidos) = "
+              "{:.1f} mensajes, {:.0f} B y {:.2f} s de aire por nodo y hora; "
+              "{} anuncios descartados por exceder la trama; datos {} tramas ({} B), {} reenvíos".format(
+                  hello[0], hello[1], ads[0], ads[1], partial, suppressed, (hello[0] + ads[0]) / n / hours, control / n / hours,
+                  (hello[2] + ads[2]) / 1e6 / n / hours, self.oversized, reports[0], reports[1], forwarded))
+        half_duplex = sum(n.radio.stats["rx_half_duplex"] for n in self.nodes)
+        dropped = sum(n.messages["uart_1"]["out"].stats["dropped"] for n in self.nodes)
+        deferred = sum(n.modules["lora_tx"].tx_stats["deferred"] for n in self.nodes)
+        print("  aire: {} paquetes, {:.0f} s por nodo y hora; recepciones perdidas por colisión {}, bajo sensibilidad {}, "
+              "transmitiendo {}; entregas {}; descartes en colas de salida {}, tramas diferidas por ciclo de trabajo {}".format(
+                  self.ether.stats["packets"], self.ether.stats["airtime_us"] / 1e6 / n / hours, self.ether.stats["collisions"],
+                  self.ether.stats["weak"], half_duplex, self.ether.stats["delivered"], dropped, deferred))
+        print("  reportes a la base: {}/{} entregados ({:.1%}); latencia p50 {:.1f} s, p90 {:.1f} s, p99 {:.1f} s".format(
+            len(latencies), len(window), len(latencies) / len(window) if window else 0, pct(0.5), pct(0.9), pct(0.99)))
+        hops = self.ether.report_hops
+        sent = sum(hops.values())
+        schedules = [n.modules["data_reporter"].schedule for n in self.nodes[1:]]
+        slotted = sum(s.stats["slotted"] for s in schedules if s)
+        jittered = sum(s.stats["jittered"] for s in schedules if s)
+        errors = sorted(self.clock_errors)
+
+        def err(p):
+            return errors[min(len(errors) - 1, int(p * len(errors)))] if errors else float('nan')
+        sync = stats.get(CMD_TIME_SYNC, (0, 0, 0))
+        clocks = [n.modules["clock"] for n in self.nodes[1:] if "clock" in n.modules]
+        synced = [c for c in clocks if c.sync.synced]
+        intervals = sorted(c.sync.interval_s for c in synced)
+        drift = sorted(abs(c.sync.drift_ppm + n.ppm) for c, n in zip(clocks, self.nodes[1:]) if c.sync.synced)
+        print("  reloj: error del RTC respecto de la base p50 {:.0f} ms, p90 {:.0f} ms, p99 {:.0f} ms, máx {:.0f} ms; "
+              "{}/{} sincronizados, {:.1f} mensajes de sincronización por nodo y hora ({} descartados por demora), "
+              "intervalo mediano {} s, error de deriva mediano {} ppm".format(
+                  err(0.5), err(0.9), err(0.99), errors[-1] if errors else float('nan'), len(synced), n - 1,
+                  sync[0] / n / hours, sum(c.sync.stats["rejected"] for c in clocks),
+                  intervals[len(intervals) // 2] if intervals else "-", drift[len(drift) // 2] if drift else "-"))
+        print("  reportes por salto: {} transmisiones al siguiente salto, {:.1%} perdidas por colisión, {:.1%} por estar "
+              "transmitiendo, {:.1%} bajo sensibilidad; {} en ranura y {} al azar".format(
+                  sent, hops["collided"] / sent if sent else 0, hops["half_duplex"] / sent if sent else 0,
+                  hops["weak"] / sent if sent else 0, slotted, jittered))
+
+def _option(args, name, default):
+    if name not in args: return default
+    i = args.index(name)
+    value = args[i + 1]
+    del args[i:i + 2]
+    return value
+
+def main(args):
+    args = list(args)
+    hours = float(_option(args, '--hours', 1.0))
+    rate = _option(args, '--rate', None)
+    fixed = _option(args, '--link', "fixed") == "fixed"
+    duty = _option(args, '--duty', None)
+    # Cada cantidad de nodos corre siempre con la radio de env.py; --rate y --duty
+    # agregan a su lado una corrida con esos valores.
+    radios = [(SHIPPED_RATE, LORA_TX.get("duty_cycle_permille"), "env.py")]
+    if rate is not None or duty is not None:
+        radios.append((RATES[rate] if rate is not None else SHIPPED_RATE,
+                       (int(duty) or None) if duty is not None else LORA_TX.get("duty_cycle_permille"), "--rate/--duty"))
+    REPORTER["report_interval_s"] = int(_option(args, '--report', REPORTER["report_interval_s"]))
+    ROUTING["route_update_interval_s"] = int(_option(args, '--ads', ROUTING["route_update_interval_s"]))
+    REPORTER["schedule"] = _option(args, '--schedule', REPORTER.get("schedule", "slots"))
+    boot_s = float(_option(args, '--boot', ROUTING["hello_interval_s"]))
+    clock_error_ms = float(_option(args, '--clock-error', 1000))
+    drift_ppm = float(_option(args, '--drift', 20))
+    sync = _option(args, '--sync', "ntp") == "ntp"
+    global STEP_MS
+    STEP_MS = int(_option(args, '--step', STEP_MS))
+    print("transmisión {}, anuncios completos cada {} s, reportes cada {} s".format(
+        "fija al siguiente salto" if fixed else "transparente", ROUTING["route_update_interval_s"], REPORTER["report_interval_s"]))
+    print("calendario de reportes {}, arranque en {:.0f} s, RTC con error inicial ±{:.0f} ms y deriva ±{:.0f} ppm, {}".format(
+        REPORTER["schedule"], boot_s, clock_error_ms, drift_ppm, "sincronizados con la base" if sync else "sin sincronización"))
+    for count in [int(a) for a in args] or (10, 50, 200):
+        REPORTER["network_size"] = count
+        for air_rate, duty_permille, origin in radios:
+            LORA_TX["duty_cycle_permille"] = duty_permille
+            print("\n[{}] {}, ciclo de trabajo {}".format(
+                origin, AirDataRate.get_description(air_rate), "{} ‰".format(duty_permille) if duty_permille else "sin límite"), end='')
+            t0 = host_time.perf_counter()
+            sim = MeshSim(count, air_rate, fixed=fixed, boot_s=boot_s, clock_error_ms=clock_error_ms, drift_ppm=drift_ppm, sync=sync)
+            sim.run(hours)
+            sim.report(hours, host_time.perf_counter() - t0)
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,384 @@
+"""
+Módulo E220 simulado para correr el driver LoRaE220, LoraTX y el UartFramer
+sin hardware. Habla el protocolo del módulo por UART:
+
+  - Modo programa (M0 = M1 = 1): comandos C0/C2 (escritura permanente o
+    temporal) y C1 (lectura) sobre los registros 00H-07H y el PID de solo
+    lectura en 08H; la clave (06H-07H) se lee como ceros; cualquier otra cosa
+    responde FF FF FF.
+  - Modo normal y WOR: transmisión transparente (todo lo escrito sale al aire
+    hacia módulos con la misma dirección y canal) o fija (los tres primeros
+    bytes son ADDH, ADDL y canal de destino; 0xFFFF es difusión). Los mensajes
+    más largos que el sub-paquete salen como varios paquetes. En modo 1 cada
+    paquete lleva el preámbulo largo de WOR; en modo 2 solo se reciben esos
+    paquetes y no se transmite.
+  - Byte de RSSI agregado a cada paquete recibido si REG3 lo habilita
+    (dBm = -(256 - byte)).
+  - AUX bajo tras cada cambio de M0/M1, mientras los bytes llegan por UART y
+    salen al aire (tiempo según airtime.AirtimeModel con la velocidad y el
+    sub-paquete de los registros) y mientras un paquete recibido sale por UART.
+
+El módulo se conecta a un fakehw.UART (UART.peer) con pines M0/M1/AUX de
+fakehw, o a un pseudo-terminal (PtyPort) para programas externos; en ese caso
+no hay pines y el modo se fija al crear el módulo. Los paquetes viajan por un
+Ether compartido sobre el reloj de la simulación: en el mismo proceso, el
+bucle principal llama a Ether.run_due().
+
+Uso: python tools/virtual_e220.py [--modules N] [--mode 0-3]
+     (crea N módulos sobre pseudo-terminales en tiempo real e imprime sus rutas)
+"""
+import heapq
+import os
+import random
+import select
+import sys
+import time
+import tty
+
+import hostenv
+import fakehw
+from airtime import time_on_air_us
+from lora_e220_constants import SubPacketSetting
+
+MODE_SWITCH_MS = 8
+# Tras recibir un paquete el módulo baja AUX unos milisegundos antes de sacarlo por UART.
+RX_AUX_LEAD_US = 2000
+# El módulo transmite cuando se llena el sub-paquete o tras 3 bytes de silencio en el UART.
+UART_IDLE_BYTES = 3
+DEFAULT_REGISTERS = bytes([0x00, 0x00, 0x62, 0x00, 0x17, 0x03, 0x00, 0x00])
+PID = bytes([0x20, 0x0B, 0x0E])  # valores de ejemplo: el driver solo los muestra
+BROADCAST = 0xFFFF
+POWER_DBM = {"22": (22, 17, 13, 10), "30": (30, 27, 24, 21)}
+
+class WallClock:
+    """Reloj en tiempo real con la interfaz de hostenv.VirtualClock que usa el módulo."""
+    @property
+    def now_us(self):
+        return time.monotonic_ns() // 1000
+
+class Ether:
+    """
+    Canal compartido: cada paquete llega, al terminar su tiempo en el aire, a
+    todos los demás módulos en el mismo canal con rssi_dbm de intensidad, salvo
+    que se pierda con probabilidad `loss`. También lleva la agenda de eventos
+    (entregas por UART) de los módulos conectados.
+    """
+    def __init__(self, clock, rssi_dbm=-70, loss=0.0, seed=None):
+        self.clock = clock
+        self.rssi = rssi_dbm
+        self.loss = loss
+        self.rng = random.Random(seed)
+        self.modules = []
+        self.on_air = []
+        self._events = []
+        self._order = 0
+        self.stats = {"packets": 0, "bytes": 0, "airtime_us": 0, "lost": 0}
+
+    def attach(self, module):
+        self.modules.append(module)
+        module.ether = self
+
+    def schedule(self, due_us, fn, *args):
+        self._order += 1
+        heapq.heappush(self._events, (due_us, self._order, fn, args))
+
+    def run_due(self):
+        """Ejecuta los eventos vencidos según el reloj."""
+        now = self.clock.now_us
+        while self._events and self._events[0][0] <= now:
+            _, _, fn, args = heapq.heappop(self._events)
+            fn(*args)
+
+    def next_due(self):
+        return self._events[0][0] if self._events else None
+
+    def rssi_dbm(self, src, dst):
+        return self.rssi
+
+    def busy_until(self, module, channel):
+        """Fin de la última transmisión en curso en `channel` que `module` puede oír (para LBT)."""
+        now = self.clock.now_us
+        self.on_air = [p for p in self.on_air if p.end_us > now]
+        return max((p.end_us for p in self.on_air if p.channel == channel and p.src is not module
+                    and p.start_us <= now), default=now)
+
+    def transmit(self, packet):
+        self.stats["packets"] += 1
+        self.stats["bytes"] += len(packet.payload)
+        self.stats["airtime_us"] += packet.end_us - packet.start_us
+        now = self.clock.now_us
+        self.on_air = [p for p in self.on_air if p.end_us > now]
+        self.on_air.append(packet)
+        self.schedule(packet.end_us, self._deliver, packet)
+
+    def _deliver(self, packet):
+        for module in self.modules:
+            if module is packet.src:
+                continue
+            if self.loss and self.rng.random() < self.loss:
+                self.stats["lost"] += 1
+                continue
+            module.on_air(packet, self.rssi_dbm(packet.src, module))
+
+class AirPacket:
+    __slots__ = ("src", "channel", "dest", "payload", "wor", "start_us", "end_us")
+
+    def __init__(self, src, channel, dest, payload, wor, start_us, end_us):
+        self.src, self.channel, self.dest, self.payload = src, channel, dest, payload
+        self.wor, self.start_us, self.end_us = wor, start_us, end_us
+
+class PtyPort:
+    """
+    Extremo de un pseudo-terminal en modo crudo con la interfaz que el módulo
+    usa de fakehw.UART (feed, baudrate, peer). Otro programa abre `name` como
+    puerto serie; poll() pasa al módulo lo que ese programa escribió.
+    """
+    def __init__(self, baudrate=9600):
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.slave)
+        tty.setraw(self.master)
+        self.name = os.ttyname(self.slave)
+        self.baudrate = baudrate
+        self.peer = None
+        os.set_blocking(self.master, False)
+
+    def feed(self, data):
+        os.write(self.master, bytes(data))
+
+    def poll(self, timeout_s=0):
+        ready, _, _ = select.select([self.master], [], [], timeout_s)
+        if not ready:
+            return 0
+        try:
+            data = os.read(self.master, 1024)
+        except BlockingIOError:
+            return 0
+        if data and self.peer is not None:
+            self.peer.on_write(data)
+        return len(data)
+
+class VirtualE220:
+    def __init__(self, clock, uart, model='900T30D', aux_pin=None, m0_pin=None, m1_pin=None,
+                 registers=DEFAULT_REGISTERS, mode=0, ether=None):
+        self.clock = clock
+        self.uart = uart
+        self.model = model
+        self.registers = bytearray(registers)
+        self.saved = bytearray(registers)  # lo que sobrevive a un reinicio (escrituras C0)
+        self.m0_pin, self.m1_pin = m0_pin, m1_pin
+        self.mode = mode  # fijo si no hay pines M0/M1
+        self.ether = None
+        self.busy_until = 0
+        self.radio_free = 0
+        self._tx_windows = []
+        self._command = bytearray()
+        self._pins = None
+        self._program_since = None
+        self.program_us = 0
+        self.stats = {"tx_packets": 0, "tx_bytes": 0, "airtime_us": 0, "rx_packets": 0, "rx_bytes": 0,
+                      "rx_filtered": 0, "rx_half_duplex": 0, "commands": 0, "wrong_format": 0, "mode_switches": 0}
+        uart.peer = self
+        if aux_pin is not None:
+            fakehw.Pin.sources[aux_pin] = self.aux_level
+        if ether is not None:
+            ether.attach(self)
+
+    # --- Registros ---
+
+    @property
+    def address(self):
+        return (self.registers[0] << 8) | self.registers[1]
+
+    @property
+    def channel(self):
+        return self.registers[4]
+
+    @property
+    def air_data_rate(self):
+        return self.registers[2] & 0b111
+
+    @property
+    def sub_packet(self):
+        return SubPacketSetting.get_size(self.registers[3] >> 6) or 200
+
+    @property
+    def tx_power_dbm(self):
+        return POWER_DBM.get(self.model[4:6], POWER_DBM["22"])[self.registers[3] & 0b11]
+
+    @property
+    def fixed(self):
+        return bool(self.registers[5] & 0x40)
+
+    @property
+    def rssi_enabled(self):
+        return bool(self.registers[5] & 0x80)
+
+    @property
+    def lbt(self):
+        return bool(self.registers[5] & 0x10)
+
+    @property
+    def wor_us(self):
+        return 500_000 * ((self.registers[5] & 0b111) + 1)
+
+    # --- Modo y AUX ---
+
+    def current_mode(self):
+        m0, m1 = fakehw.Pin.instances.get(self.m0_pin), fakehw.Pin.instances.get(self.m1_pin)
+        if m0 is None or m1 is None:
+            return self.mode
+        pins = (m0._value, m1._value)
+        if pins != self._pins:
+            now = self.clock.now_us
+            if self._pins is not None:
+                self.stats["mode_switches"] += 1
+                self.busy_until = max(self.busy_until, now + MODE_SWITCH_MS * 1000)
+            if self._program_since is not None:
+                self.program_us += now - self._program_since
+                self._program_since = None
+            if pins == (1, 1):
+                self._program_since = now
+            self._pins = pins
+            self._command = bytearray()
+        self.mode = pins[0] | (pins[1] << 1)
+        return self.mode
+
+    def aux_level(self):
+        self.current_mode()
+        return 0 if self.clock.now_us < self.busy_until else 1
+
+    def _uart_us(self, n):
+        return n * 10 * 1_000_000 // self.uart.baudrate
+
+    # --- UART ---
+
+    def on_write(self, data):
+        mode = self.current_mode()
+        if mode == 3:
+            self._command += data
+            self._program()
+        elif mode in (0, 1):
+            self._send(bytes(data), wor=mode == 1)
+
+    def _program(self):
+        cmd = self._command
+        while len(cmd) >= 3:
+            command, address, length = cmd[0], cmd[1], cmd[2]
+            if command == 0xC1:
+                size = 3
+            elif command in (0xC0, 0xC2):
+                size = 3 + length
+                if len(cmd) < size:
+                    return
+            else:
+                self._reply(b'\xff\xff\xff')
+                self.stats["wrong_format"] += 1
+                cmd[:] = b''
+                return
+            self.stats["commands"] += 1
+            if command == 0xC1 and address + length <= 8:
+                data = bytearray(self.registers[address:address + length])
+                for i in range(length):
+                    if address + i >= 6: data[i] = 0  # la clave no se puede leer
+                self._reply(bytes([0xC1, address, length]) + data)
+            elif command == 0xC1 and address == 8 and length == len(PID):
+                self._reply(bytes([0xC1, address, length]) + PID)
+            elif command != 0xC1 and address + length <= 8:
+                self.registers[address:address + length] = cmd[3:size]
+                if command == 0xC0:
+                    self.saved[:] = self.registers
+                echo = bytearray(cmd[3:size])
+                for i in range(length):
+                    if address + i >= 6: echo[i] = 0
+                self._reply(bytes([0xC1, address, length]) + echo)
+            else:
+                self._reply(b'\xff\xff\xff')
+                self.stats["wrong_format"] += 1
+            del cmd[:size]
+
+    def _reply(self, data):
+        self.uart.feed(data)
+
+    # --- Radio ---
+
+    def _send(self, data, wor):
+        now = self.clock.now_us
+        if self.fixed:
+            if len(data) < 4:
+                return
+            dest, channel, data = (data[0] << 8) | data[1], data[2], data[3:]
+            uart_offset = 3
+        else:
+            dest, channel, uart_offset = self.address, self.channel, 0
+        wor_us = self.wor_us if wor else 0
+        size = self.sub_packet
+        start = max(now, self.radio_free)
+        for pos in range(0, len(data), size):
+            piece = data[pos:pos + size]
+            last = pos + size >= len(data)
+            ready = now + self._uart_us(uart_offset + pos + len(piece) + (UART_IDLE_BYTES if last else 0))
+            start = max(ready, start)
+            if self.lbt and self.ether is not None:
+                start = max(start, self.ether.busy_until(self, channel))
+            end = start + time_on_air_us(self.air_data_rate, len(piece)) + wor_us
+            packet = AirPacket(self, channel, dest, piece, wor, start, end)
+            self._tx_windows.append((start, end))
+            self.stats["tx_packets"] += 1
+            self.stats["tx_bytes"] += len(piece)
+            self.stats["airtime_us"] += end - start
+            if self.ether is not None:
+                self.ether.transmit(packet)
+            start = end
+        self.radio_free = start
+        self.busy_until = max(self.busy_until, start)
+        self._tx_windows = [w for w in self._tx_windows if w[1] > now - 60_000_000]
+
+    def on_air(self, packet, rssi_dbm):
+        """Lo llama el Ether al terminar un paquete en el aire."""
+        mode = self.current_mode()
+        if mode == 3 or packet.channel != self.channel or (mode == 2 and not packet.wor):
+            self.stats["rx_filtered"] += 1
+            return
+        if packet.dest != BROADCAST and self.address != BROADCAST and packet.dest != self.address:
+            self.stats["rx_filtered"] += 1
+            return
+        for start, end in self._tx_windows:
+            if start < packet.end_us and packet.start_us < end:
+                self.stats["rx_half_duplex"] += 1
+                return
+        out = packet.payload
+        if self.rssi_enabled:
+            out += bytes([max(0, min(255, 256 + int(rssi_dbm)))])
+        now = self.clock.now_us
+        done = now + RX_AUX_LEAD_US + self._uart_us(len(out))
+        self.busy_until = max(self.busy_until, done)
+        self.stats["rx_packets"] += 1
+        self.stats["rx_bytes"] += len(packet.payload)
+        if self.ether is not None:
+            self.ether.schedule(done, self._reply, out)
+        else:
+            self._reply(out)
+
+def serve(count, mode):
+    clock = WallClock()
+    ether = Ether(clock)
+    ports = []
+    for _ in range(count):
+        port = PtyPort()
+        VirtualE220(clock, port, mode=mode, ether=ether)
+        ports.append(port)
+        print(port.name)
+    sys.stdout.flush()
+    while True:
+        for port in ports:
+            port.poll(0.001)
+        ether.run_due()
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    count = int(args[args.index('--modules') + 1]) if '--modules' in args else 2
+    mode = int(args[args.index('--mode') + 1]) if '--mode' in args else 0
+    try:
+        serve(count, mode)
+    except KeyboardInterrupt:
+        pass